@@ -1,46 +1,158 @@
-from typing import Dict, Any
+import asyncio
+import copy
+import time
+import uuid
+from typing import Dict, Any, List, Callable, Optional, AsyncIterator
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, START, END
 from app.agents.specialized.agent_1_code_splitter import CodeSplitterAgent
 from app.agents.specialized.agent_2_git_searcher import GitSearcherAgent
 from app.agents.specialized.agent_3_similarity_finder import SimilarityFinderAgent
+from app.core.config import settings
+from app.services.fingerprint_index import fingerprint, fingerprint_index
+from app.services.template_index import AssignmentTemplate, template_store
+from app.storage.ttl_cache import submission_cache, block_cache, check_history
+from app.utils.hashing import code_hash
+from app.utils.llm_usage import LLMUsage, start_usage
 from app.utils.logger import get_logger
+from app.utils.singleflight import SingleFlight
+from app.utils.metrics import (
+    BLOCK_SECONDS,
+    CHECKS,
+    CHECKS_IN_FLIGHT,
+    CHECK_SECONDS,
+    STAGE_ERRORS,
+    STAGE_SECONDS
+)
 
 logger = get_logger(__name__)
 
+ProgressCallback = Callable[[str, Dict[str, Any]], None]
+
 class Orchestrator:
     def __init__(self):
         self.agent_1 = CodeSplitterAgent()
         self.agent_2 = GitSearcherAgent()
         self.agent_3 = SimilarityFinderAgent()
+        self.nodes = {
+            "code_splitter": self._timed("code_splitter", self._run_agent_1, self._arun_agent_1),
+            "template_filter": self._timed("template_filter", self._run_template_filter),
+            "previous_check": self._timed("previous_check", self._run_previous_check),
+            "block_cache": self._timed("block_cache", self._run_block_cache),
+            "fingerprint_matcher": self._timed("fingerprint_matcher", self._run_fingerprint_matcher),
+            "git_searcher": self._timed("git_searcher", self._run_agent_2, self._arun_agent_2),
+            "similarity_finder": self._timed("similarity_finder", self._run_agent_3, self._arun_agent_3)
+        }
         self.graph = self._build_graph()
+        self.blocks_graph = self._build_blocks_graph()
+        # Identical submissions arriving together (starter code at a deadline) share one run
+        self.inflight: SingleFlight[Dict[str, Any]] = SingleFlight("check")
 
     def _build_graph(self):
         workflow = StateGraph(dict)
 
-        workflow.add_node("code_splitter", self._run_agent_1)
-        workflow.add_node("git_searcher", self._run_agent_2)
-        workflow.add_node("similarity_finder", self._run_agent_3)
+        for name in ("code_splitter", "template_filter", "previous_check", "block_cache", "fingerprint_matcher", "git_searcher", "similarity_finder"):
+            workflow.add_node(name, self.nodes[name])
 
         workflow.add_edge(START, "code_splitter")
-        workflow.add_edge("code_splitter", "git_searcher")
-        workflow.add_edge("git_searcher", "similarity_finder")
+        workflow.add_conditional_edges("code_splitter", self._continue_or_end("template_filter"))
+        workflow.add_edge("template_filter", "previous_check")
+        workflow.add_edge("previous_check", "block_cache")
+        workflow.add_edge("block_cache", "fingerprint_matcher")
+        workflow.add_edge("fingerprint_matcher", "git_searcher")
+        workflow.add_conditional_edges("git_searcher", self._continue_or_end("similarity_finder"))
         workflow.add_edge("similarity_finder", END)
 
         return workflow.compile()
 
+    def _build_blocks_graph(self):
+        """Stages 2-3 (plus local resolution) for blocks that were already split elsewhere, e.g. by a batch upload."""
+        workflow = StateGraph(dict)
+
+        for name in ("template_filter", "block_cache", "fingerprint_matcher", "git_searcher", "similarity_finder"):
+            workflow.add_node(name, self.nodes[name])
+
+        workflow.add_edge(START, "template_filter")
+        workflow.add_edge("template_filter", "block_cache")
+        workflow.add_edge("block_cache", "fingerprint_matcher")
+        workflow.add_edge("fingerprint_matcher", "git_searcher")
+        workflow.add_conditional_edges("git_searcher", self._continue_or_end("similarity_finder"))
+        workflow.add_edge("similarity_finder", END)
+
+        return workflow.compile()
+
+    def _timed(self, stage: str, func: Callable, afunc: Optional[Callable] = None):
+        """
+        Graph node that records its wall time in the state's timings, the stage
+        histogram and the per-block histogram. Every path runs its stages through
+        these nodes (the streaming pipeline runs search and scoring once per block),
+        so the metrics cover /check, jobs, batches and streams alike. Agent nodes
+        carry both a sync and an async implementation so the same compiled graph
+        serves graph.invoke and graph.ainvoke; local stages (fingerprinting,
+        template matching, cache lookups) run in a worker thread under
+        graph.ainvoke so they do not stall the event loop.
+        """
+        def run(state: Dict[str, Any]) -> Dict[str, Any]:
+            started = time.perf_counter()
+            pending = len(self._pending_blocks(state))
+            return self._record_stage(stage, started, func(state), pending)
+
+        async def arun(state: Dict[str, Any]) -> Dict[str, Any]:
+            started = time.perf_counter()
+            pending = len(self._pending_blocks(state))
+            result = await afunc(state) if afunc is not None else await asyncio.to_thread(func, state)
+            return self._record_stage(stage, started, result, pending)
+
+        return RunnableLambda(run, afunc=arun)
+
+    def _record_stage(self, stage: str, started: float, state: Dict[str, Any], blocks: int = 0) -> Dict[str, Any]:
+        """blocks: how many blocks the stage was given; the splitter is given none and is counted by what it produced."""
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage=stage).observe(elapsed)
+        blocks = blocks or len(state.get("blocks", []))
+        if blocks:
+            BLOCK_SECONDS.labels(stage=stage).observe(elapsed / blocks)
+        if "timings" in state:
+            state["timings"][stage] = round(elapsed * 1000, 1)
+        if not state.get("success", True):
+            STAGE_ERRORS.labels(stage=stage).inc()
+        return state
+
+    def _timings(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "stages": dict(state.get("timings", {})),
+            "total_ms": round((time.perf_counter() - state["started"]) * 1000, 1)
+        }
+
+    def _continue_or_end(self, next_node: str):
+        """Stop the graph after a failed stage instead of letting later stages overwrite the error."""
+        def route(state: Dict[str, Any]) -> str:
+            return next_node if state.get("success", True) else END
+        return route
+
     def _run_agent_1(self, state: Dict[str, Any]) -> Dict[str, Any]:
         logger.info("Running Agent 1: Code Splitter")
         result = self.agent_1.invoke({"code": state.get("code", "")})
+        return self._apply_agent_1(state, result)
+
+    async def _arun_agent_1(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        logger.info("Running Agent 1: Code Splitter")
+        result = await self.agent_1.ainvoke({"code": state.get("code", "")})
+        return self._apply_agent_1(state, result)
 
+    def _apply_agent_1(self, state: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
         if not result["success"]:
             logger.error(f"Agent 1 failed: {result.get('error')}")
-            return {
+            # Keep the rest of the state (e.g. llm_usage) for _finish
+            state.update({
                 "success": False,
                 "error": result.get("error"),
                 "stage": "code_splitting"
-            }
+            })
+            return state
 
         logger.info(f"Agent 1 completed: {result['total_blocks']} blocks extracted")
+        self._report_progress(state, "code_splitting", result)
         state.update({
             "blocks": result["blocks"],
             "total_blocks": result["total_blocks"],
@@ -48,19 +160,301 @@ class Orchestrator:
         })
         return state
 
+    def _report_progress(self, state: Dict[str, Any], stage: str, result: Dict[str, Any]):
+        on_progress = state.get("on_progress")
+        if on_progress is None:
+            return
+        try:
+            on_progress(stage, result)
+        except Exception as e:
+            logger.warning(f"Progress callback failed for stage {stage}: {e}")
+
+    def _pending_blocks(self, state: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Blocks that were not resolved before the external stages."""
+        resolved = state.get("resolved", {})
+        return [block for i, block in enumerate(state.get("blocks", [])) if i not in resolved]
+
+    def _run_template_filter(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Drop blocks that are the assignment's starter code and cut template lines out of the rest."""
+        template = state.get("template")
+        if not state.get("success", True) or template is None:
+            return state
+
+        summary = template_store.apply(template, state.get("blocks", []), state.setdefault("resolved", {}))
+        state["template_exclusion"] = summary
+        logger.info(
+            f"Template filter: {summary['blocks_excluded']} blocks are starter code, "
+            f"{summary['lines_removed']} template lines removed from {summary['blocks_trimmed']} more"
+        )
+        return state
+
+    def _run_previous_check(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Incremental re-check: reuse the earlier check's comparison for every block
+        whose structure is unchanged. Blocks are paired by name and structural hash
+        first, then by exact code (a block moved to another class). The structural
+        hash ignores identifiers and literals, which are what the search queries are
+        built from, so it is never enough on its own.
+        """
+        previous = state.get("previous_check")
+        if not state.get("success", True) or previous is None:
+            return state
+
+        blocks = state.get("blocks", [])
+        resolved = state.setdefault("resolved", {})
+        by_name: Dict[tuple, List[Dict[str, Any]]] = {}
+        by_code: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in previous["blocks"]:
+            by_name.setdefault((entry["name"], entry["structural_hash"]), []).append(entry)
+            if entry.get("hash"):
+                by_code.setdefault(entry["hash"], []).append(entry)
+
+        used = set()
+
+        def take(candidates: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+            for entry in candidates:
+                if id(entry) not in used:
+                    used.add(id(entry))
+                    return entry
+            return None
+
+        matches: Dict[int, Dict[str, Any]] = {}
+        for i, block in enumerate(blocks):
+            if "structural_hash" in block:
+                entry = take(by_name.get((block["name"], block["structural_hash"]), []))
+                if entry is not None:
+                    matches[i] = entry
+        for i, block in enumerate(blocks):
+            if i not in matches:
+                entry = take(by_code.get(block.get("hash") or code_hash(block["code"]), []))
+                if entry is not None:
+                    matches[i] = entry
+
+        for i, entry in matches.items():
+            resolved[i] = dict(
+                entry["comparison"],
+                block_name=blocks[i]["name"],
+                block_type=blocks[i]["type"],
+                cached=False,
+                reused=True
+            )
+
+        logger.info(f"Incremental re-check: {len(matches)}/{len(blocks)} blocks unchanged, {len(blocks) - len(matches)} to analyse")
+        return state
+
+    def _remember_check(self, submission_key: str, final_state: Dict[str, Any]) -> str:
+        """Store per-block results so a later resubmission can pass this check id as previous_check_id."""
+        check_id = uuid.uuid4().hex
+        blocks = []
+        for block, comparison in zip(final_state.get("blocks", []), final_state.get("comparisons", [])):
+            # A failed search looks like "no matches"; reusing it would pin a false 0%
+            if "structural_hash" not in block or comparison.get("search_error"):
+                continue
+            blocks.append({
+                "name": block["name"],
+                "structural_hash": block["structural_hash"],
+                "hash": block.get("hash") or code_hash(block["code"]),
+                # Which other submissions match is looked up afresh on every check
+                "comparison": {key: value for key, value in comparison.items() if key != "matched_submission"}
+            })
+        check_history.set(check_id, {"submission_key": submission_key, "blocks": blocks})
+        return check_id
+
+    def _run_block_cache(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        if not state.get("success", True):
+            return state
+
+        blocks = state.get("blocks", [])
+        resolved = state.setdefault("resolved", {})
+
+        for i, block in enumerate(blocks):
+            block.setdefault("hash", code_hash(block["code"]))
+            if not settings.RESULT_CACHE_ENABLED or i in resolved:
+                continue
+
+            cached = block_cache.get(block["hash"])
+            if cached is not None:
+                # Keyed on code only: the same body may now sit in another class or under another name
+                resolved[i] = dict(cached, block_name=block["name"], block_type=block["type"], cached=True)
+
+        logger.info(f"Block cache: {len(resolved)}/{len(blocks)} blocks reused")
+        return state
+
+    def _best_match(self, fingerprints: set, **filters) -> Optional[Dict[str, Any]]:
+        candidates = fingerprint_index.query(fingerprints, limit=1, **filters)
+        if not candidates or candidates[0]["score"] < settings.FINGERPRINT_MATCH_THRESHOLD:
+            return None
+        return candidates[0]
+
+    def _run_fingerprint_matcher(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Resolve blocks that match a harvested GitHub file, and note which earlier
+        submission of another submitter each block matches. A submission match is
+        reported, not judged: the block is still searched and scored as usual.
+        """
+        if not state.get("success", True) or not settings.FINGERPRINT_ENABLED:
+            return state
+
+        resolved = state.setdefault("resolved", {})
+        submission_matches = state.setdefault("submission_matches", {})
+        matched = 0
+
+        for i, block in enumerate(state.get("blocks", [])):
+            if block.get("template"):
+                continue
+
+            fingerprints = fingerprint(block["code"], tokens=block.get("tokens"))
+            if len(fingerprints) < settings.FINGERPRINT_MIN_FINGERPRINTS:
+                continue
+
+            best = self._best_match(fingerprints, kind="github") if i not in resolved else None
+            if best is not None:
+                meta = best["meta"]
+                similarity = round(best["score"] * 100)
+                resolved[i] = {
+                    "block_name": block["name"],
+                    "block_type": block["type"],
+                    "similarity_percent": similarity,
+                    "is_suspicious": True,
+                    "source": meta.get("repo"),
+                    "source_repo": meta.get("repo"),
+                    "source_url": meta.get("url"),
+                    "reason": f"{similarity}% of fingerprints match {meta.get('repo')}/{meta.get('path')}",
+                    "engine": "fingerprint"
+                }
+                matched += 1
+
+            if not state.get("match_submissions", True):
+                continue
+            # Checked even for resolved blocks: two students with the same cached block is the case to report
+            best = self._best_match(
+                fingerprints,
+                kind="submission",
+                exclude_submissions=state.get("excluded_submissions"),
+                exclude_submitter=state.get("submitter_id")
+            )
+            if best is not None:
+                meta = best["meta"]
+                submission_matches[i] = {
+                    "submitter_id": meta.get("submitter"),
+                    "assignment_id": meta.get("assignment"),
+                    "check_id": meta.get("check_id"),
+                    "block_name": meta.get("block_name"),
+                    "similarity_percent": round(best["score"] * 100)
+                }
+
+        logger.info(f"Fingerprint matcher: {matched} blocks matched locally, {len(submission_matches)} match earlier submissions")
+        return state
+
+    def _with_submission_match(self, state: Dict[str, Any], index: int, comparison: Dict[str, Any]) -> Dict[str, Any]:
+        match = state.get("submission_matches", {}).get(index)
+        return comparison if match is None else dict(comparison, matched_submission=match)
+
+    def _index_search_results(self, search_results: List[Dict[str, Any]]):
+        """Harvest fetched GitHub files into the local fingerprint index."""
+        if not settings.FINGERPRINT_ENABLED:
+            return
+
+        for search_result in search_results:
+            for match in search_result.get("found_matches", []):
+                fingerprint_index.add_code(
+                    f"github:{match.get('repo')}:{match.get('path')}",
+                    match.get("content", ""),
+                    {"kind": "github", "repo": match.get("repo"), "path": match.get("path"), "url": match.get("url")}
+                )
+
+    def index_submission(
+        self,
+        submission_key: str,
+        blocks: List[Dict[str, Any]],
+        submitter_id: Optional[str] = None,
+        assignment_id: Optional[str] = None,
+        check_id: Optional[str] = None
+    ):
+        """
+        Make a checked submission's blocks findable by later checks of other
+        submitters. Anonymous submissions are not indexed: without a submitter a
+        resubmission cannot be told apart from someone else's copy.
+        """
+        if not settings.FINGERPRINT_ENABLED or not submitter_id:
+            return
+
+        for i, block in enumerate(blocks):
+            # Starter code is shared by every student of the assignment; it must not match as copying
+            if block.get("template"):
+                continue
+            fingerprint_index.add_code(
+                f"submission:{submitter_id}:{submission_key}:{i}",
+                block["code"],
+                {
+                    "kind": "submission",
+                    "submission": submission_key,
+                    "submitter": submitter_id,
+                    "assignment": assignment_id,
+                    "check_id": check_id,
+                    "block_name": block["name"]
+                }
+            )
+
+    def _merge_comparisons(self, state: Dict[str, Any], fresh: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Interleave resolved and freshly computed comparisons back into block order."""
+        resolved = state.get("resolved", {})
+        fresh_iter = iter(fresh)
+        comparisons = []
+
+        for i, _ in enumerate(state.get("blocks", [])):
+            if i in resolved:
+                comparisons.append(self._with_submission_match(state, i, resolved[i]))
+            else:
+                comparison = next(fresh_iter, None)
+                if comparison is not None:
+                    comparisons.append(self._with_submission_match(state, i, comparison))
+
+        return comparisons
+
+    def _store_block_results(self, blocks: List[Dict[str, Any]], search_results: List[Dict[str, Any]], comparisons: List[Dict[str, Any]]):
+        if not settings.RESULT_CACHE_ENABLED:
+            return
+
+        for block, search_result, comparison in zip(blocks, search_results, comparisons):
+            # A failed search looks like "no matches"; caching it would pin a false 0%
+            if search_result.get("error") or "hash" not in block:
+                continue
+            block_cache.set(block["hash"], comparison)
+
+    def _flag_search_errors(self, search_results: List[Dict[str, Any]], comparisons: List[Dict[str, Any]]):
+        for search_result, comparison in zip(search_results, comparisons):
+            if search_result.get("error"):
+                comparison["search_error"] = search_result["error"]
+                comparison["reason"] = f"Not checked: {search_result['error']}"
+
     def _run_agent_2(self, state: Dict[str, Any]) -> Dict[str, Any]:
         logger.info("Running Agent 2: Git Searcher")
-        result = self.agent_2.invoke({"blocks": state.get("blocks", [])})
+        result = self.agent_2.invoke({"blocks": self._pending_blocks(state)})
+        if result["success"]:
+            self._index_search_results(result["search_results"])
+        return self._apply_agent_2(state, result)
+
+    async def _arun_agent_2(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        logger.info("Running Agent 2: Git Searcher")
+        result = await self.agent_2.ainvoke({"blocks": self._pending_blocks(state)})
+        if result["success"]:
+            # Fingerprinting whole fetched files is CPU-bound
+            await asyncio.to_thread(self._index_search_results, result["search_results"])
+        return self._apply_agent_2(state, result)
 
+    def _apply_agent_2(self, state: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
         if not result["success"]:
             logger.error(f"Agent 2 failed: {result.get('error')}")
-            return {
+            state.update({
                 "success": False,
                 "error": result.get("error"),
                 "stage": "git_search"
-            }
+            })
+            return state
 
         logger.info(f"Agent 2 completed: GitHub search finished")
+        self._report_progress(state, "git_search", result)
         state.update({
             "search_results": result["search_results"],
             "stage_2_result": result
@@ -70,47 +464,373 @@ class Orchestrator:
     def _run_agent_3(self, state: Dict[str, Any]) -> Dict[str, Any]:
         logger.info("Running Agent 3: Similarity Finder")
         result = self.agent_3.invoke({
-            "blocks": state.get("blocks", []),
+            "blocks": self._pending_blocks(state),
+            "search_results": state.get("search_results", [])
+        })
+        return self._apply_agent_3(state, result)
+
+    async def _arun_agent_3(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        logger.info("Running Agent 3: Similarity Finder")
+        result = await self.agent_3.ainvoke({
+            "blocks": self._pending_blocks(state),
             "search_results": state.get("search_results", [])
         })
+        return self._apply_agent_3(state, result)
 
+    def _apply_agent_3(self, state: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
         if not result["success"]:
             logger.error(f"Agent 3 failed: {result.get('error')}")
-            return {
+            state.update({
                 "success": False,
                 "error": result.get("error"),
                 "stage": "similarity_analysis"
-            }
+            })
+            return state
 
         logger.info(f"Agent 3 completed: similarity analysis finished")
+        self._report_progress(state, "similarity_analysis", result)
+        self._store_block_results(self._pending_blocks(state), state.get("search_results", []), result["comparisons"])
+        self._flag_search_errors(state.get("search_results", []), result["comparisons"])
         state.update({
-            "comparisons": result["comparisons"],
+            "comparisons": self._merge_comparisons(state, result["comparisons"]),
             "stage_3_result": result,
             "success": True
         })
         return state
 
-    def execute_pipeline(self, code: str) -> Dict[str, Any]:
+    def _load_template(self, assignment_id: Optional[str]) -> Optional[AssignmentTemplate]:
+        if not assignment_id:
+            return None
+        template = template_store.get(assignment_id)
+        if template is None:
+            logger.warning(f"No template uploaded for assignment '{assignment_id}', checking without starter-code exclusion")
+        return template
+
+    def _result_key(self, submission_key: str, template: Optional[AssignmentTemplate], submitter_id: Optional[str] = None) -> str:
+        """
+        Submission cache key: the same code checked against another template (or
+        none), or by another submitter (other earlier submissions to match), gives
+        another result.
+        """
+        key = submission_key
+        if template is not None:
+            key = f"{key}:{template.assignment_id}:{template.version}"
+        if submitter_id:
+            key = f"{key}:by:{submitter_id}"
+        return key
+
+    def _start(
+        self,
+        code: str,
+        on_progress: Optional[ProgressCallback] = None,
+        previous_check_id: Optional[str] = None,
+        template: Optional[AssignmentTemplate] = None,
+        assignment_id: Optional[str] = None,
+        submitter_id: Optional[str] = None
+    ):
+        """
+        Return (submission_key, cached_result, initial_state); cached_result is None on a cache miss.
+        The template is loaded by the caller: async callers read it from SQLite in a worker thread.
+        """
         logger.info("=== Starting Plagiarism Detection Pipeline ===")
+        started = time.perf_counter()
+
+        submission_key = code_hash(code)
+        result_key = self._result_key(submission_key, template, submitter_id)
+        if settings.RESULT_CACHE_ENABLED:
+            cached = submission_cache.get(result_key)
+            if cached is not None:
+                logger.info("=== Pipeline skipped: submission cache hit ===")
+                timings = self._timings({"started": started})
+                self._record_check("cached", timings)
+                return submission_key, dict(copy.deepcopy(cached), cached=True, llm_usage=LLMUsage().as_dict(), timings=timings), None
+
+        previous_check = None
+        excluded_submissions = set()
+        if previous_check_id:
+            previous_check = check_history.get(previous_check_id)
+            if previous_check is None:
+                logger.warning(f"Previous check {previous_check_id} not found or expired, running a full check")
+            else:
+                # The earlier version of this submission must not count as a source, even when sent without a submitter
+                excluded_submissions.add(previous_check["submission_key"])
 
         initial_state = {
             "code": code,
             "blocks": [],
             "search_results": [],
             "comparisons": [],
+            "resolved": {},
+            "submission_key": submission_key,
+            "result_key": result_key,
+            "template": template,
+            "assignment_id": assignment_id,
+            "submitter_id": submitter_id,
+            "excluded_submissions": excluded_submissions,
+            "previous_check": previous_check,
+            "on_progress": on_progress,
+            "llm_usage": start_usage(),
+            "timings": {},
+            "started": started,
             "success": True
         }
+        return submission_key, None, initial_state
 
-        final_state = self.graph.invoke(initial_state)
+    def _record_check(self, outcome: str, timings: Dict[str, Any]):
+        CHECKS.labels(result=outcome).inc()
+        CHECK_SECONDS.labels(result=outcome).observe(timings["total_ms"] / 1000)
 
+    def _finish(self, submission_key: str, final_state: Dict[str, Any]) -> Dict[str, Any]:
         logger.info("=== Pipeline Completed ===")
 
-        return {
+        result = {
             "success": final_state.get("success", False),
             "error": final_state.get("error"),
             "comparisons": final_state.get("comparisons", []),
             "total_blocks": final_state.get("total_blocks", 0),
             "stage_1_result": final_state.get("stage_1_result"),
             "stage_2_result": final_state.get("stage_2_result"),
-            "stage_3_result": final_state.get("stage_3_result")
+            "stage_3_result": final_state.get("stage_3_result"),
+            "llm_usage": final_state["llm_usage"].as_dict(),
+            "timings": self._timings(final_state),
+            "template": final_state.get("template_exclusion"),
+            "cached": False
+        }
+        logger.info(f"LLM usage: {result['llm_usage']}")
+        self._record_check("ok" if result["success"] else "error", result["timings"])
+
+        if result["success"]:
+            result["check_id"] = self._remember_check(submission_key, final_state)
+            # Blocks whose search failed were not fully checked; such a submission is not a reference for others
+            if not self._has_search_errors(final_state):
+                self.index_submission(
+                    submission_key,
+                    final_state.get("blocks", []),
+                    submitter_id=final_state.get("submitter_id"),
+                    assignment_id=final_state.get("assignment_id"),
+                    check_id=result["check_id"]
+                )
+
+        if settings.RESULT_CACHE_ENABLED and result["success"] and not self._has_search_errors(final_state):
+            submission_cache.set(final_state.get("result_key", submission_key), copy.deepcopy(result))
+
+        return result
+
+    def _coalesced(self, result: Dict[str, Any], state: Dict[str, Any]) -> Dict[str, Any]:
+        """A result shared from a concurrent identical check; this caller paid for none of its LLM calls."""
+        timings = dict(result.get("timings") or {}, total_ms=self._timings(state)["total_ms"])
+        self._record_check("coalesced", timings)
+        return dict(result, coalesced=True, llm_usage=state["llm_usage"].as_dict(), timings=timings)
+
+    def execute_pipeline(
+        self,
+        code: str,
+        on_progress: Optional[ProgressCallback] = None,
+        previous_check_id: Optional[str] = None,
+        assignment_id: Optional[str] = None,
+        submitter_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Run the pipeline; on_progress(stage, stage_result) is called as each agent finishes.
+        With previous_check_id only blocks added or changed since that check are searched and scored.
+        With assignment_id the starter code uploaded for that assignment is excluded before any search.
+        With submitter_id the submission is indexed for later checks of other submitters,
+        and blocks matching an earlier submission of someone else are reported.
+        """
+        with CHECKS_IN_FLIGHT.track_inprogress():
+            submission_key, cached, initial_state = self._start(
+                code, on_progress, previous_check_id, self._load_template(assignment_id), assignment_id, submitter_id
+            )
+            if cached is not None:
+                return cached
+
+            def run() -> Dict[str, Any]:
+                return self._finish(submission_key, self.graph.invoke(initial_state))
+
+            # A caller that wants per-stage progress runs its own pipeline
+            if on_progress is not None:
+                return run()
+            result, shared = self.inflight.do((initial_state["result_key"], previous_check_id), run)
+            return self._coalesced(result, initial_state) if shared else result
+
+    async def aexecute_pipeline(
+        self,
+        code: str,
+        on_progress: Optional[ProgressCallback] = None,
+        previous_check_id: Optional[str] = None,
+        assignment_id: Optional[str] = None,
+        submitter_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        with CHECKS_IN_FLIGHT.track_inprogress():
+            template = await asyncio.to_thread(self._load_template, assignment_id)
+            submission_key, cached, initial_state = self._start(code, on_progress, previous_check_id, template, assignment_id, submitter_id)
+            if cached is not None:
+                return cached
+
+            async def run() -> Dict[str, Any]:
+                final_state = await self.graph.ainvoke(initial_state)
+                # Indexing the submission fingerprints every block
+                return await asyncio.to_thread(self._finish, submission_key, final_state)
+
+            if on_progress is not None:
+                return await run()
+            result, shared = await self.inflight.ado((initial_state["result_key"], previous_check_id), run)
+            return self._coalesced(result, initial_state) if shared else result
+
+    async def aanalyze_blocks(self, blocks: List[Dict[str, Any]], assignment_id: Optional[str] = None) -> Dict[str, Any]:
+        """Search and score pre-split blocks; comparisons come back aligned with blocks."""
+        initial_state = {
+            "blocks": blocks,
+            "template": await asyncio.to_thread(self._load_template, assignment_id),
+            "total_blocks": len(blocks),
+            "search_results": [],
+            "comparisons": [],
+            "resolved": {},
+            # Blocks of a batch have no single submitter; cross-file copying is what /cohort is for
+            "match_submissions": False,
+            "llm_usage": start_usage(),
+            "timings": {},
+            "started": time.perf_counter(),
+            "success": True
         }
+
+        with CHECKS_IN_FLIGHT.track_inprogress():
+            final_state = await self.blocks_graph.ainvoke(initial_state)
+
+        return {
+            "success": final_state.get("success", False),
+            "error": final_state.get("error"),
+            "comparisons": final_state.get("comparisons", []),
+            "llm_usage": final_state["llm_usage"].as_dict(),
+            "timings": self._timings(final_state),
+            "template": final_state.get("template_exclusion"),
+            "search_errors": self._has_search_errors(final_state)
+        }
+
+    def _block_state(self, state: Dict[str, Any], block: Dict[str, Any]) -> Dict[str, Any]:
+        """State for running the search and scoring nodes on one block of a streamed check."""
+        return {
+            "blocks": [block],
+            "resolved": {},
+            "search_results": [],
+            "comparisons": [],
+            "llm_usage": state["llm_usage"],
+            "timings": {},
+            "success": True
+        }
+
+    async def astream_pipeline(
+        self,
+        code: str,
+        previous_check_id: Optional[str] = None,
+        assignment_id: Optional[str] = None,
+        submitter_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Pipelined variant of aexecute_pipeline. Instead of waiting at each stage
+        barrier, every pending block is searched and scored independently and its
+        comparison is yielded as soon as it is ready.
+
+        Yields {"event": ..., "data": ...} dicts with events "blocks",
+        "comparison" (with the block index), "error" and finally "done".
+        """
+        with CHECKS_IN_FLIGHT.track_inprogress():
+            async for event in self._astream_pipeline(code, previous_check_id, assignment_id, submitter_id):
+                yield event
+
+    async def _astream_pipeline(
+        self,
+        code: str,
+        previous_check_id: Optional[str],
+        assignment_id: Optional[str],
+        submitter_id: Optional[str]
+    ) -> AsyncIterator[Dict[str, Any]]:
+        template = await asyncio.to_thread(self._load_template, assignment_id)
+        submission_key, cached, state = self._start(
+            code, previous_check_id=previous_check_id, template=template, assignment_id=assignment_id, submitter_id=submitter_id
+        )
+        if cached is not None:
+            for index, comparison in enumerate(cached.get("comparisons", [])):
+                yield {"event": "comparison", "data": {"index": index, "comparison": comparison}}
+            yield {"event": "done", "data": cached}
+            return
+
+        state = await self.nodes["code_splitter"].ainvoke(state)
+        if not state.get("success", True):
+            yield {"event": "error", "data": {"error": state.get("error"), "stage": state.get("stage")}}
+            yield {"event": "done", "data": await asyncio.to_thread(self._finish, submission_key, state)}
+            return
+
+        blocks = state["blocks"]
+        yield {"event": "blocks", "data": {
+            "total_blocks": len(blocks),
+            "blocks": [{"name": block["name"], "type": block["type"], "lines": block.get("lines")} for block in blocks]
+        }}
+
+        for stage in ("template_filter", "previous_check", "block_cache", "fingerprint_matcher"):
+            state = await self.nodes[stage].ainvoke(state)
+        resolved = state["resolved"]
+        for index in sorted(resolved):
+            yield {"event": "comparison", "data": {"index": index, "comparison": self._with_submission_match(state, index, resolved[index])}}
+
+        search_semaphore = asyncio.Semaphore(max(1, settings.GITHUB_SEARCH_CONCURRENCY))
+        score_semaphore = asyncio.Semaphore(max(1, settings.LLM_CONCURRENCY))
+
+        async def process(index: int, block: Dict[str, Any]):
+            # The same nodes as the graph, on this block alone: they index, cache, flag
+            # failed searches before the comparison is streamed, and record the timings
+            block_state = self._block_state(state, block)
+            async with search_semaphore:
+                block_state = await self.nodes["git_searcher"].ainvoke(block_state)
+            if block_state["success"]:
+                async with score_semaphore:
+                    block_state = await self.nodes["similarity_finder"].ainvoke(block_state)
+            if not block_state["success"]:
+                raise RuntimeError(block_state.get("error"))
+            return index, block, block_state["search_results"][0], block_state["comparisons"][0]
+
+        # Search and scoring overlap across blocks, so the response times them together
+        blocks_started = time.perf_counter()
+
+        tasks = [
+            asyncio.create_task(process(index, block))
+            for index, block in enumerate(blocks) if index not in resolved
+        ]
+
+        fresh: Dict[int, tuple] = {}
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    index, block, search_result, comparison = await next_done
+                except Exception as e:
+                    logger.error(f"Streaming block failed: {e}")
+                    yield {"event": "error", "data": {"error": str(e), "stage": "similarity_analysis"}}
+                    continue
+                fresh[index] = (block, search_result, comparison)
+                yield {"event": "comparison", "data": {"index": index, "comparison": self._with_submission_match(state, index, comparison)}}
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        state["timings"]["streamed_blocks"] = round((time.perf_counter() - blocks_started) * 1000, 1)
+
+        ordered = [fresh[index] for index in sorted(fresh)]
+        search_results = [search_result for _, search_result, _ in ordered]
+        comparisons = [comparison for _, _, comparison in ordered]
+
+        # Indices of blocks that failed mid-stream are missing from fresh; merge only what finished
+        state["resolved"] = {**resolved, **{index: comparison for index, (_, _, comparison) in fresh.items()}}
+        state.update({
+            "search_results": search_results,
+            "comparisons": self._merge_comparisons(state, []),
+            "stage_2_result": {"success": True, "search_results": search_results},
+            "stage_3_result": {"success": True, "comparisons": comparisons},
+            "success": len(fresh) + len(resolved) == len(blocks)
+        })
+        if not state["success"]:
+            state["error"] = "Some blocks could not be analysed"
+
+        yield {"event": "done", "data": await asyncio.to_thread(self._finish, submission_key, state)}
+
+    def _has_search_errors(self, state: Dict[str, Any]) -> bool:
+        return any(r.get("error") for r in state.get("search_results", []))
@@ -1,3 +1,4 @@
+import asyncio
 from typing import Any, Dict, List
 from langchain_core.runnables import Runnable
 from app.agents.base.base_agent import BaseAgent
@@ -43,7 +44,8 @@ class CodeSplitterAgent(BaseAgent, Runnable):
             }
 
     async def ainvoke(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        return self.invoke(input_data)
+        # Parsing is CPU-bound; keep large files off the event loop
+        return await asyncio.to_thread(self.invoke, input_data)
 
     @property
     def InputType(self):
@@ -1,61 +1,99 @@
-from typing import Any, Dict, List
-import re
+from typing import Any, Dict, List, Tuple
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from langchain_core.runnables import Runnable
 from app.agents.base.base_agent import BaseAgent
+from app.core.config import settings
 from app.services.github_service import github_service
+from app.services.query_planner import query_planner
+
+PER_PAGE = 3
 
 class GitSearcherAgent(BaseAgent, Runnable):
     def __init__(self):
         super().__init__("GitSearcher")
 
-    def _clean_search_query(self, code: str) -> str:
-        """Extract meaningful keywords from code for GitHub search."""
-        lines = code.split("\n")[:4]
-        text = " ".join(lines)
-        
-        stop_words = {'def', 'class', 'self', 'import', 'from', 'return', 'if', 'else', 'elif', 'for', 'while', 'try', 'except', 'with', 'as'}
-        
-        words = re.findall(r'\b[a-zA-Z_][a-zA-Z0-9_]{2,}\b', text)
-        
-        keywords = [w for w in words if w not in stop_words and not w.startswith('_')]
-        
-        query = " ".join(keywords[:5])
-        
-        return query.strip()[:200] if query.strip() else ""
+    def _skipped_result(self, block: Dict[str, Any], plan: Dict[str, Any]) -> Dict[str, Any]:
+        self.log_info(f"Block '{block['name']}': skipped ({plan['skip_reason']}, usefulness={plan['usefulness']})")
+        return {
+            "block_name": block["name"],
+            "block_type": block["type"],
+            "found_matches": [],
+            "usefulness": plan["usefulness"],
+            "skip_reason": plan["skip_reason"]
+        }
 
-    def invoke(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        try:
-            blocks = input_data.get("blocks", [])
-            self.log_info(f"Starting GitHub search for {len(blocks)} blocks...")
-
-            search_results = []
-
-            for block in blocks:
-                search_query = self._clean_search_query(block["code"])
-                
-                if not search_query and block.get("name"):
-                    search_query = re.sub(r'[^a-zA-Z0-9_\s]', '', block["name"])
-
-                if not search_query:
-                    search_results.append({
-                        "block_name": block["name"],
-                        "block_type": block["type"],
-                        "found_matches": []
-                    })
-                    self.log_info(f"Block '{block['name']}': skipped (no valid search terms)")
+    def _matches_result(self, block: Dict[str, Any], plan: Dict[str, Any], matches: List[Dict[str, Any]]) -> Dict[str, Any]:
+        self.log_info(f"Block '{block['name']}': found {len(matches)} matches")
+        return {
+            "block_name": block["name"],
+            "block_type": block["type"],
+            "search_query": plan["query"][:100],
+            "usefulness": plan["usefulness"],
+            "found_matches": matches
+        }
+
+    def _failed_result(self, block: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+        self.log_error(f"Block '{block.get('name')}': search failed: {error}")
+        return {
+            "block_name": block.get("name"),
+            "block_type": block.get("type"),
+            "found_matches": [],
+            "error": str(error)
+        }
+
+    def _plan(self, blocks: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        plans = []
+        for block in blocks:
+            try:
+                plans.append(query_planner.plan(block))
+            except Exception as e:
+                self.log_error(f"Block '{block.get('name')}': query planning failed: {e}")
+                plans.append({"query": "", "terms": [], "usefulness": 0.0, "skip_reason": "query planning failed"})
+
+        searches = query_planner.group(plans, PER_PAGE)
+        skipped = sum(1 for plan in plans if not plan["query"])
+        self.log_info(f"Query plan: {len(blocks)} blocks, {skipped} skipped, {len(searches)} searches")
+        return plans, searches
+
+    def _collect(self, blocks: List[Dict[str, Any]], plans: List[Dict[str, Any]], searches: List[Dict[str, Any]], outcomes: List[Any]) -> List[Dict[str, Any]]:
+        """Spread the outcome of each search (matches or an exception) back over its member blocks, in block order."""
+        search_results: List[Dict[str, Any]] = [None] * len(blocks)
+
+        for search, outcome in zip(searches, outcomes):
+            for i in search["members"]:
+                if isinstance(outcome, Exception):
+                    search_results[i] = self._failed_result(blocks[i], outcome)
                     continue
+                matches = query_planner.assign(plans[i], outcome, PER_PAGE) if search["batched"] else outcome
+                search_results[i] = self._matches_result(blocks[i], plans[i], list(matches))
 
-                matches = github_service.search_code(search_query, language="python", per_page=3)
+        for i, block in enumerate(blocks):
+            if search_results[i] is None:
+                search_results[i] = self._skipped_result(block, plans[i])
+        return search_results
 
-                search_results.append({
-                    "block_name": block["name"],
-                    "block_type": block["type"],
-                    "search_query": search_query[:100],
-                    "found_matches": matches
-                })
+    def _run_search(self, search: Dict[str, Any]) -> Any:
+        try:
+            return github_service.search_code(search["query"], language="python", per_page=search["per_page"])
+        except Exception as e:
+            return e
 
-                self.log_info(f"Block '{block['name']}': found {len(matches)} matches")
+    def invoke(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            blocks = input_data.get("blocks", [])
+            concurrency = max(1, settings.GITHUB_SEARCH_CONCURRENCY)
+            self.log_info(f"Starting GitHub search for {len(blocks)} blocks (concurrency={concurrency})...")
 
+            plans, searches = self._plan(blocks)
+            if concurrency == 1 or len(searches) <= 1:
+                outcomes = [self._run_search(search) for search in searches]
+            else:
+                # Executor.map yields in submission order, so outcomes[i] stays aligned with searches[i]
+                with ThreadPoolExecutor(max_workers=min(concurrency, len(searches))) as executor:
+                    outcomes = list(executor.map(self._run_search, searches))
+
+            search_results = self._collect(blocks, plans, searches, outcomes)
             self.log_info(f"GitHub search completed. Total matches found: {sum(len(r['found_matches']) for r in search_results)}")
 
             return {
@@ -73,7 +111,38 @@ class GitSearcherAgent(BaseAgent, Runnable):
             }
 
     async def ainvoke(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        return self.invoke(input_data)
+        try:
+            blocks = input_data.get("blocks", [])
+            concurrency = max(1, settings.GITHUB_SEARCH_CONCURRENCY)
+            self.log_info(f"Starting GitHub search for {len(blocks)} blocks (concurrency={concurrency})...")
+
+            # Planning parses and ranks every block; keep it off the event loop
+            plans, searches = await asyncio.to_thread(self._plan, blocks)
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def bounded(search: Dict[str, Any]) -> Any:
+                async with semaphore:
+                    return await github_service.asearch_code(search["query"], language="python", per_page=search["per_page"])
+
+            # gather returns results in argument order, keeping outcomes[i] aligned with searches[i]
+            outcomes = await asyncio.gather(*(bounded(search) for search in searches), return_exceptions=True)
+
+            search_results = self._collect(blocks, plans, searches, list(outcomes))
+            self.log_info(f"GitHub search completed. Total matches found: {sum(len(r['found_matches']) for r in search_results)}")
+
+            return {
+                "success": True,
+                "search_results": search_results,
+                "blocks": blocks
+            }
+        except Exception as e:
+            self.log_error(f"GitHub search failed: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "search_results": [],
+                "blocks": input_data.get("blocks", [])
+            }
 
     @property
     def InputType(self):
@@ -1,88 +1,293 @@
-import json
-from typing import Any, Dict, List
+import asyncio
+import time
+from typing import Any, Dict, List, Optional, Tuple, Type
 from langchain_core.runnables import Runnable
+from pydantic import BaseModel
 from app.agents.base.base_agent import BaseAgent
+from app.core.config import settings
+from app.core.exceptions import LLMError
+from app.schemas.llm import BatchVerdicts, SimilarityVerdict
 from app.services.llm_service import llm_service
+from app.services.prompt_builder import prompt_builder
+from app.services.similarity_engine import similarity_engine
+
+SIMILARITY_MODES = ("serial", "batch", "concurrent")
 
 class SimilarityFinderAgent(BaseAgent, Runnable):
     def __init__(self):
         super().__init__("SimilarityFinder")
 
-    def invoke(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        try:
-            blocks = input_data.get("blocks", [])
-            search_results = input_data.get("search_results", [])
-            self.log_info(f"Starting similarity analysis for {len(blocks)} blocks...")
+    def _get_mode(self) -> str:
+        mode = settings.SIMILARITY_MODE.lower()
+        if mode not in SIMILARITY_MODES:
+            self.log_error(f"Unknown SIMILARITY_MODE '{settings.SIMILARITY_MODE}', falling back to serial")
+            return "serial"
+        return mode
 
-            comparisons = []
+    def _collect_pairs(self, blocks: List[Dict[str, Any]], search_results: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Tuple[int, Dict[str, Any], Dict[str, Any]]], Dict[int, List[Dict[str, Any]]]]:
+        """
+        Rank every fetched match against its block locally and return the
+        (index, block, match) pairs worth a full score: the CANDIDATE_TOP_K best
+        candidates at or above CANDIDATE_MIN_SCORE. Blocks without such a
+        candidate are settled here. Also returns the ranked candidates per block.
+        """
+        comparisons = []
+        pairs = []
+        candidates = {}
 
-            for i, block in enumerate(blocks):
-                if i >= len(search_results):
-                    break
+        for i, block in enumerate(blocks):
+            if i >= len(search_results):
+                break
 
-                matches = search_results[i].get("found_matches", [])
+            matches = search_results[i].get("found_matches", [])
 
-                if not matches:
-                    self.log_info(f"Block '{block['name']}': no matches to compare")
-                    comparisons.append({
-                        "block_name": block["name"],
-                        "block_type": block["type"],
-                        "similarity_percent": 0,
-                        "is_suspicious": False,
-                        "source": None,
-                        "source_repo": None,
-                        "source_url": None
-                    })
-                    continue
+            if not matches:
+                self.log_info(f"Block '{block['name']}': no matches to compare")
+                skip_reason = search_results[i].get("skip_reason")
+                comparisons.append({
+                    "block_name": block["name"],
+                    "block_type": block["type"],
+                    "similarity_percent": 0,
+                    "is_suspicious": False,
+                    "source": None,
+                    "source_repo": None,
+                    "source_url": None,
+                    "engine": None,
+                    "reason": f"Not searched: {skip_reason}" if skip_reason else None
+                })
+                continue
 
-                first_match = matches[0]
-                block_code = block["code"][:500]
-                match_snippet = first_match.get("snippet", "")[:500]
+            ranked = similarity_engine.rank_candidates(block, matches)
+            candidates[i] = ranked
+            shortlist = [m for m in ranked[:max(1, settings.CANDIDATE_TOP_K)] if m["local_score"] >= settings.CANDIDATE_MIN_SCORE]
 
-                prompt = f"""Compare these two code snippets and determine similarity percentage.
+            if not shortlist:
+                best = ranked[0]
+                comparisons.append(self._build_comparison(
+                    block,
+                    best,
+                    {
+                        "similarity_percent": best["local_score"],
+                        "is_suspicious": False,
+                        "reason": f"No candidate reached {settings.CANDIDATE_MIN_SCORE}% local similarity (best {best['local_score']}% of {len(ranked)})"
+                    },
+                    engine="ranking"
+                ))
+                continue
 
-Student Code:
-```python
-{block_code}
-```
+            comparisons.append(None)
+            pairs.extend((i, block, match) for match in shortlist)
 
-Found Code on GitHub:
-```python
-{match_snippet}
-```
+        return comparisons, pairs, candidates
 
-Respond ONLY with valid JSON (no markdown, no extra text):
-{{
-    "similarity_percent": <0-100>,
-    "is_suspicious": <true or false>,
-    "reason": "<brief reason>"
-}}"""
+    def _keep_best(self, comparisons: List[Dict[str, Any]], i: int, comparison: Dict[str, Any]):
+        """Several candidates of one block can be scored; the block reports the most similar."""
+        current = comparisons[i]
+        if current is None or comparison["similarity_percent"] > current["similarity_percent"]:
+            comparisons[i] = comparison
 
-                response = llm_service.invoke_json(prompt)
+    def _resolve_structurally(self, comparisons: List[Dict[str, Any]], pairs: List[Tuple[int, Dict[str, Any], Dict[str, Any]]]) -> List[Tuple[int, Dict[str, Any], Dict[str, Any]]]:
+        """Score pairs locally; clear-cut ones are settled here, the middle band is returned for the LLM."""
+        if not settings.STRUCTURAL_ENGINE_ENABLED:
+            return pairs
 
-                similarity = response.get("similarity_percent", 0)
-                is_suspicious = response.get("is_suspicious", False)
+        remaining = []
+        for i, block, match in pairs:
+            local = similarity_engine.score(block["code"], match.get("snippet", ""))
+            similarity = local["similarity_percent"]
 
-                comparisons.append({
-                    "block_name": block["name"],
-                    "block_type": block["type"],
+            if settings.STRUCTURAL_LOW_THRESHOLD < similarity < settings.STRUCTURAL_HIGH_THRESHOLD:
+                remaining.append((i, block, match))
+                continue
+
+            verdict = "near-identical structure" if similarity >= settings.STRUCTURAL_HIGH_THRESHOLD else "structurally unrelated"
+            components = ", ".join(f"{name} {value:.2f}" for name, value in local["components"].items())
+            self._keep_best(comparisons, i, self._build_comparison(
+                block,
+                match,
+                {
                     "similarity_percent": similarity,
-                    "is_suspicious": is_suspicious or similarity > 70,
-                    "source": first_match.get("repo", ""),
-                    "source_repo": first_match.get("repo", ""),
-                    "source_url": first_match.get("url", ""),
-                    "reason": response.get("reason", "")
-                })
+                    "is_suspicious": similarity >= settings.STRUCTURAL_HIGH_THRESHOLD,
+                    "reason": f"Structural engine: {verdict} ({components})"
+                },
+                engine="structural"
+            ))
+
+        self.log_info(f"Structural engine settled {len(pairs) - len(remaining)}/{len(pairs)} pairs, {len(remaining)} escalated to LLM")
+        return remaining
+
+    def _build_prompt(self, block: Dict[str, Any], match: Dict[str, Any]) -> str:
+        return prompt_builder.pair_prompt(block["code"], match.get("snippet", ""))
+
+    def _build_batch_prompt(self, pairs: List[Tuple[int, Dict[str, Any], Dict[str, Any]]]) -> str:
+        return prompt_builder.batch_prompt([(block["code"], match.get("snippet", "")) for _, block, match in pairs])
+
+    def _batch_chunks(self, pairs: List[Any]) -> List[List[Any]]:
+        size = max(1, settings.LLM_BATCH_SIZE)
+        return [pairs[i:i + size] for i in range(0, len(pairs), size)]
+
+    def _split_batch_response(self, response: Optional[dict], size: int) -> List[dict]:
+        """Map a batch reply back onto its pairs; missing entries become {}."""
+        results = [{} for _ in range(size)]
+        entries = response.get("results", []) if isinstance(response, dict) else []
+
+        for position, entry in enumerate(entries):
+            if not isinstance(entry, dict):
+                continue
+            index = entry.get("index", position)
+            if isinstance(index, int) and 0 <= index < size:
+                results[index] = entry
+
+        return results
+
+    def _lookup_pairs(self, pairs: List[Tuple[int, Dict[str, Any], Dict[str, Any]]]) -> Tuple[List[str], List[Optional[dict]], List[int]]:
+        """Pair prompts, their cached replies, and the positions still to be sent."""
+        prompts = [self._build_prompt(block, match) for _, block, match in pairs]
+        responses = [llm_service.lookup(prompt, SimilarityVerdict) for prompt in prompts]
+        missing = [position for position, response in enumerate(responses) if response is None]
+        return prompts, responses, missing
+
+    def _store_batch(self, prompts: List[str], responses: List[Optional[dict]], positions: List[int], response: Optional[dict]):
+        """Spread a batch reply over its pairs and cache each entry under its own pair prompt."""
+        for position, entry in zip(positions, self._split_batch_response(response, len(positions))):
+            if not entry:
+                continue
+            verdict = {key: entry[key] for key in SimilarityVerdict.model_fields if key in entry}
+            responses[position] = verdict
+            llm_service.remember(prompts[position], verdict, SimilarityVerdict)
+
+    def _invoke(self, prompt: str, schema: Type[BaseModel]) -> Optional[dict]:
+        try:
+            return llm_service.invoke_json(prompt, schema)
+        except LLMError:
+            return None
+
+    async def _ainvoke(self, prompt: str, schema: Type[BaseModel]) -> Optional[dict]:
+        try:
+            return await llm_service.ainvoke_json(prompt, schema)
+        except LLMError:
+            return None
+
+    def _score_pairs(self, pairs: List[Tuple[int, Dict[str, Any], Dict[str, Any]]], mode: str) -> List[Optional[dict]]:
+        """LLM reply per pair; None where the model could not be reached."""
+        if mode == "batch":
+            # Only pairs missing from the cache go into batch prompts
+            prompts, responses, missing = self._lookup_pairs(pairs)
+            for chunk in self._batch_chunks(missing):
+                prompt = self._build_batch_prompt([pairs[position] for position in chunk])
+                self._store_batch(prompts, responses, chunk, self._invoke(prompt, BatchVerdicts))
+            return responses
+
+        prompts = [self._build_prompt(block, match) for _, block, match in pairs]
+        if mode == "concurrent":
+            return llm_service.batch_json(prompts, max_concurrency=settings.LLM_CONCURRENCY, schema=SimilarityVerdict)
+
+        return [self._invoke(prompt, SimilarityVerdict) for prompt in prompts]
+
+    async def _ascore_pairs(self, pairs: List[Tuple[int, Dict[str, Any], Dict[str, Any]]], mode: str) -> List[Optional[dict]]:
+        # Prompt building (tokenizer) and the reply cache (SQLite) run in worker threads, not on the event loop
+        if mode == "batch":
+            prompts, responses, missing = await asyncio.to_thread(self._lookup_pairs, pairs)
+            chunks = self._batch_chunks(missing)
+            batch_prompts = await asyncio.to_thread(
+                lambda: [self._build_batch_prompt([pairs[position] for position in chunk]) for chunk in chunks]
+            )
+            batch_responses = await llm_service.abatch_json(batch_prompts, max_concurrency=settings.LLM_CONCURRENCY, schema=BatchVerdicts)
+            for chunk, response in zip(chunks, batch_responses):
+                await asyncio.to_thread(self._store_batch, prompts, responses, chunk, response)
+            return responses
+
+        prompts = await asyncio.to_thread(lambda: [self._build_prompt(block, match) for _, block, match in pairs])
+        if mode == "concurrent":
+            return await llm_service.abatch_json(prompts, max_concurrency=settings.LLM_CONCURRENCY, schema=SimilarityVerdict)
 
-                self.log_info(f"Block '{block['name']}': {similarity}% similarity with {first_match.get('repo', 'unknown')}")
+        return [await self._ainvoke(prompt, SimilarityVerdict) for prompt in prompts]
 
-            self.log_info(f"Similarity analysis completed")
+    def _source_url(self, match: Dict[str, Any]) -> str:
+        """Link to the aligned lines rather than the top of the file."""
+        url = match.get("url", "")
+        lines = match.get("lines")
+        if url and lines:
+            return f"{url}#L{lines[0]}-L{lines[1]}"
+        return url
+
+    def _build_comparison(self, block: Dict[str, Any], match: Dict[str, Any], response: dict, engine: str = "llm") -> Dict[str, Any]:
+        similarity = response.get("similarity_percent", 0)
+        is_suspicious = response.get("is_suspicious", False)
+
+        self.log_info(f"Block '{block['name']}': {similarity}% similarity with {match.get('repo', 'unknown')} ({engine})")
+
+        return {
+            "block_name": block["name"],
+            "block_type": block["type"],
+            "similarity_percent": similarity,
+            "is_suspicious": is_suspicious or similarity > 70,
+            "source": match.get("repo", ""),
+            "source_repo": match.get("repo", ""),
+            "source_url": self._source_url(match),
+            "reason": response.get("reason", ""),
+            "engine": engine
+        }
+
+    def _fallback_comparison(self, block: Dict[str, Any], match: Dict[str, Any]) -> Dict[str, Any]:
+        """Structural score for a pair the LLM could not answer, so it is not reported as 0%."""
+        local = similarity_engine.score(block["code"], match.get("snippet", ""))
+        similarity = local["similarity_percent"]
+        return self._build_comparison(
+            block,
+            match,
+            {
+                "similarity_percent": similarity,
+                "is_suspicious": similarity >= settings.STRUCTURAL_HIGH_THRESHOLD,
+                "reason": "LLM unavailable; structural engine score"
+            },
+            engine="structural_fallback"
+        )
+
+    def _finish(self, comparisons: List[Dict[str, Any]], pairs: List[Tuple[int, Dict[str, Any], Dict[str, Any]]], responses: List[Optional[dict]], candidates: Dict[int, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        for (i, block, match), response in zip(pairs, responses):
+            if response:
+                comparison = self._build_comparison(block, match, response)
+            else:
+                comparison = self._fallback_comparison(block, match)
+            self._keep_best(comparisons, i, comparison)
+
+        for i, ranked in candidates.items():
+            comparisons[i]["candidates"] = [
+                {
+                    "repo": match.get("repo", ""),
+                    "path": match.get("path", ""),
+                    "url": match.get("url", ""),
+                    "lines": match.get("lines"),
+                    "local_score": match["local_score"]
+                }
+                for match in ranked
+            ]
+        return comparisons
+
+    def invoke(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            blocks = input_data.get("blocks", [])
+            search_results = input_data.get("search_results", [])
+            mode = self._get_mode()
+            self.log_info(f"Starting similarity analysis for {len(blocks)} blocks (mode={mode})...")
+            started = time.perf_counter()
+
+            comparisons, pairs, candidates = self._collect_pairs(blocks, search_results)
+            pairs = self._resolve_structurally(comparisons, pairs)
+            responses = self._score_pairs(pairs, mode) if pairs else []
+            comparisons = self._finish(comparisons, pairs, responses, candidates)
+
+            elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+            self.log_info(f"Similarity analysis completed in {elapsed_ms} ms")
 
             return {
                 "success": True,
                 "comparisons": comparisons,
                 "blocks": blocks,
-                "search_results": search_results
+                "search_results": search_results,
+                "mode": mode,
+                "elapsed_ms": elapsed_ms
             }
         except Exception as e:
             self.log_error(f"Similarity analysis failed: {e}")
@@ -95,7 +300,39 @@ Respond ONLY with valid JSON (no markdown, no extra text):
             }
 
     async def ainvoke(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        return self.invoke(input_data)
+        try:
+            blocks = input_data.get("blocks", [])
+            search_results = input_data.get("search_results", [])
+            mode = self._get_mode()
+            self.log_info(f"Starting similarity analysis for {len(blocks)} blocks (mode={mode})...")
+            started = time.perf_counter()
+
+            # Ranking, window alignment and the structural engine are CPU-bound; keep them off the event loop
+            comparisons, pairs, candidates = await asyncio.to_thread(self._collect_pairs, blocks, search_results)
+            pairs = await asyncio.to_thread(self._resolve_structurally, comparisons, pairs)
+            responses = await self._ascore_pairs(pairs, mode) if pairs else []
+            comparisons = await asyncio.to_thread(self._finish, comparisons, pairs, responses, candidates)
+
+            elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+            self.log_info(f"Similarity analysis completed in {elapsed_ms} ms")
+
+            return {
+                "success": True,
+                "comparisons": comparisons,
+                "blocks": blocks,
+                "search_results": search_results,
+                "mode": mode,
+                "elapsed_ms": elapsed_ms
+            }
+        except Exception as e:
+            self.log_error(f"Similarity analysis failed: {e}")
+            return {
+                "success": False,
+                "error": str(e),
+                "comparisons": [],
+                "blocks": input_data.get("blocks", []),
+                "search_results": input_data.get("search_results", [])
+            }
 
     @property
     def InputType(self):
@@ -0,0 +1,50 @@
+import threading
+from typing import TYPE_CHECKING, Optional
+from fastapi import HTTPException
+from app.core.config import Settings, settings
+from app.core.exceptions import ConfigurationError
+from app.services.github_service import GitHubService, github_service
+from app.services.llm_service import LLMService, llm_service
+from app.utils.logger import get_logger
+
+if TYPE_CHECKING:
+    from app.agents.orchestrator import Orchestrator
+
+logger = get_logger(__name__)
+
+_orchestrator: Optional["Orchestrator"] = None
+_orchestrator_lock = threading.Lock()
+
+def get_settings() -> Settings:
+    return settings
+
+def get_orchestrator() -> "Orchestrator":
+    """The shared orchestrator, built and its graphs compiled on first use."""
+    global _orchestrator
+    if _orchestrator is None:
+        with _orchestrator_lock:
+            if _orchestrator is None:
+                # Deferred: the agents pull in LangGraph, LangChain and the OpenAI SDK
+                from app.agents.orchestrator import Orchestrator
+                _orchestrator = Orchestrator()
+    return _orchestrator
+
+def get_github_service() -> GitHubService:
+    try:
+        return github_service.get()
+    except ConfigurationError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+def get_llm_service() -> LLMService:
+    return llm_service.get()
+
+def warm_up():
+    """Build the orchestrator and services ahead of the first request; a missing key is logged, not raised."""
+    get_orchestrator()
+    llm_service.get()
+    try:
+        github_service.get()
+    except ConfigurationError as e:
+        logger.warning(f"GitHub search unavailable: {e}")
+    if not settings.OPENAI_API_KEY:
+        logger.warning("OPENAI_API_KEY is not set; LLM scoring will fall back to the structural engine")
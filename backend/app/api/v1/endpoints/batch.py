@@ -0,0 +1,97 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from app.schemas.batch import BatchCheckResponse, FileReport
+from app.schemas.report import MatchInfo
+from app.api.deps import get_orchestrator
+from app.services.batch_checker import (
+    BatchLimitError,
+    collect_upload_sources,
+    deduplicate_blocks,
+    fan_out,
+    parse_sources
+)
+from app.utils.hashing import code_hash
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+router = APIRouter()
+
+def _index_files(orchestrator, parsed_files: List[Dict[str, Any]], assignment_id: Optional[str]):
+    for file in parsed_files:
+        if file["error"] is None:
+            orchestrator.index_submission(
+                code_hash(file["code"]),
+                file["blocks"],
+                submitter_id=file["filename"],
+                assignment_id=assignment_id
+            )
+
+@router.post("/upload/batch", response_model=BatchCheckResponse)
+async def check_batch(files: List[UploadFile] = File(...), assignment_id: Optional[str] = Form(None), orchestrator=Depends(get_orchestrator)):
+    """
+    Check a whole assignment at once.
+
+    Accepts several files in one multipart request and/or zip/tar archives of
+    .py files. Identical and near-identical blocks across all files are searched
+    and scored only once; the response has one report per file. With
+    assignment_id the assignment's starter code is excluded first.
+    """
+    try:
+        logger.info(f"Received batch upload with {len(files)} parts")
+
+        try:
+            sources = await collect_upload_sources(files)
+        except BatchLimitError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except Exception as e:
+            logger.error(f"Error reading batch upload: {e}")
+            raise HTTPException(status_code=400, detail=f"Error reading upload: {str(e)}")
+
+        if not sources:
+            raise HTTPException(status_code=400, detail="No Python files found in upload")
+
+        parsed_files = await asyncio.to_thread(parse_sources, sources)
+        all_blocks = [block for file in parsed_files for block in file["blocks"]]
+        # Fingerprinting every block is CPU-bound
+        representatives, assignment = await asyncio.to_thread(deduplicate_blocks, all_blocks)
+
+        logger.info(
+            f"Batch: {len(parsed_files)} files, {len(all_blocks)} blocks, "
+            f"{len(representatives)} unique after deduplication"
+        )
+
+        result = await orchestrator.aanalyze_blocks(representatives, assignment_id=assignment_id)
+        if not result["success"]:
+            return BatchCheckResponse(success=False, error=result.get("error", "Unknown error occurred"))
+
+        # Each file stands for one submitter; a batch with failed searches is not a reference for later checks
+        if not result["search_errors"]:
+            await asyncio.to_thread(_index_files, orchestrator, parsed_files, assignment_id)
+
+        reports = fan_out(parsed_files, assignment, result["comparisons"])
+
+        return BatchCheckResponse(
+            success=True,
+            total_files=len(parsed_files),
+            total_blocks=len(all_blocks),
+            unique_blocks=len(representatives),
+            files=[
+                FileReport(
+                    filename=report["filename"],
+                    success=report["success"],
+                    error=report["error"],
+                    comparisons=[MatchInfo.from_comparison(comp) for comp in report["comparisons"]]
+                )
+                for report in reports
+            ],
+            llm_usage=result["llm_usage"],
+            timings=result["timings"],
+            template=result["template"]
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in check_batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
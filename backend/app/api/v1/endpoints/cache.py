@@ -0,0 +1,27 @@
+from typing import Any, Dict
+from fastapi import APIRouter, Depends
+from app.api.deps import get_llm_service
+from app.core.exceptions import ConfigurationError
+from app.services.fingerprint_index import fingerprint_index
+from app.services.github_service import github_service
+from app.services.llm_service import LLMService
+from app.storage.ttl_cache import submission_cache, block_cache, check_history
+
+router = APIRouter()
+
+def _github_cache_stats() -> Dict[str, Any]:
+    try:
+        return github_service.cache_stats()
+    except ConfigurationError as e:
+        return {"enabled": False, "error": str(e)}
+
+@router.get("/cache/stats")
+async def cache_stats(llm_service: LLMService = Depends(get_llm_service)):
+    return {
+        "submissions": submission_cache.stats(),
+        "blocks": block_cache.stats(),
+        "checks": check_history.stats(),
+        "github": _github_cache_stats(),
+        "llm": llm_service.cache_stats(),
+        "fingerprint_index": fingerprint_index.stats()
+    }
@@ -1,46 +1,29 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from app.schemas.code_check import CodeCheckRequest
-from app.schemas.report import CheckResponse, MatchInfo
-from app.agents.orchestrator import Orchestrator
+from app.schemas.report import CheckResponse
+from app.api.deps import get_orchestrator
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 router = APIRouter()
-orchestrator = Orchestrator()
 
 @router.post("/check", response_model=CheckResponse)
-def check_code(request: CodeCheckRequest):
+async def check_code(request: CodeCheckRequest, orchestrator=Depends(get_orchestrator)):
     try:
         logger.info("Received code check request")
 
         if not request.code or not request.code.strip():
             raise HTTPException(status_code=400, detail="Code cannot be empty")
 
-        result = orchestrator.execute_pipeline(request.code)
-
-        if not result["success"]:
-            return CheckResponse(
-                success=False,
-                error=result.get("error", "Unknown error occurred")
-            )
-
-        comparisons_data = result.get("comparisons", [])
-        comparisons = [
-            MatchInfo(
-                block_name=comp["block_name"],
-                similarity_percent=comp.get("similarity_percent", 0),
-                source_repo=comp.get("source_repo"),
-                source_url=comp.get("source_url"),
-                reason=comp.get("reason")
-            )
-            for comp in comparisons_data
-        ]
-
-        return CheckResponse(
-            success=True,
-            comparisons=comparisons
+        result = await orchestrator.aexecute_pipeline(
+            request.code,
+            previous_check_id=request.previous_check_id,
+            assignment_id=request.assignment_id,
+            submitter_id=request.submitter_id
         )
 
+        return CheckResponse.from_pipeline_result(result)
+
     except HTTPException:
         raise
     except Exception as e:
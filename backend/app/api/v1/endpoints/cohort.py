@@ -0,0 +1,57 @@
+import asyncio
+from typing import List
+from fastapi import APIRouter, HTTPException, UploadFile, File
+from app.schemas.cohort import CohortRequest, CohortResponse
+from app.core.config import settings
+from app.services.batch_checker import BatchLimitError, collect_upload_sources
+from app.services.cohort_analyzer import cohort_analyzer
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+router = APIRouter()
+
+async def _analyze(sources) -> CohortResponse:
+    if len(sources) < 2:
+        raise HTTPException(status_code=400, detail="At least two submissions are needed")
+    if len(sources) > settings.COHORT_MAX_SUBMISSIONS:
+        raise HTTPException(status_code=413, detail=f"More than {settings.COHORT_MAX_SUBMISSIONS} submissions")
+
+    result = await asyncio.to_thread(cohort_analyzer.analyze, sources)
+    return CohortResponse(success=True, **result)
+
+@router.post("/cohort/analyze", response_model=CohortResponse)
+async def analyze_cohort(request: CohortRequest):
+    """
+    Find submissions that copy from each other.
+
+    Compares every submission against every other one (no GitHub or LLM calls)
+    and returns suspicious pairs and clusters of linked submissions.
+    """
+    try:
+        logger.info(f"Received cohort of {len(request.submissions)} submissions")
+        return await _analyze([(s.id, s.code) for s in request.submissions])
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in analyze_cohort: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/cohort/upload", response_model=CohortResponse)
+async def analyze_cohort_upload(files: List[UploadFile] = File(...)):
+    """Same as /cohort/analyze for multipart files and/or zip/tar archives; each .py file is one submission."""
+    try:
+        try:
+            sources = await collect_upload_sources(files)
+        except BatchLimitError as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except Exception as e:
+            logger.error(f"Error reading cohort upload: {e}")
+            raise HTTPException(status_code=400, detail=f"Error reading upload: {str(e)}")
+
+        logger.info(f"Received cohort upload with {len(sources)} Python files")
+        return await _analyze(sources)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in analyze_cohort_upload: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
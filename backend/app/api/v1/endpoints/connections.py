@@ -0,0 +1,9 @@
+from fastapi import APIRouter
+from app.services.http_clients import http_clients
+
+router = APIRouter()
+
+@router.get("/http/pools")
+async def http_pools():
+    """Requests, handshakes and connection utilization of the shared outbound HTTP clients."""
+    return http_clients.stats()
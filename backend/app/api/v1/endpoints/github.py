@@ -0,0 +1,10 @@
+from fastapi import APIRouter, Depends
+from app.api.deps import get_github_service
+from app.services.github_service import GitHubService
+
+router = APIRouter()
+
+@router.get("/github/rate-limit")
+async def github_rate_limit(github_service: GitHubService = Depends(get_github_service)):
+    """Remaining quota per configured token and how many searches are waiting for quota."""
+    return github_service.rate_limit_stats()
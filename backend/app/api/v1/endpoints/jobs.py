@@ -0,0 +1,107 @@
+import asyncio
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from app.schemas.code_check import CodeCheckRequest
+from app.schemas.job import JobSubmitResponse, JobStatusResponse
+from app.schemas.report import CheckResponse
+from app.api.deps import get_orchestrator
+from app.api.v1.endpoints.upload import read_code_file
+from app.core.config import settings
+from app.core.exceptions import JobQueueFullError
+from app.services.job_queue import JobQueue
+from app.storage.job_store import create_job_store
+from app.utils.lazy import LazyService
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+router = APIRouter()
+
+async def _run_pipeline(code: str, **kwargs) -> Dict[str, Any]:
+    # The first job may be the one that builds the orchestrator; do that off the event loop
+    orchestrator = await asyncio.to_thread(get_orchestrator)
+    return await orchestrator.aexecute_pipeline(code, **kwargs)
+
+def _build_job_queue() -> JobQueue:
+    return JobQueue(
+        create_job_store(),
+        _run_pipeline,
+        workers=settings.JOB_WORKERS,
+        max_size=settings.JOB_QUEUE_MAX_SIZE
+    )
+
+# Built when the app lifespan starts it, so importing the router does not open the job store
+_job_queue: LazyService[JobQueue] = LazyService(_build_job_queue)
+
+def get_job_queue() -> JobQueue:
+    return _job_queue.get()
+
+async def _submit(
+    job_queue: JobQueue,
+    code: str,
+    source: str = None,
+    previous_check_id: Optional[str] = None,
+    assignment_id: Optional[str] = None,
+    submitter_id: Optional[str] = None
+) -> JobSubmitResponse:
+    try:
+        job = await job_queue.submit(
+            code,
+            source=source,
+            previous_check_id=previous_check_id,
+            assignment_id=assignment_id,
+            submitter_id=submitter_id
+        )
+    except JobQueueFullError as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    return JobSubmitResponse(job_id=job["id"], status=job["status"])
+
+@router.post("/jobs", response_model=JobSubmitResponse, status_code=202)
+async def submit_check_job(request: CodeCheckRequest, job_queue: JobQueue = Depends(get_job_queue)):
+    """Queue a plagiarism check and return its job id immediately."""
+    if not request.code or not request.code.strip():
+        raise HTTPException(status_code=400, detail="Code cannot be empty")
+    return await _submit(
+        job_queue,
+        request.code,
+        previous_check_id=request.previous_check_id,
+        assignment_id=request.assignment_id,
+        submitter_id=request.submitter_id
+    )
+
+@router.post("/jobs/upload", response_model=JobSubmitResponse, status_code=202)
+async def submit_upload_job(
+    file: UploadFile = File(...),
+    previous_check_id: Optional[str] = Form(None),
+    assignment_id: Optional[str] = Form(None),
+    submitter_id: Optional[str] = Form(None),
+    job_queue: JobQueue = Depends(get_job_queue)
+):
+    """Queue a plagiarism check for an uploaded file and return its job id immediately."""
+    code = await read_code_file(file)
+    return await _submit(
+        job_queue,
+        code,
+        source=file.filename,
+        previous_check_id=previous_check_id,
+        assignment_id=assignment_id,
+        submitter_id=submitter_id
+    )
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job_status(job_id: str, job_queue: JobQueue = Depends(get_job_queue)):
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobStatusResponse.from_job(job)
+
+@router.get("/jobs/{job_id}/result", response_model=CheckResponse)
+async def get_job_result(job_id: str, job_queue: JobQueue = Depends(get_job_queue)):
+    job = await asyncio.to_thread(job_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["result"] is None:
+        if job["status"] == "failed":
+            return CheckResponse(success=False, error=job.get("error"))
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']}")
+    return CheckResponse(**job["result"])
@@ -0,0 +1,10 @@
+from fastapi import APIRouter, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from app.utils.metrics import registry
+
+router = APIRouter()
+
+@router.get("/metrics", response_class=Response)
+async def metrics():
+    """Stage, GitHub and LLM timings, counters and in-flight gauges in Prometheus text format."""
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
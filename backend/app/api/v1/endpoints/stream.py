@@ -0,0 +1,90 @@
+import json
+from typing import Any, AsyncIterator, Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from app.schemas.code_check import CodeCheckRequest
+from app.schemas.report import CheckResponse, MatchInfo
+from app.api.deps import get_orchestrator
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+router = APIRouter()
+
+async def _client_events(
+    orchestrator,
+    code: str,
+    previous_check_id: Optional[str] = None,
+    assignment_id: Optional[str] = None,
+    submitter_id: Optional[str] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """Pipeline events shaped for API clients: comparisons as MatchInfo, the final result as CheckResponse."""
+    events = orchestrator.astream_pipeline(
+        code,
+        previous_check_id=previous_check_id,
+        assignment_id=assignment_id,
+        submitter_id=submitter_id
+    )
+    async for event in events:
+        data = event["data"]
+        if event["event"] == "comparison":
+            data = {
+                "index": data["index"],
+                "comparison": MatchInfo.from_comparison(data["comparison"]).model_dump()
+            }
+        elif event["event"] == "done":
+            data = CheckResponse.from_pipeline_result(data).model_dump()
+        yield {"event": event["event"], "data": data}
+
+@router.post("/check/stream")
+async def check_code_stream(request: CodeCheckRequest, orchestrator=Depends(get_orchestrator)):
+    """
+    Check code for plagiarism and stream results as Server-Sent Events.
+
+    Emits `blocks` once the code is split, one `comparison` per block as soon as
+    that block has been searched and scored, and a final `done` event carrying
+    the full CheckResponse.
+    """
+    if not request.code or not request.code.strip():
+        raise HTTPException(status_code=400, detail="Code cannot be empty")
+
+    logger.info("Received streaming code check request")
+
+    async def sse():
+        try:
+            async for event in _client_events(orchestrator, request.code, request.previous_check_id, request.assignment_id, request.submitter_id):
+                yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+        except Exception as e:
+            logger.error(f"Unexpected error in check_code_stream: {e}")
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+
+    return StreamingResponse(
+        sse(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/check/ws")
+async def check_code_ws(websocket: WebSocket, orchestrator=Depends(get_orchestrator)):
+    """WebSocket variant of /check/stream: send {"code": ..., "assignment_id": ..., "submitter_id": ...}, receive the same events as JSON messages."""
+    await websocket.accept()
+    try:
+        payload = await websocket.receive_json()
+        code = payload.get("code", "")
+        if not code or not code.strip():
+            await websocket.send_json({"event": "error", "data": {"error": "Code cannot be empty"}})
+        else:
+            events = _client_events(
+                orchestrator,
+                code,
+                payload.get("previous_check_id"),
+                payload.get("assignment_id"),
+                payload.get("submitter_id")
+            )
+            async for event in events:
+                await websocket.send_json(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info("WebSocket client disconnected")
+    except Exception as e:
+        logger.error(f"Unexpected error in check_code_ws: {e}")
+        await websocket.close(code=1011)
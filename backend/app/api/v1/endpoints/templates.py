@@ -0,0 +1,48 @@
+import asyncio
+from typing import List
+from fastapi import APIRouter, HTTPException, Path, UploadFile, File
+from app.schemas.template import TemplateSummary
+from app.services.batch_checker import BatchLimitError, collect_upload_sources, parse_sources
+from app.services.template_index import template_store
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+router = APIRouter()
+
+ASSIGNMENT_ID = Path(..., pattern=r"^[A-Za-z0-9._-]{1,128}$")
+
+@router.post("/assignments/{assignment_id}/template", response_model=TemplateSummary)
+async def upload_template(files: List[UploadFile] = File(...), assignment_id: str = ASSIGNMENT_ID):
+    """
+    Upload the starter code of an assignment.
+
+    Accepts .py files and/or zip/tar archives, like /upload/batch. Checks sent
+    with this assignment_id skip blocks that are starter code and search only
+    what the student added. A new upload replaces the previous template.
+    """
+    try:
+        sources = await collect_upload_sources(files)
+    except BatchLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error reading template upload: {e}")
+        raise HTTPException(status_code=400, detail=f"Error reading upload: {str(e)}")
+
+    if not sources:
+        raise HTTPException(status_code=400, detail="No Python files found in upload")
+
+    parsed_files = await asyncio.to_thread(parse_sources, sources)
+    template = await asyncio.to_thread(template_store.save, assignment_id, parsed_files)
+    return TemplateSummary(**template.summary())
+
+@router.get("/assignments/{assignment_id}/template", response_model=TemplateSummary)
+async def get_template(assignment_id: str = ASSIGNMENT_ID):
+    template = await asyncio.to_thread(template_store.get, assignment_id)
+    if template is None:
+        raise HTTPException(status_code=404, detail=f"No template uploaded for assignment '{assignment_id}'")
+    return TemplateSummary(**template.summary())
+
+@router.delete("/assignments/{assignment_id}/template", status_code=204)
+async def delete_template(assignment_id: str = ASSIGNMENT_ID):
+    if not await asyncio.to_thread(template_store.delete, assignment_id):
+        raise HTTPException(status_code=404, detail=f"No template uploaded for assignment '{assignment_id}'")
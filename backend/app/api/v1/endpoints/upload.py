@@ -1,77 +1,78 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File
-from app.schemas.report import CheckResponse, MatchInfo
-from app.agents.orchestrator import Orchestrator
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from app.schemas.report import CheckResponse
+from app.api.deps import get_orchestrator
 from app.utils.logger import get_logger
 
 logger = get_logger(__name__)
 router = APIRouter()
-orchestrator = Orchestrator()
+
+async def read_code_file(file: UploadFile) -> str:
+    """Read an uploaded file as UTF-8 code, raising 400 for missing, binary or empty files."""
+    # Validate file
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="No file provided")
+    
+    # Read file content
+    try:
+        content = await file.read()
+        code = content.decode('utf-8')
+    except UnicodeDecodeError:
+        raise HTTPException(
+            status_code=400, 
+            detail="File must be a text file with UTF-8 encoding"
+        )
+    except Exception as e:
+        logger.error(f"Error reading file: {e}")
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Error reading file: {str(e)}"
+        )
+    
+    # Validate code content
+    if not code or not code.strip():
+        raise HTTPException(status_code=400, detail="File is empty or contains no code")
+
+    return code
 
 @router.post("/upload", response_model=CheckResponse)
-async def check_code_from_file(file: UploadFile = File(...)):
+async def check_code_from_file(
+    file: UploadFile = File(...),
+    previous_check_id: Optional[str] = Form(None),
+    assignment_id: Optional[str] = Form(None),
+    submitter_id: Optional[str] = Form(None),
+    orchestrator=Depends(get_orchestrator)
+):
     """
     Upload a file and check its code for plagiarism.
     
     Accepts text files (preferably Python .py files) and processes them
-    using the same pipeline as the /check endpoint.
+    using the same pipeline as the /check endpoint. Pass previous_check_id to
+    re-check only the blocks changed since that check, assignment_id to
+    exclude that assignment's starter code, and submitter_id so that matches
+    with earlier submissions are reported only across submitters.
     """
     try:
         logger.info(f"Received file upload request: {file.filename}")
         
-        # Validate file
-        if not file.filename:
-            raise HTTPException(status_code=400, detail="No file provided")
-        
-        # Read file content
-        try:
-            content = await file.read()
-            code = content.decode('utf-8')
-        except UnicodeDecodeError:
-            raise HTTPException(
-                status_code=400, 
-                detail="File must be a text file with UTF-8 encoding"
-            )
-        except Exception as e:
-            logger.error(f"Error reading file: {e}")
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Error reading file: {str(e)}"
-            )
-        
-        # Validate code content
-        if not code or not code.strip():
-            raise HTTPException(status_code=400, detail="File is empty or contains no code")
+        code = await read_code_file(file)
         
         logger.info(f"Processing file {file.filename} with {len(code)} characters")
         
         # Execute the same pipeline as /check endpoint
-        result = orchestrator.execute_pipeline(code)
-        
-        if not result["success"]:
-            return CheckResponse(
-                success=False,
-                error=result.get("error", "Unknown error occurred")
-            )
-        
-        # Process comparisons
-        comparisons_data = result.get("comparisons", [])
-        comparisons = [
-            MatchInfo(
-                block_name=comp["block_name"],
-                similarity_percent=comp.get("similarity_percent", 0),
-                source_repo=comp.get("source_repo"),
-                source_url=comp.get("source_url"),
-                reason=comp.get("reason")
-            )
-            for comp in comparisons_data
-        ]
-        
-        logger.info(f"Successfully processed file {file.filename} with {len(comparisons)} comparisons")
-        
-        return CheckResponse(
-            success=True,
-            comparisons=comparisons
+        result = await orchestrator.aexecute_pipeline(
+            code,
+            previous_check_id=previous_check_id,
+            assignment_id=assignment_id,
+            submitter_id=submitter_id
         )
+        
+        response = CheckResponse.from_pipeline_result(result)
+
+        if response.success:
+            logger.info(f"Successfully processed file {file.filename} with {len(response.comparisons)} comparisons")
+
+        return response
     
     except HTTPException:
         raise
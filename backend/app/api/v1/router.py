@@ -1,8 +1,17 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import health, check, upload
+from app.api.v1.endpoints import health, check, upload, batch, cohort, cache, github, jobs, stream, connections, metrics, templates
 
 router = APIRouter(prefix="/api/v1")
 
 router.include_router(health.router, tags=["health"])
 router.include_router(check.router, tags=["plagiarism"])
 router.include_router(upload.router, tags=["plagiarism"])
+router.include_router(batch.router, tags=["plagiarism"])
+router.include_router(stream.router, tags=["plagiarism"])
+router.include_router(cohort.router, tags=["cohort"])
+router.include_router(templates.router, tags=["templates"])
+router.include_router(jobs.router, tags=["jobs"])
+router.include_router(cache.router, tags=["cache"])
+router.include_router(github.router, tags=["github"])
+router.include_router(connections.router, tags=["http"])
+router.include_router(metrics.router, tags=["metrics"])
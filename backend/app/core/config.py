@@ -1,12 +1,88 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
-    OPENAI_API_KEY: str
-    OPENAI_API_BASE_URL: str = None
-    PROXY: str = None
-    GITHUB_TOKEN: str
+    # Optional at import time; the services that need them report a missing key on first use
+    OPENAI_API_KEY: str = ""
+    OPENAI_API_BASE_URL: Optional[str] = None
+    PROXY: Optional[str] = None
+    GITHUB_TOKEN: str = ""
     GITHUB_API_URL: str = "https://api.github.com"
     LOG_LEVEL: str = "INFO"
+    WARMUP_ON_STARTUP: bool = True
+    PARSE_GRANULARITY: str = "method"
+    GITHUB_TOKENS: str = ""
+    GITHUB_RATE_LIMIT_MAX_WAIT_SECONDS: float = 30.0
+    GITHUB_SEARCH_MIN_INTERVAL_SECONDS: float = 0.0
+    GITHUB_SEARCH_CONCURRENCY: int = 4
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    HTTP_TIMEOUT_SECONDS: float = 30.0
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 10.0
+    HTTP2_ENABLED: bool = False
+    QUERY_MIN_USEFULNESS: float = 0.35
+    QUERY_MIN_TOKENS: int = 12
+    QUERY_MAX_TERMS: int = 4
+    QUERY_BATCH_SIZE: int = 1
+    SIMILARITY_MODE: str = "serial"
+    LLM_CONCURRENCY: int = 4
+    LLM_TIMEOUT_SECONDS: float = 120.0
+    LLM_BATCH_SIZE: int = 5
+    LLM_PROMPT_TOKEN_BUDGET: int = 1200
+    LLM_TOKENIZER_ENCODING: str = "o200k_base"
+    LLM_STRUCTURED_OUTPUT: bool = True
+    LLM_MAX_RETRIES: int = 3
+    LLM_RETRY_BASE_SECONDS: float = 1.0
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_PATH: str = ".cache/llm_cache.sqlite3"
+    LLM_CACHE_TTL_SECONDS: int = 2592000
+    LLM_CACHE_MAX_ENTRIES: int = 100000
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_TTL_SECONDS: int = 3600
+    RESULT_CACHE_MAX_SUBMISSIONS: int = 500
+    RESULT_CACHE_MAX_BLOCKS: int = 10000
+    CHECK_HISTORY_TTL_SECONDS: int = 604800
+    CHECK_HISTORY_MAX_SIZE: int = 5000
+    GITHUB_CACHE_ENABLED: bool = True
+    GITHUB_CACHE_PATH: str = ".cache/github_cache.sqlite3"
+    GITHUB_CACHE_TTL_SECONDS: int = 86400
+    GITHUB_CACHE_STALE_SECONDS: int = 604800
+    GITHUB_CACHE_MAX_ENTRIES: int = 50000
+    GITHUB_MAX_FILE_CHARS: int = 200000
+    FINGERPRINT_ENABLED: bool = True
+    FINGERPRINT_K: int = 5
+    FINGERPRINT_WINDOW: int = 4
+    FINGERPRINT_MATCH_THRESHOLD: float = 0.8
+    FINGERPRINT_MIN_FINGERPRINTS: int = 5
+    FINGERPRINT_MAX_DOCS: int = 100000
+    SINGLEFLIGHT_ENABLED: bool = True
+    TEMPLATE_STORE_PATH: str = ".cache/templates.sqlite3"
+    TEMPLATE_TTL_SECONDS: int = 31536000
+    TEMPLATE_MAX_ASSIGNMENTS: int = 1000
+    TEMPLATE_MATCH_THRESHOLD: float = 0.9
+    STRUCTURAL_ENGINE_ENABLED: bool = True
+    STRUCTURAL_HIGH_THRESHOLD: int = 85
+    STRUCTURAL_LOW_THRESHOLD: int = 20
+    CANDIDATE_TOP_K: int = 1
+    CANDIDATE_MIN_SCORE: int = 20
+    JOB_WORKERS: int = 2
+    JOB_QUEUE_MAX_SIZE: int = 100
+    JOB_RESULT_TTL_SECONDS: int = 86400
+    JOB_STORE_BACKEND: str = "memory"
+    JOB_STORE_PATH: str = ".cache/jobs.sqlite3"
+    JOB_HEARTBEAT_SECONDS: float = 10
+    BATCH_MAX_FILES: int = 500
+    BATCH_MAX_FILE_BYTES: int = 1000000
+    BATCH_PARSE_WORKERS: int = 0
+    BATCH_DEDUP_THRESHOLD: float = 0.9
+    COHORT_MAX_SUBMISSIONS: int = 5000
+    COHORT_WORKERS: int = 0
+    COHORT_MAX_DOC_FREQUENCY: float = 0.5
+    COHORT_DOC_FREQUENCY_MIN_SUBMISSIONS: int = 20
+    COHORT_MAX_POSTINGS: int = 1000
+    COHORT_CANDIDATE_THRESHOLD: float = 0.5
+    COHORT_SIMILARITY_THRESHOLD: int = 70
 
     class Config:
         env_file = ".env"
@@ -7,5 +7,14 @@ class CodeParseError(AgentError):
 class GitHubSearchError(AgentError):
     pass
 
+class GitHubRateLimitError(GitHubSearchError):
+    pass
+
 class LLMError(AgentError):
     pass
+
+class JobQueueFullError(Exception):
+    pass
+
+class ConfigurationError(Exception):
+    pass
@@ -1,11 +1,40 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1.router import router
+from app.api.deps import warm_up
+from app.api.v1.endpoints.jobs import get_job_queue
+from app.core.config import settings
+from app.services.http_clients import http_clients
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+async def _warm_up():
+    try:
+        await asyncio.to_thread(warm_up)
+        http_clients.open()
+    except Exception as e:
+        logger.error(f"Service warm-up failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    job_queue = get_job_queue()
+    await job_queue.start()
+    # Services are built lazily; warming them in the background lets the worker accept requests at once
+    warmup = asyncio.create_task(_warm_up()) if settings.WARMUP_ON_STARTUP else None
+    yield
+    if warmup is not None:
+        await warmup
+    await job_queue.stop()
+    await http_clients.aclose()
 
 app = FastAPI(
     title="Plagiarism Detector API",
     description="AI-powered plagiarism detection using 5 specialized agents",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
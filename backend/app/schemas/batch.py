@@ -0,0 +1,20 @@
+from pydantic import BaseModel
+from typing import List, Optional
+from app.schemas.report import LLMUsage, MatchInfo, StageTimings, TemplateExclusion
+
+class FileReport(BaseModel):
+    filename: str
+    success: bool
+    comparisons: List[MatchInfo] = []
+    error: Optional[str] = None
+
+class BatchCheckResponse(BaseModel):
+    success: bool
+    total_files: int = 0
+    total_blocks: int = 0
+    unique_blocks: int = 0
+    files: List[FileReport] = []
+    llm_usage: Optional[LLMUsage] = None
+    timings: Optional[StageTimings] = None
+    template: Optional[TemplateExclusion] = None
+    error: Optional[str] = None
@@ -1,7 +1,11 @@
+from typing import Optional
 from pydantic import BaseModel, Field
 
 class CodeCheckRequest(BaseModel):
     code: str = Field(..., description="Python code to check for plagiarism")
+    previous_check_id: Optional[str] = Field(None, description="check_id of an earlier check of this submission; unchanged blocks reuse its results")
+    assignment_id: Optional[str] = Field(None, description="Assignment whose uploaded starter code is excluded before searching")
+    submitter_id: Optional[str] = Field(None, description="Who submitted the code, e.g. a student id; their own earlier submissions never count as a match")
 
     class Config:
         json_schema_extra = {
@@ -0,0 +1,44 @@
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+
+class CohortSubmission(BaseModel):
+    id: str = Field(..., description="Student or file identifier")
+    code: str = Field(..., description="Python code of the submission")
+
+class CohortRequest(BaseModel):
+    submissions: List[CohortSubmission] = Field(..., min_length=2)
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "submissions": [
+                    {"id": "alice", "code": "def add(a, b):\n    return a + b"},
+                    {"id": "bob", "code": "def plus(x, y):\n    return x + y"}
+                ]
+            }
+        }
+
+class BlockMatch(BaseModel):
+    block_a: str
+    block_b: str
+    similarity_percent: int
+
+class SubmissionPair(BaseModel):
+    submission_a: str
+    submission_b: str
+    similarity_percent: int
+    matches: List[BlockMatch] = []
+
+class Cluster(BaseModel):
+    submissions: List[str]
+    max_similarity_percent: int
+
+class CohortResponse(BaseModel):
+    success: bool
+    total_submissions: int = 0
+    total_blocks: int = 0
+    candidate_pairs: int = 0
+    pairs: List[SubmissionPair] = []
+    clusters: List[Cluster] = []
+    errors: Dict[str, str] = {}
+    error: Optional[str] = None
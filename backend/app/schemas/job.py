@@ -0,0 +1,31 @@
+from pydantic import BaseModel
+from typing import Any, Dict, Optional
+
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str
+    source: Optional[str] = None
+    stage: Optional[str] = None
+    progress: Dict[str, Any] = {}
+    error: Optional[str] = None
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @classmethod
+    def from_job(cls, job: Dict[str, Any]) -> "JobStatusResponse":
+        return cls(
+            job_id=job["id"],
+            status=job["status"],
+            source=job.get("source"),
+            stage=job.get("stage"),
+            progress=job.get("progress") or {},
+            error=job.get("error"),
+            created_at=job["created_at"],
+            started_at=job.get("started_at"),
+            finished_at=job.get("finished_at")
+        )
@@ -0,0 +1,15 @@
+from pydantic import BaseModel, Field
+from typing import List
+
+class SimilarityVerdict(BaseModel):
+    """Structured reply for one compared pair."""
+    similarity_percent: int = Field(ge=0, le=100)
+    is_suspicious: bool
+    reason: str
+
+class IndexedVerdict(SimilarityVerdict):
+    index: int
+
+class BatchVerdicts(BaseModel):
+    """Structured reply for a batch prompt, one entry per pair."""
+    results: List[IndexedVerdict]
@@ -1,5 +1,20 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
+
+class Candidate(BaseModel):
+    repo: str = ""
+    path: str = ""
+    url: str = ""
+    lines: Optional[List[int]] = None
+    local_score: int = 0
+
+class SubmissionMatch(BaseModel):
+    """An earlier submission by another submitter that shares most of a block's fingerprints."""
+    submitter_id: Optional[str] = None
+    assignment_id: Optional[str] = None
+    check_id: Optional[str] = None
+    block_name: Optional[str] = None
+    similarity_percent: int = 0
 
 class MatchInfo(BaseModel):
     block_name: str
@@ -7,8 +22,80 @@ class MatchInfo(BaseModel):
     source_repo: Optional[str] = None
     source_url: Optional[str] = None
     reason: Optional[str] = None
+    cached: bool = False
+    reused: bool = False
+    engine: Optional[str] = None
+    search_error: Optional[str] = None
+    candidates: List[Candidate] = []
+    matched_submission: Optional[SubmissionMatch] = None
+
+    @classmethod
+    def from_comparison(cls, comp: Dict[str, Any]) -> "MatchInfo":
+        return cls(
+            block_name=comp["block_name"],
+            similarity_percent=comp.get("similarity_percent", 0),
+            source_repo=comp.get("source_repo"),
+            source_url=comp.get("source_url"),
+            reason=comp.get("reason"),
+            cached=comp.get("cached", False),
+            reused=comp.get("reused", False),
+            engine=comp.get("engine"),
+            search_error=comp.get("search_error"),
+            candidates=comp.get("candidates", []),
+            matched_submission=comp.get("matched_submission")
+        )
+
+class LLMUsage(BaseModel):
+    calls: int = 0
+    cache_hits: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    llm_ms: float = 0.0
+
+class StageTimings(BaseModel):
+    """Wall time per pipeline stage and for the whole check, in milliseconds."""
+    stages: Dict[str, float] = {}
+    total_ms: float = 0.0
+
+class TemplateExclusion(BaseModel):
+    """What the assignment's starter-code template removed before the external searches."""
+    assignment_id: str
+    version: str
+    blocks_excluded: int = 0
+    blocks_trimmed: int = 0
+    lines_removed: int = 0
 
 class CheckResponse(BaseModel):
     success: bool
     comparisons: List[MatchInfo] = []
     error: Optional[str] = None
+    cached: bool = False
+    # Shared with an identical check that was already running
+    coalesced: bool = False
+    check_id: Optional[str] = None
+    llm_usage: Optional[LLMUsage] = None
+    timings: Optional[StageTimings] = None
+    template: Optional[TemplateExclusion] = None
+
+    @classmethod
+    def from_pipeline_result(cls, result: Dict[str, Any]) -> "CheckResponse":
+        if not result["success"]:
+            return cls(
+                success=False,
+                error=result.get("error", "Unknown error occurred"),
+                timings=result.get("timings")
+            )
+
+        comparisons = [MatchInfo.from_comparison(comp) for comp in result.get("comparisons", [])]
+
+        return cls(
+            success=True,
+            comparisons=comparisons,
+            cached=result.get("cached", False),
+            coalesced=result.get("coalesced", False),
+            check_id=result.get("check_id"),
+            llm_usage=result.get("llm_usage"),
+            timings=result.get("timings"),
+            template=result.get("template")
+        )
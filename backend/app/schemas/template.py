@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+from typing import List
+
+class TemplateSummary(BaseModel):
+    """An uploaded starter-code template as stored for its assignment."""
+    assignment_id: str
+    version: str
+    files: List[str] = []
+    blocks: int = 0
+    lines: int = 0
+    fingerprints: int = 0
+    uploaded_at: float
@@ -0,0 +1,165 @@
+import asyncio
+import tarfile
+import zipfile
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+from app.core.config import settings
+from app.services.code_parser import code_parser
+from app.services.fingerprint_index import FingerprintIndex, containment, fingerprint
+from app.utils.hashing import code_hash
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+class BatchLimitError(Exception):
+    pass
+
+def is_archive(filename: str) -> bool:
+    return (filename or "").lower().endswith(ARCHIVE_SUFFIXES)
+
+def _decode(name: str, data: bytes) -> Tuple[str, Any]:
+    try:
+        return name, data.decode("utf-8")
+    except UnicodeDecodeError:
+        return name, None
+
+def iter_archive_sources(fileobj: BinaryIO, filename: str, max_files: Optional[int] = None) -> Iterator[Tuple[str, Any]]:
+    """
+    Yield (member_name, code) for every .py member of a zip or tar archive, one
+    member at a time. Tar archives are read as a stream; zip archives are read
+    member by member from the central directory. code is None for members that
+    are not UTF-8 text. More than max_files (default BATCH_MAX_FILES) .py members
+    raise BatchLimitError.
+    """
+    max_bytes = settings.BATCH_MAX_FILE_BYTES
+    max_files = settings.BATCH_MAX_FILES if max_files is None else max_files
+    count = 0
+
+    if filename.lower().endswith(".zip"):
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not info.filename.endswith(".py"):
+                    continue
+                count += 1
+                if count > max_files:
+                    raise BatchLimitError(f"More than {settings.BATCH_MAX_FILES} Python files in one batch")
+                if info.file_size > max_bytes:
+                    yield info.filename, None
+                    continue
+                with archive.open(info) as member:
+                    yield _decode(info.filename, member.read(max_bytes + 1)[:max_bytes])
+        return
+
+    with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+        for member in archive:
+            if not member.isfile() or not member.name.endswith(".py"):
+                continue
+            count += 1
+            if count > max_files:
+                raise BatchLimitError(f"More than {settings.BATCH_MAX_FILES} Python files in one batch")
+            if member.size > max_bytes:
+                yield member.name, None
+                continue
+            extracted = archive.extractfile(member)
+            yield _decode(member.name, extracted.read() if extracted else b"")
+
+async def collect_upload_sources(files: List[Any]) -> List[Tuple[str, Any]]:
+    """Read (filename, code) pairs from uploaded files, expanding archives; code is None for unreadable files."""
+    sources = []
+    for file in files:
+        if is_archive(file.filename):
+            # Starlette spools large uploads to disk; members are read one at a time from there.
+            # Each archive may only fill what earlier files left of the batch limit.
+            room = settings.BATCH_MAX_FILES - len(sources)
+            sources.extend(await asyncio.to_thread(lambda f=file: list(iter_archive_sources(f.file, f.filename, room))))
+        else:
+            content = await file.read(settings.BATCH_MAX_FILE_BYTES + 1)
+            if len(content) > settings.BATCH_MAX_FILE_BYTES:
+                sources.append((file.filename, None))
+            else:
+                try:
+                    sources.append((file.filename, content.decode("utf-8")))
+                except UnicodeDecodeError:
+                    sources.append((file.filename, None))
+
+        # The limit is per request: several archives must not add up past it
+        if len(sources) > settings.BATCH_MAX_FILES:
+            raise BatchLimitError(f"More than {settings.BATCH_MAX_FILES} files in one batch")
+    return sources
+
+def deduplicate_blocks(blocks: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[int]]:
+    """
+    Collapse identical (same normalized hash) and near-identical (mutual fingerprint
+    containment >= BATCH_DEDUP_THRESHOLD) blocks. Returns the representative blocks
+    and, for every input block, the index of its representative.
+    """
+    representatives: List[Dict[str, Any]] = []
+    rep_fingerprints: List[set] = []
+    by_hash: Dict[str, int] = {}
+    index = FingerprintIndex(max_docs=max(1, len(blocks)))
+    assignment = []
+
+    for block in blocks:
+        block_hash = block.setdefault("hash", code_hash(block["code"]))
+        if block_hash in by_hash:
+            assignment.append(by_hash[block_hash])
+            continue
+
+        fingerprints = fingerprint(block["code"], tokens=block.get("tokens"))
+        rep_index = None
+        if len(fingerprints) >= settings.FINGERPRINT_MIN_FINGERPRINTS:
+            for candidate in index.query(fingerprints, limit=3):
+                candidate_index = candidate["meta"]["rep"]
+                if (candidate["score"] >= settings.BATCH_DEDUP_THRESHOLD
+                        and containment(rep_fingerprints[candidate_index], fingerprints) >= settings.BATCH_DEDUP_THRESHOLD):
+                    rep_index = candidate_index
+                    break
+
+        if rep_index is None:
+            rep_index = len(representatives)
+            representatives.append(block)
+            rep_fingerprints.append(fingerprints)
+            index.add(str(rep_index), fingerprints, {"rep": rep_index})
+
+        by_hash[block_hash] = rep_index
+        assignment.append(rep_index)
+
+    return representatives, assignment
+
+def parse_sources(sources: List[Tuple[str, Any]]) -> List[Dict[str, Any]]:
+    """Parse every readable source in a process pool; returns one entry per source with filename, code, blocks, error."""
+    readable = [i for i, (_, code) in enumerate(sources) if code is not None and code.strip()]
+    parsed = code_parser.parse_many([sources[i][1] for i in readable], max_workers=settings.BATCH_PARSE_WORKERS or None)
+    parsed_by_position = dict(zip(readable, parsed))
+
+    files = []
+    for i, (name, code) in enumerate(sources):
+        if code is None:
+            files.append({"filename": name, "code": None, "blocks": [], "error": "File is not UTF-8 text or exceeds the size limit"})
+        elif not code.strip():
+            files.append({"filename": name, "code": code, "blocks": [], "error": "File is empty or contains no code"})
+        else:
+            result = parsed_by_position[i]
+            files.append({"filename": name, "code": code, "blocks": result["blocks"], "error": result["error"]})
+    return files
+
+def fan_out(files: List[Dict[str, Any]], assignment: List[int], rep_comparisons: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Copy each representative's comparison back onto every block it stands for, per file."""
+    position = 0
+    reports = []
+    for file in files:
+        comparisons = []
+        for block in file["blocks"]:
+            comparison = dict(rep_comparisons[assignment[position]])
+            comparison["block_name"] = block["name"]
+            comparison["block_type"] = block["type"]
+            comparisons.append(comparison)
+            position += 1
+        reports.append({
+            "filename": file["filename"],
+            "success": file["error"] is None,
+            "error": file["error"],
+            "comparisons": comparisons
+        })
+    return reports
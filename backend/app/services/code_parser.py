@@ -1,60 +1,259 @@
 import ast
-from typing import List, Dict, Any
+import builtins
+import keyword
+import os
+import re
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from app.utils.hashing import token_hash
 from app.utils.logger import get_logger
+from app.core.config import settings
 from app.core.exceptions import CodeParseError
 
 logger = get_logger(__name__)
 
+_TOKEN_PATTERN = re.compile(
+    r"""(?P<comment>\#[^\n]*)
+    |(?P<string>[rRbBuUfF]{0,2}(?:\"\"\"[\s\S]*?(?:\"\"\"|$)|\'\'\'[\s\S]*?(?:\'\'\'|$)|"(?:\\.|[^"\\\n])*"?|'(?:\\.|[^'\\\n])*'?))
+    |(?P<number>\d[\d_]*(?:\.\d*)?(?:[eE][+-]?\d+)?[jJ]?|\.\d+)
+    |(?P<name>[A-Za-z_]\w*)
+    |(?P<op>\*\*=?|//=?|>>=?|<<=?|->|:=|[-+*/%&|^@=<>!]=|[-+*/%&|^~@=<>()\[\]{}:;,.])
+    """,
+    re.VERBOSE
+)
+_KEPT_NAMES = frozenset(keyword.kwlist) | frozenset(dir(builtins))
+_LINE_BREAK = re.compile(r"\r\n|\r|\n")
+
+GRANULARITIES = ("module", "top_level", "class", "method")
+
+def _normalize_token(match: "re.Match") -> Optional[str]:
+    kind = match.lastgroup
+    if kind == "comment":
+        return None
+    if kind == "string":
+        return "S"
+    if kind == "number":
+        return "N"
+    if kind == "name":
+        value = match.group()
+        return value if value in _KEPT_NAMES else "V"
+    return match.group()
+
+def _child_bodies(node: ast.AST) -> Iterator[List[ast.stmt]]:
+    """Statement lists directly under a compound statement (if/for/while/try/with/match)."""
+    for field in ("body", "orelse", "finalbody"):
+        body = getattr(node, field, None)
+        if isinstance(body, list):
+            yield body
+    for handler in getattr(node, "handlers", None) or []:
+        yield handler.body
+    for case in getattr(node, "cases", None) or []:
+        yield case.body
+
+def _is_definition(node: ast.stmt) -> bool:
+    return isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+
+def _class_statements(node: ast.ClassDef) -> List[ast.stmt]:
+    """Class-level statements besides definitions, ignoring the docstring and bare pass/...; what a split class leaves behind."""
+    statements = []
+    for index, child in enumerate(node.body):
+        if _is_definition(child) or isinstance(child, ast.Pass):
+            continue
+        if isinstance(child, ast.Expr) and isinstance(child.value, ast.Constant) and (
+            child.value.value is Ellipsis or (index == 0 and isinstance(child.value.value, str))
+        ):
+            continue
+        statements.append(child)
+    return statements
+
+def _iter_definitions(body: List[ast.stmt], granularity: str, parent: Optional[str] = None) -> Iterator[Tuple[ast.AST, Optional[str], bool]]:
+    """
+    Yield (node, enclosing class name, split) for every block to emit, outermost
+    first, without descending into functions. split is True for a class that is
+    emitted as its methods; its own block then holds only its class-level statements.
+    """
+    for node in body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            yield node, parent, False
+        elif isinstance(node, ast.ClassDef):
+            if granularity == "method" and any(_is_definition(child) for child in node.body):
+                qualified = f"{parent}.{node.name}" if parent else node.name
+                yield node, qualified, True
+                yield from _iter_definitions(node.body, granularity, qualified)
+            else:
+                yield node, None, False
+        elif granularity != "top_level" and parent is None:
+            for child_body in _child_bodies(node):
+                yield from _iter_definitions(child_body, granularity)
+
+class _Source:
+    """
+    Source text with a precomputed line-start table and a single normalized
+    token pass, so every block is sliced and tokenized without rescanning the file.
+    """
+
+    def __init__(self, code: str):
+        self.code = code
+        self.line_starts = [0] + [m.end() for m in _LINE_BREAK.finditer(code)]
+        self.line_count = len(self.line_starts)
+        # A trailing line break does not start another line
+        self.last_line = max(1, self.line_count - 1 if self.line_starts[-1] == len(code) else self.line_count)
+        self.token_starts: List[int] = []
+        self.tokens: List[str] = []
+        for match in _TOKEN_PATTERN.finditer(code):
+            token = _normalize_token(match)
+            if token is not None:
+                self.token_starts.append(match.start())
+                self.tokens.append(token)
+
+    def _offset(self, lineno: int, col: int) -> int:
+        start = self.line_starts[lineno - 1]
+        end = self.line_starts[lineno] if lineno < self.line_count else len(self.code)
+        line = self.code[start:end]
+        # ast columns are UTF-8 byte offsets
+        if not line.isascii():
+            col = len(line.encode("utf-8")[:col].decode("utf-8", errors="ignore"))
+        return start + col
+
+    def span(self, node: ast.AST) -> Tuple[int, int]:
+        return self._offset(node.lineno, node.col_offset), self._offset(node.end_lineno, node.end_col_offset)
+
+    def _tokens(self, start: int, end: int) -> List[str]:
+        return self.tokens[bisect_left(self.token_starts, start):bisect_left(self.token_starts, end)]
+
+    def block(self, block_type: str, name: str, signature: str, start: int, end: int, lines: Tuple[int, int]) -> Dict[str, Any]:
+        return self._block(block_type, name, signature, self.code[start:end], self._tokens(start, end), lines)
+
+    def class_statements(self, node: ast.ClassDef, name: str) -> Optional[Dict[str, Any]]:
+        """Block of a split class: its header and class-level statements, without the methods emitted on their own."""
+        statements = _class_statements(node)
+        if not statements:
+            return None
+
+        start, _ = self.span(node)
+        # The header runs up to the line of the first statement in the body
+        segments = [(start, self.line_starts[node.body[0].lineno - 1])]
+        for statement in statements:
+            segments.append((self.line_starts[statement.lineno - 1], self.span(statement)[1]))
+
+        code = "\n".join(self.code[s:e].rstrip() for s, e in segments)
+        tokens = [token for s, e in segments for token in self._tokens(s, e)]
+        lines = (node.lineno, statements[-1].end_lineno)
+        return self._block("class", name, f"class {node.name}(...)", code, tokens, lines)
+
+    def _block(self, block_type: str, name: str, signature: str, code: str, tokens: List[str], lines: Tuple[int, int]) -> Dict[str, Any]:
+        return {
+            "type": block_type,
+            "name": name,
+            "code": code,
+            "lines": lines,
+            "signature": signature,
+            "tokens": tokens,
+            "structural_hash": token_hash(tokens)
+        }
+
 class CodeParser:
     @staticmethod
-    def parse_code(code: str) -> List[Dict[str, Any]]:
+    def normalized_tokens(code: str) -> List[str]:
+        """
+        Lexical token stream that is invariant to identifier renaming, literal
+        values, comments and layout. Works on truncated or invalid snippets too.
+        """
+        tokens = []
+        for match in _TOKEN_PATTERN.finditer(code):
+            token = _normalize_token(match)
+            if token is not None:
+                tokens.append(token)
+        return tokens
+
+    @staticmethod
+    def lexical_tokens(code: str) -> List[str]:
+        """Token text without comments or layout; unlike normalized_tokens, names and literals are kept."""
+        return [match.group() for match in _TOKEN_PATTERN.finditer(code) if match.lastgroup != "comment"]
+
+    @staticmethod
+    def parse_code(code: str, granularity: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Split code into blocks in a single pass over the module body.
+
+        granularity: "module" (the whole file), "top_level" (module-level functions
+        and classes), "class" (also definitions under module-level if/try/with, with
+        classes kept whole) or "method" (like "class", but classes are split into
+        their methods, plus one "class" block of their class-level statements when
+        there are any). Blocks never overlap: nested functions stay inside their
+        parent. Every block carries its normalized token stream and a structural hash.
+        """
+        granularity = (granularity or settings.PARSE_GRANULARITY).lower()
+        if granularity not in GRANULARITIES:
+            logger.warning(f"Unknown granularity '{granularity}', falling back to method")
+            granularity = "method"
+
         try:
             tree = ast.parse(code)
         except SyntaxError as e:
             logger.error(f"Syntax error in code: {e}")
             raise CodeParseError(f"Invalid Python code: {e}")
 
+        return CodeParser.blocks_from_tree(code, tree, granularity)
+
+    @staticmethod
+    def blocks_from_tree(code: str, tree: ast.Module, granularity: str, raw_fallback: bool = True) -> List[Dict[str, Any]]:
+        """parse_code for a caller that already holds the parsed tree. Without raw_fallback, code with no definitions gives []."""
+        source = _Source(code)
+
+        if granularity == "module":
+            return [source.block("module", "module", "module", 0, len(code), (1, source.last_line))]
+
         blocks = []
+        for node, parent, split in _iter_definitions(tree.body, granularity):
+            try:
+                if split:
+                    block = source.class_statements(node, parent)
+                    if block is not None:
+                        blocks.append(block)
+                    continue
+                start, end = source.span(node)
+            except Exception as e:
+                logger.warning(f"Could not extract {node.name}: {e}")
+                continue
+
+            lines = (node.lineno, node.end_lineno)
+            if isinstance(node, ast.ClassDef):
+                blocks.append(source.block("class", node.name, f"class {node.name}(...)", start, end, lines))
+            else:
+                prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+                name = f"{parent}.{node.name}" if parent else node.name
+                block_type = "method" if parent else "function"
+                blocks.append(source.block(block_type, name, f"{prefix} {node.name}(...)", start, end, lines))
 
-        for node in ast.walk(tree):
-            if isinstance(node, ast.FunctionDef):
-                try:
-                    func_code = ast.get_source_segment(code, node)
-                    if func_code:
-                        blocks.append({
-                            "type": "function",
-                            "name": node.name,
-                            "code": func_code,
-                            "lines": (node.lineno, node.end_lineno),
-                            "signature": f"def {node.name}(...)"
-                        })
-                except Exception as e:
-                    logger.warning(f"Could not extract function {node.name}: {e}")
-
-            elif isinstance(node, ast.ClassDef):
-                try:
-                    class_code = ast.get_source_segment(code, node)
-                    if class_code:
-                        blocks.append({
-                            "type": "class",
-                            "name": node.name,
-                            "code": class_code,
-                            "lines": (node.lineno, node.end_lineno),
-                            "signature": f"class {node.name}(...)"
-                        })
-                except Exception as e:
-                    logger.warning(f"Could not extract class {node.name}: {e}")
-
-        if not blocks:
+        if not blocks and raw_fallback:
             logger.warning("No functions or classes found in code")
-            blocks.append({
-                "type": "raw",
-                "name": "full_code",
-                "code": code,
-                "lines": (1, len(code.split("\n"))),
-                "signature": "full_code"
-            })
+            blocks.append(source.block("raw", "full_code", "full_code", 0, len(code), (1, source.last_line)))
 
         return blocks
 
+    @staticmethod
+    def parse_many(codes: List[str], max_workers: Optional[int] = None, granularity: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Parse many sources, in a process pool when there is more than one.
+        Returns one {"blocks": [...], "error": None | str} per input, in order.
+        """
+        # Resolved here so worker processes do not depend on their own settings
+        parse = partial(_parse_safely, granularity=granularity or settings.PARSE_GRANULARITY)
+        workers = max_workers or os.cpu_count() or 1
+        if len(codes) <= 1 or workers <= 1:
+            return [parse(code) for code in codes]
+
+        with ProcessPoolExecutor(max_workers=min(workers, len(codes))) as executor:
+            return list(executor.map(parse, codes, chunksize=max(1, len(codes) // (workers * 4))))
+
+def _parse_safely(code: str, granularity: Optional[str] = None) -> Dict[str, Any]:
+    # Module-level so it can be pickled into worker processes
+    try:
+        return {"blocks": CodeParser.parse_code(code, granularity), "error": None}
+    except CodeParseError as e:
+        return {"blocks": [], "error": str(e)}
+
 code_parser = CodeParser()
@@ -0,0 +1,186 @@
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.exceptions import CodeParseError
+from app.services.code_parser import CodeParser
+from app.services.fingerprint_index import fingerprint
+from app.services.similarity_engine import similarity_engine
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+BlockRef = Tuple[int, int]
+
+def _fingerprint_submission(code: str) -> Dict[str, Any]:
+    # Module-level so it can be pickled into worker processes
+    if not code or not code.strip():
+        return {"blocks": [], "error": "File is empty, not UTF-8 text or exceeds the size limit"}
+    try:
+        blocks = CodeParser.parse_code(code)
+    except CodeParseError as e:
+        return {"blocks": [], "error": str(e)}
+
+    return {
+        "blocks": [
+            {
+                "name": block["name"],
+                "type": block["type"],
+                "lines": block["lines"],
+                "code": block["code"],
+                "fingerprints": fingerprint(block["code"], tokens=block["tokens"])
+            }
+            for block in blocks
+        ],
+        "error": None
+    }
+
+def _score_pair(codes: Tuple[str, str]) -> int:
+    return similarity_engine.score(codes[0], codes[1])["similarity_percent"]
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, x: int) -> int:
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a: int, b: int):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[root_b] = root_a
+
+class CohortAnalyzer:
+    """
+    Finds students copying from each other within one cohort.
+
+    Every block of every submission is fingerprinted (in a process pool). An
+    inverted index from fingerprint to blocks yields candidate block pairs that
+    share enough fingerprints, so only those pairs get a full structural score
+    instead of all O(N^2) combinations. Submissions linked by high-scoring block
+    pairs are grouped into clusters.
+    """
+
+    def _map(self, executor: Optional[ProcessPoolExecutor], func, items: List[Any]) -> List[Any]:
+        if executor is None:
+            return [func(item) for item in items]
+        workers = executor._max_workers
+        return list(executor.map(func, items, chunksize=max(1, len(items) // (workers * 4))))
+
+    def _candidate_pairs(self, submissions: List[Dict[str, Any]]) -> Dict[Tuple[BlockRef, BlockRef], int]:
+        postings: Dict[int, List[BlockRef]] = defaultdict(list)
+        for sub_index, submission in enumerate(submissions):
+            for block_index, block in enumerate(submission["blocks"]):
+                for fp in block["fingerprints"]:
+                    postings[fp].append((sub_index, block_index))
+
+        # Fingerprints present in a large share of submissions are starter code or idioms, not evidence.
+        # In a small cohort a handful of colluding students is already that share, so keep everything there.
+        max_submissions = len(submissions)
+        if len(submissions) >= settings.COHORT_DOC_FREQUENCY_MIN_SUBMISSIONS:
+            max_submissions = max(2, int(len(submissions) * settings.COHORT_MAX_DOC_FREQUENCY))
+
+        shared: Dict[Tuple[BlockRef, BlockRef], int] = defaultdict(int)
+        for refs in postings.values():
+            # The absolute cap bounds the quadratic pair expansion of a single posting list
+            if len(refs) > settings.COHORT_MAX_POSTINGS or len({sub for sub, _ in refs}) > max_submissions:
+                continue
+            for a, b in combinations(refs, 2):
+                if a[0] == b[0]:
+                    continue
+                shared[(a, b) if a < b else (b, a)] += 1
+        return shared
+
+    def analyze(self, sources: List[Tuple[str, str]]) -> Dict[str, Any]:
+        """sources: (submission_id, code) pairs."""
+        workers = settings.COHORT_WORKERS or os.cpu_count() or 1
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 and len(sources) > 1 else None
+
+        try:
+            fingerprinted = self._map(executor, _fingerprint_submission, [code for _, code in sources])
+            submissions = [
+                {"id": submission_id, **result}
+                for (submission_id, _), result in zip(sources, fingerprinted)
+            ]
+
+            shared = self._candidate_pairs(submissions)
+
+            candidates = []
+            for (a, b), count in shared.items():
+                fps_a = submissions[a[0]]["blocks"][a[1]]["fingerprints"]
+                fps_b = submissions[b[0]]["blocks"][b[1]]["fingerprints"]
+                smaller = min(len(fps_a), len(fps_b))
+                if smaller >= settings.FINGERPRINT_MIN_FINGERPRINTS and count / smaller >= settings.COHORT_CANDIDATE_THRESHOLD:
+                    candidates.append((a, b))
+
+            scores = self._map(
+                executor,
+                _score_pair,
+                [
+                    (submissions[a[0]]["blocks"][a[1]]["code"], submissions[b[0]]["blocks"][b[1]]["code"])
+                    for a, b in candidates
+                ]
+            )
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        pair_matches: Dict[Tuple[int, int], List[Dict[str, Any]]] = defaultdict(list)
+        for (a, b), score in zip(candidates, scores):
+            if score < settings.COHORT_SIMILARITY_THRESHOLD:
+                continue
+            pair_matches[(a[0], b[0])].append({
+                "block_a": submissions[a[0]]["blocks"][a[1]]["name"],
+                "block_b": submissions[b[0]]["blocks"][b[1]]["name"],
+                "similarity_percent": score
+            })
+
+        union_find = _UnionFind(len(submissions))
+        pairs = []
+        for (sub_a, sub_b), matches in pair_matches.items():
+            union_find.union(sub_a, sub_b)
+            matches.sort(key=lambda m: m["similarity_percent"], reverse=True)
+            pairs.append({
+                "submission_a": submissions[sub_a]["id"],
+                "submission_b": submissions[sub_b]["id"],
+                "similarity_percent": matches[0]["similarity_percent"],
+                "matches": matches
+            })
+        pairs.sort(key=lambda p: (p["similarity_percent"], len(p["matches"])), reverse=True)
+
+        members: Dict[int, set] = defaultdict(set)
+        max_similarity: Dict[int, int] = defaultdict(int)
+        for (sub_a, sub_b), matches in pair_matches.items():
+            root = union_find.find(sub_a)
+            members[root].update((sub_a, sub_b))
+            max_similarity[root] = max(max_similarity[root], matches[0]["similarity_percent"])
+
+        clusters = [
+            {
+                "submissions": sorted(submissions[m]["id"] for m in group),
+                "max_similarity_percent": max_similarity[root]
+            }
+            for root, group in members.items()
+        ]
+        clusters.sort(key=lambda c: (len(c["submissions"]), c["max_similarity_percent"]), reverse=True)
+
+        logger.info(
+            f"Cohort analysis: {len(submissions)} submissions, {len(shared)} block pairs sharing fingerprints, "
+            f"{len(candidates)} scored, {len(pairs)} suspicious submission pairs, {len(clusters)} clusters"
+        )
+
+        return {
+            "total_submissions": len(submissions),
+            "total_blocks": sum(len(s["blocks"]) for s in submissions),
+            "candidate_pairs": len(candidates),
+            "pairs": pairs,
+            "clusters": clusters,
+            "errors": {s["id"]: s["error"] for s in submissions if s["error"]}
+        }
+
+cohort_analyzer = CohortAnalyzer()
@@ -0,0 +1,145 @@
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+from app.core.config import settings
+from app.services.code_parser import code_parser
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+def winnow(tokens: List[str], k: int, window: int) -> Set[int]:
+    """
+    Winnowing (Schleimer et al.): hash every k-gram of the token stream and keep
+    the minimum hash of each window of consecutive k-gram hashes.
+    """
+    if len(tokens) < k:
+        if not tokens:
+            return set()
+        return {zlib.crc32(" ".join(tokens).encode("utf-8"))}
+
+    # crc32 is stable across processes, unlike hash()
+    hashes = [
+        zlib.crc32(" ".join(tokens[i:i + k]).encode("utf-8"))
+        for i in range(len(tokens) - k + 1)
+    ]
+
+    if len(hashes) <= window:
+        return {min(hashes)}
+
+    fingerprints = set()
+    for i in range(len(hashes) - window + 1):
+        fingerprints.add(min(hashes[i:i + window]))
+    return fingerprints
+
+def fingerprint(code: str, k: Optional[int] = None, window: Optional[int] = None, tokens: Optional[List[str]] = None) -> Set[int]:
+    """Pass tokens when the parser already produced the block's normalized token stream."""
+    return winnow(
+        tokens if tokens is not None else code_parser.normalized_tokens(code),
+        k or settings.FINGERPRINT_K,
+        window or settings.FINGERPRINT_WINDOW
+    )
+
+def containment(query: Set[int], other: Set[int]) -> float:
+    """Share of the query's fingerprints that also occur in the other document."""
+    if not query:
+        return 0.0
+    return len(query & other) / len(query)
+
+class FingerprintIndex:
+    """
+    In-memory inverted index from winnowed fingerprints to documents (previously
+    checked submission blocks and harvested GitHub snippets). Oldest documents
+    are dropped once max_docs is reached.
+    """
+
+    def __init__(self, max_docs: int, max_postings: int = 500):
+        self.max_docs = max_docs
+        # Fingerprints shared by more documents than this are boilerplate and not used to find candidates
+        self.max_postings = max_postings
+        self.docs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.postings: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, doc_id: str, fingerprints: Set[int], meta: Dict[str, Any]):
+        if not fingerprints:
+            return
+
+        with self._lock:
+            if doc_id in self.docs:
+                self._remove(doc_id)
+
+            self.docs[doc_id] = {"fingerprints": fingerprints, "meta": meta}
+            for fp in fingerprints:
+                self.postings.setdefault(fp, set()).add(doc_id)
+
+            while len(self.docs) > self.max_docs:
+                oldest = next(iter(self.docs))
+                self._remove(oldest)
+
+    def add_code(self, doc_id: str, code: str, meta: Dict[str, Any]):
+        self.add(doc_id, fingerprint(code), meta)
+
+    def _remove(self, doc_id: str):
+        doc = self.docs.pop(doc_id, None)
+        if doc is None:
+            return
+        for fp in doc["fingerprints"]:
+            posting = self.postings.get(fp)
+            if posting is not None:
+                posting.discard(doc_id)
+                if not posting:
+                    del self.postings[fp]
+
+    def query(
+        self,
+        fingerprints: Set[int],
+        limit: int = 3,
+        exclude_submissions: Optional[Set[str]] = None,
+        kind: Optional[str] = None,
+        exclude_submitter: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Return up to `limit` documents ranked by how much of the query they contain,
+        optionally only those of one kind ("github" or "submission") and never the
+        given submissions or earlier submissions of the same submitter.
+        """
+        if not fingerprints:
+            return []
+
+        with self._lock:
+            shared: Dict[str, int] = {}
+            for fp in fingerprints:
+                posting = self.postings.get(fp)
+                if not posting or len(posting) > self.max_postings:
+                    continue
+                for doc_id in posting:
+                    shared[doc_id] = shared.get(doc_id, 0) + 1
+
+            candidates = []
+            for doc_id, count in shared.items():
+                meta = self.docs[doc_id]["meta"]
+                if kind is not None and meta.get("kind") != kind:
+                    continue
+                if exclude_submissions and meta.get("submission") in exclude_submissions:
+                    continue
+                if exclude_submitter is not None and meta.get("submitter") == exclude_submitter:
+                    continue
+                candidates.append({
+                    "doc_id": doc_id,
+                    "score": count / len(fingerprints),
+                    "meta": meta
+                })
+
+        candidates.sort(key=lambda c: c["score"], reverse=True)
+        return candidates[:limit]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "documents": len(self.docs),
+                "max_documents": self.max_docs,
+                "fingerprints": len(self.postings)
+            }
+
+fingerprint_index = FingerprintIndex(max_docs=settings.FINGERPRINT_MAX_DOCS)
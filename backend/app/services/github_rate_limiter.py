@@ -0,0 +1,275 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from app.core.exceptions import GitHubRateLimitError
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+RESOURCES = ("search", "core")
+
+class _Quota:
+    """What we know about one rate-limit bucket of one token. None means not reported yet."""
+
+    def __init__(self):
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None
+        self.next_allowed = 0.0
+        self.in_flight = 0
+
+    def available(self, now: float) -> Optional[int]:
+        """Requests that can still be sent in this window, or None while the quota is unknown."""
+        if self.remaining is None or (self.reset_at and self.reset_at <= now):
+            return None
+        return self.remaining - self.in_flight
+
+    def ready_at(self, now: float) -> float:
+        available = self.available(now)
+        if available is None:
+            # Unknown (or reset) quota: send a single probe and learn the budget from its headers
+            return self.next_allowed if self.in_flight == 0 else now + 0.05
+        if available > 0:
+            return self.next_allowed
+        if self.remaining > 0:
+            # Budget is taken by requests still in flight; check again once they report back
+            return now + 0.05
+        return max(self.next_allowed, self.reset_at or now + 1)
+
+    def pace(self, now: float, min_interval: float) -> float:
+        """
+        Gap to keep before the next request. Bursts are allowed while more than half
+        of the window's budget is left; below that the rest is spread over the window.
+        Without a reported reset time there is no window to spread it over.
+        """
+        available = self.available(now)
+        if self.reset_at is None:
+            return min_interval
+        if self.limit and available is not None and available < self.limit / 2:
+            return max(min_interval, (self.reset_at - now) / max(available, 1))
+        return min_interval
+
+class _TokenState:
+    def __init__(self, token: str):
+        self.token = token
+        self.quotas = {resource: _Quota() for resource in RESOURCES}
+        self.requests = 0
+        self.throttled = 0
+
+    @property
+    def label(self) -> str:
+        return f"...{self.token[-4:]}" if len(self.token) > 4 else "****"
+
+class RateLimitScheduler:
+    """
+    Hands out GitHub tokens for requests so that every token stays inside its
+    rate-limit budget.
+
+    Quota per token and resource ("search" or "core") comes from the
+    X-RateLimit-* headers of earlier responses, minus requests still in flight.
+    A request takes the ready token with the most quota left. When every token is
+    exhausted or pacing, the caller waits (and counts towards queue depth) until
+    one frees up. If that is more than max_wait seconds away, GitHubRateLimitError
+    is raised instead of returning an empty result.
+
+    Use `with scheduler.slot("search") as token:` (or `async with aslot(...)`)
+    around each request so the in-flight count is released.
+    """
+
+    def __init__(self, tokens: List[str], max_wait: float, min_interval: float = 0.0):
+        if not tokens:
+            raise ValueError("At least one GitHub token is required")
+        self.tokens = [_TokenState(token) for token in tokens]
+        self.max_wait = max_wait
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.max_waiting = 0
+        self.waits = 0
+        self.rejected = 0
+
+    def _state(self, token: str) -> Optional[_TokenState]:
+        for state in self.tokens:
+            if state.token == token:
+                return state
+        return None
+
+    def _reserve(self, resource: str) -> Tuple[Optional[str], float]:
+        """Book a token if one is ready now; otherwise return the delay until the earliest one is."""
+        now = time.time()
+        ready = []
+        earliest = float("inf")
+
+        for state in self.tokens:
+            quota = state.quotas[resource]
+            at = quota.ready_at(now)
+            if at <= now:
+                ready.append(state)
+            else:
+                earliest = min(earliest, at)
+
+        if not ready:
+            return None, earliest - now
+
+        def headroom(s: _TokenState) -> float:
+            available = s.quotas[resource].available(now)
+            # Unknown quota counts as full so fresh tokens get tried
+            return float("inf") if available is None else available
+
+        state = max(ready, key=headroom)
+        quota = state.quotas[resource]
+        quota.next_allowed = now + quota.pace(now, self.min_interval)
+        quota.in_flight += 1
+        state.requests += 1
+        return state.token, 0.0
+
+    def _enter_queue(self):
+        with self._lock:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+
+    def _leave_queue(self):
+        with self._lock:
+            self.waiting -= 1
+
+    def _check_deadline(self, resource: str, delay: float, deadline: float):
+        if time.time() + delay > deadline:
+            with self._lock:
+                self.rejected += 1
+            raise GitHubRateLimitError(
+                f"GitHub {resource} rate limit exhausted on all {len(self.tokens)} tokens; "
+                f"next slot in {delay:.0f}s"
+            )
+
+    def acquire(self, resource: str = "search") -> str:
+        deadline = time.time() + self.max_wait
+        self._enter_queue()
+        try:
+            while True:
+                with self._lock:
+                    token, delay = self._reserve(resource)
+                    if token is None:
+                        self.waits += 1
+                if token is not None:
+                    return token
+                self._check_deadline(resource, delay, deadline)
+                time.sleep(min(delay, 1.0))
+        finally:
+            self._leave_queue()
+
+    def release(self, token: str, resource: str):
+        with self._lock:
+            state = self._state(token)
+            if state is not None:
+                state.quotas[resource].in_flight -= 1
+
+    @contextmanager
+    def slot(self, resource: str = "search"):
+        token = self.acquire(resource)
+        try:
+            yield token
+        finally:
+            self.release(token, resource)
+
+    @asynccontextmanager
+    async def aslot(self, resource: str = "search"):
+        token = await self.aacquire(resource)
+        try:
+            yield token
+        finally:
+            self.release(token, resource)
+
+    async def aacquire(self, resource: str = "search") -> str:
+        deadline = time.time() + self.max_wait
+        self._enter_queue()
+        try:
+            while True:
+                with self._lock:
+                    token, delay = self._reserve(resource)
+                    if token is None:
+                        self.waits += 1
+                if token is not None:
+                    return token
+                self._check_deadline(resource, delay, deadline)
+                await asyncio.sleep(min(delay, 1.0))
+        finally:
+            self._leave_queue()
+
+    def update(self, token: str, resource: str, remaining: Optional[int], limit: Optional[int], reset_at: Optional[float]):
+        with self._lock:
+            state = self._state(token)
+            if state is None:
+                return
+            quota = state.quotas[resource]
+            # Responses can arrive out of order; within one window remaining only goes down
+            same_window = reset_at is not None and reset_at == quota.reset_at
+            if remaining is not None and not (same_window and quota.remaining is not None and remaining > quota.remaining):
+                quota.remaining = remaining
+            if limit is not None:
+                quota.limit = limit
+            if reset_at is not None:
+                quota.reset_at = reset_at
+
+    def update_from_headers(self, token: str, resource: str, headers: Mapping[str, str]):
+        headers = {k.lower(): v for k, v in headers.items()}
+
+        def number(name: str) -> Optional[int]:
+            value = headers.get(name.lower())
+            try:
+                return int(float(value)) if value is not None else None
+            except ValueError:
+                return None
+
+        self.update(
+            token,
+            resource,
+            number("X-RateLimit-Remaining"),
+            number("X-RateLimit-Limit"),
+            number("X-RateLimit-Reset")
+        )
+
+    def throttle(self, token: str, resource: str, retry_after: Optional[float] = None, reset_at: Optional[float] = None):
+        """Record a 403/429 rate-limit response: the token is unusable until retry_after / reset_at."""
+        now = time.time()
+        with self._lock:
+            state = self._state(token)
+            if state is None:
+                return
+            state.throttled += 1
+            quota = state.quotas[resource]
+            if retry_after is not None:
+                # Secondary (abuse) limit: quota is not exhausted, the token just has to back off
+                quota.next_allowed = max(quota.next_allowed, now + retry_after)
+            else:
+                quota.remaining = 0
+                quota.reset_at = reset_at or (now + 60)
+        logger.warning(f"GitHub token {state.label} throttled on {resource}")
+
+    def metrics(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            return {
+                "tokens": [
+                    {
+                        "token": state.label,
+                        "requests": state.requests,
+                        "throttled": state.throttled,
+                        **{
+                            resource: {
+                                "limit": quota.limit,
+                                "remaining": quota.remaining,
+                                "in_flight": quota.in_flight,
+                                "reset_in_seconds": round(max(0.0, quota.reset_at - now), 1) if quota.reset_at else None
+                            }
+                            for resource, quota in state.quotas.items()
+                        }
+                    }
+                    for state in self.tokens
+                ],
+                "queue_depth": self.waiting,
+                "max_queue_depth": self.max_waiting,
+                "waits": self.waits,
+                "rejected": self.rejected
+            }
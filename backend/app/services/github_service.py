@@ -1,54 +1,368 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Mapping, Optional, Tuple
+import asyncio
+import base64
 import re
-from github import Github
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import httpx
 from app.core.config import settings
+from app.core.exceptions import ConfigurationError, GitHubRateLimitError, GitHubSearchError
+from app.services.github_rate_limiter import RateLimitScheduler
+from app.services.http_clients import http_clients
+from app.storage.sqlite_cache import SQLiteCache, FRESH, STALE
+from app.utils.lazy import LazyService
 from app.utils.logger import get_logger
+from app.utils.singleflight import SingleFlight
+from app.utils.metrics import (
+    GITHUB_CACHE_LOOKUPS,
+    GITHUB_SEARCHES,
+    GITHUB_SEARCHES_IN_FLIGHT,
+    GITHUB_SEARCH_SECONDS,
+    observe_call
+)
 
 logger = get_logger(__name__)
 
+def _configured_tokens() -> List[str]:
+    tokens = [settings.GITHUB_TOKEN] + [t.strip() for t in (settings.GITHUB_TOKENS or "").split(",")]
+    return list(dict.fromkeys(t for t in tokens if t))
+
+def _is_rate_limited(status: int, headers: Mapping[str, str]) -> bool:
+    return status == 429 or (status == 403 and (headers.get("x-ratelimit-remaining") == "0" or "retry-after" in headers))
+
+def _search_result(matches: Optional[List[Dict[str, Any]]]) -> str:
+    if matches is None:
+        return "invalid_query"
+    return "matches" if matches else "empty"
+
+def _search_matches(response: httpx.Response, per_page: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "repo": item["repository"]["full_name"],
+            "url": item["html_url"],
+            "path": item["path"],
+            "sha": item["sha"],
+            "content_url": item["url"]
+        }
+        for item in response.json().get("items", [])[:per_page]
+    ]
+
 class GitHubService:
     def __init__(self):
-        self.github = Github(settings.GITHUB_TOKEN)
+        self.tokens = _configured_tokens()
+        if not self.tokens:
+            raise ConfigurationError("No GitHub token configured; set GITHUB_TOKEN or GITHUB_TOKENS")
+        self.scheduler = RateLimitScheduler(
+            self.tokens,
+            max_wait=settings.GITHUB_RATE_LIMIT_MAX_WAIT_SECONDS,
+            min_interval=settings.GITHUB_SEARCH_MIN_INTERVAL_SECONDS
+        )
+        self.inflight: SingleFlight[List[Dict[str, Any]]] = SingleFlight("github_search")
+        http_clients.configure(
+            "github",
+            base_url=settings.GITHUB_API_URL,
+            headers={"Accept": "application/vnd.github+json"}
+        )
+        self.search_cache: Optional[SQLiteCache] = None
+        self.content_cache: Optional[SQLiteCache] = None
+
+        if settings.GITHUB_CACHE_ENABLED:
+            self.search_cache = SQLiteCache(
+                settings.GITHUB_CACHE_PATH,
+                # Entries are hit references; file contents live in the content cache
+                namespace="github_search_refs",
+                ttl_seconds=settings.GITHUB_CACHE_TTL_SECONDS,
+                stale_seconds=settings.GITHUB_CACHE_STALE_SECONDS,
+                max_entries=settings.GITHUB_CACHE_MAX_ENTRIES
+            )
+            # File blobs are addressed by sha, so their content never goes stale
+            self.content_cache = SQLiteCache(
+                settings.GITHUB_CACHE_PATH,
+                namespace="github_content",
+                ttl_seconds=settings.GITHUB_CACHE_STALE_SECONDS,
+                stale_seconds=0,
+                max_entries=settings.GITHUB_CACHE_MAX_ENTRIES
+            )
+
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def http_client(self) -> httpx.Client:
+        return http_clients.client("github")
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        return http_clients.async_client("github")
 
     def _validate_query(self, query: str) -> str:
         """Validate and clean GitHub search query."""
         cleaned = re.sub(r'[^\w\s\-_.]', ' ', query)
-        
+
         cleaned = ' '.join(cleaned.split())
-        
+
         if len(cleaned.strip()) < 3:
             return ""
-            
+
         return cleaned.strip()
 
-    def search_code(self, query: str, language: str = "python", per_page: int = 3) -> List[Dict[str, Any]]:
+    def _cache_key(self, clean_query: str, language: str, per_page: int) -> str:
+        return f"{clean_query.lower()}|{language.lower()}|{per_page}"
+
+    def _auth(self, token: str) -> Dict[str, str]:
+        return {"Authorization": f"token {token}"}
+
+    def _search_params(self, clean_query: str, language: str, per_page: int) -> Dict[str, Any]:
+        search_query = f'{clean_query} language:{language}'
+        logger.debug(f"GitHub search query: {search_query}")
+        return {"q": search_query, "order": "desc", "per_page": per_page}
+
+    def _record_response(self, token: str, resource: str, status: int, headers: Mapping[str, str]) -> bool:
+        """Feed quota headers to the scheduler; returns True if the response was a rate-limit rejection."""
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        self.scheduler.update_from_headers(token, resource, headers)
+        if not _is_rate_limited(status, headers):
+            return False
+
+        retry_after = headers.get("retry-after")
+        reset = headers.get("x-ratelimit-reset")
+        self.scheduler.throttle(
+            token,
+            resource,
+            retry_after=float(retry_after) if retry_after else None,
+            reset_at=float(reset) if reset else None
+        )
+        return True
+
+    def _content_key(self, repo: str, path: str, sha: str) -> str:
+        return f"{repo}:{path}:{sha}"
+
+    def _decode(self, payload: Dict[str, Any]) -> str:
+        content = base64.b64decode(payload.get("content", "")).decode("utf-8", errors="replace")
+        return content[:settings.GITHUB_MAX_FILE_CHARS]
+
+    def _cached_content(self, key: str) -> Optional[str]:
+        if self.content_cache is None:
+            return None
+        cached, _ = self.content_cache.get(key)
+        return cached
+
+    def _store_content(self, key: str, content: str):
+        if self.content_cache is not None:
+            self.content_cache.set(key, content)
+
+    def _get_content(self, repo: str, path: str, sha: str, url: str) -> str:
+        key = self._content_key(repo, path, sha)
+
+        cached = self._cached_content(key)
+        if cached is not None:
+            return cached
+
+        for _ in range(len(self.tokens) + 1):
+            with self.scheduler.slot("core") as token:
+                response = self.http_client.get(url, headers=self._auth(token))
+                if not self._record_response(token, "core", response.status_code, response.headers):
+                    break
+        else:
+            raise GitHubRateLimitError("GitHub core rate limit exhausted on all tokens")
+
+        response.raise_for_status()
+        content = self._decode(response.json())
+        self._store_content(key, content)
+        return content
+
+    def _fetch(self, clean_query: str, language: str, per_page: int) -> List[Dict[str, Any]]:
+        params = self._search_params(clean_query, language, per_page)
+
+        for _ in range(len(self.tokens) + 1):
+            with self.scheduler.slot("search") as token:
+                response = self.http_client.get("/search/code", params=params, headers=self._auth(token))
+                if not self._record_response(token, "search", response.status_code, response.headers):
+                    break
+        else:
+            raise GitHubRateLimitError("GitHub search rate limit exhausted on all tokens")
+
+        response.raise_for_status()
+        return _search_matches(response, per_page)
+
+    def _with_content(self, match: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         try:
-            clean_query = self._validate_query(query)
-            
-            if not clean_query:
-                logger.warning(f"Invalid or empty search query: '{query}'")
-                return []
-            
-            search_query = f'{clean_query} language:{language}'
-            logger.debug(f"GitHub search query: {search_query}")
-            
-            results = self.github.search_code(search_query, order="desc")
-
-            matches = []
-            for i, result in enumerate(results):
-                if i >= per_page:
+            return {**match, "content": self._get_content(match["repo"], match["path"], match["sha"], match["content_url"])}
+        except httpx.HTTPStatusError as e:
+            # Deleted or moved since it was indexed: not comparable, so not a match
+            logger.warning(f"Skipping {match['repo']}/{match['path']}: {e.response.status_code}")
+            return None
+
+    def _attach_contents(self, matches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Full file contents for search hits, from the content cache (keyed by blob sha) or fetched in parallel."""
+        if len(matches) <= 1:
+            loaded = [self._with_content(m) for m in matches]
+        else:
+            with ThreadPoolExecutor(max_workers=len(matches)) as executor:
+                loaded = list(executor.map(self._with_content, matches))
+        return [m for m in loaded if m is not None]
+
+    def _refresh_in_background(self, key: str, clean_query: str, language: str, per_page: int):
+        with self._refresh_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self.search_cache.set(key, self._fetch(clean_query, language, per_page))
+                logger.debug(f"Revalidated cached GitHub search: {clean_query}")
+            except Exception as e:
+                logger.warning(f"Background GitHub revalidation failed: {e}")
+            finally:
+                with self._refresh_lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    async def _aget_content(self, match: Dict[str, Any]) -> str:
+        key = self._content_key(match["repo"], match["path"], match["sha"])
+
+        # SQLite lookups run in a worker thread so they do not stall the event loop
+        cached = await asyncio.to_thread(self._cached_content, key)
+        if cached is not None:
+            return cached
+
+        for _ in range(len(self.tokens) + 1):
+            async with self.scheduler.aslot("core") as token:
+                response = await self.async_client.get(match["content_url"], headers=self._auth(token))
+                if not self._record_response(token, "core", response.status_code, response.headers):
                     break
+        else:
+            raise GitHubRateLimitError("GitHub core rate limit exhausted on all tokens")
+
+        response.raise_for_status()
+        content = self._decode(response.json())
+        await asyncio.to_thread(self._store_content, key, content)
+        return content
+
+    async def _afetch(self, clean_query: str, language: str, per_page: int) -> List[Dict[str, Any]]:
+        params = self._search_params(clean_query, language, per_page)
+
+        for _ in range(len(self.tokens) + 1):
+            async with self.scheduler.aslot("search") as token:
+                response = await self.async_client.get("/search/code", params=params, headers=self._auth(token))
+                if not self._record_response(token, "search", response.status_code, response.headers):
+                    break
+        else:
+            raise GitHubRateLimitError("GitHub search rate limit exhausted on all tokens")
+
+        response.raise_for_status()
+        return _search_matches(response, per_page)
+
+    async def _aattach_contents(self, matches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        loaded = []
+        contents = await asyncio.gather(*(self._aget_content(m) for m in matches), return_exceptions=True)
+        for match, content in zip(matches, contents):
+            if isinstance(content, httpx.HTTPStatusError):
+                logger.warning(f"Skipping {match['repo']}/{match['path']}: {content.response.status_code}")
+                continue
+            if isinstance(content, BaseException):
+                raise content
+            loaded.append({**match, "content": content})
+        return loaded
+
+    def _lookup(self, key: str, clean_query: str, language: str, per_page: int) -> Optional[List[Dict[str, Any]]]:
+        """Return cached matches (revalidating stale ones in the background) or None on a miss."""
+        if self.search_cache is None:
+            return None
+
+        cached, state = self.search_cache.get(key)
+        GITHUB_CACHE_LOOKUPS.labels(state=state if state in (FRESH, STALE) else "miss").inc()
+        if state == FRESH:
+            return cached
+        if state == STALE:
+            self._refresh_in_background(key, clean_query, language, per_page)
+            return cached
+        return None
+
+    def _fallback(self, key: str, clean_query: str, error: Exception) -> List[Dict[str, Any]]:
+        """Serve expired cached results if there are any; otherwise the error propagates so the block is marked as not checked."""
+        logger.error(f"GitHub search error: {error}")
+        if self.search_cache is not None:
+            fallback = self.search_cache.get_any(key)
+            if fallback is not None:
+                logger.warning(f"Serving expired cached results for '{clean_query}' after search error")
+                return fallback
+        if isinstance(error, GitHubSearchError):
+            raise error
+        raise GitHubSearchError(f"GitHub search failed: {error}") from error
+
+    def _store(self, key: str, matches: List[Dict[str, Any]]):
+        if self.search_cache is not None:
+            self.search_cache.set(key, matches)
+
+    def _search_code(self, key: str, clean_query: str, language: str, per_page: int) -> List[Dict[str, Any]]:
+        matches = self._lookup(key, clean_query, language, per_page)
+        if matches is None:
+            try:
+                matches = self._fetch(clean_query, language, per_page)
+            except Exception as e:
+                matches = self._fallback(key, clean_query, e)
+            else:
+                self._store(key, matches)
+
+        return self._attach_contents(matches)
+
+    async def _asearch_code(self, key: str, clean_query: str, language: str, per_page: int) -> List[Dict[str, Any]]:
+        matches = await asyncio.to_thread(self._lookup, key, clean_query, language, per_page)
+        if matches is None:
+            try:
+                matches = await self._afetch(clean_query, language, per_page)
+            except Exception as e:
+                matches = await asyncio.to_thread(self._fallback, key, clean_query, e)
+            else:
+                await asyncio.to_thread(self._store, key, matches)
+
+        return await self._aattach_contents(matches)
+
+    def _normalize(self, query: str, language: str, per_page: int) -> Optional[Tuple[str, str]]:
+        """(cache key, cleaned query), or None when the query is not worth sending."""
+        clean_query = self._validate_query(query)
+        if not clean_query:
+            logger.warning(f"Invalid or empty search query: '{query}'")
+            return None
+        return self._cache_key(clean_query, language, per_page), clean_query
+
+    def search_code(self, query: str, language: str = "python", per_page: int = 3) -> List[Dict[str, Any]]:
+        """
+        Matches with file contents. Searches are keyed by their normalized query, so
+        an equivalent search already in flight is waited on, not repeated.
+        """
+        with observe_call(GITHUB_SEARCH_SECONDS, GITHUB_SEARCHES, GITHUB_SEARCHES_IN_FLIGHT) as call:
+            normalized = self._normalize(query, language, per_page)
+            matches = None
+            if normalized is not None:
+                key, clean_query = normalized
+                matches, _ = self.inflight.do(key, lambda: self._search_code(key, clean_query, language, per_page))
+            call.result = _search_result(matches)
+            return matches or []
+
+    async def asearch_code(self, query: str, language: str = "python", per_page: int = 3) -> List[Dict[str, Any]]:
+        with observe_call(GITHUB_SEARCH_SECONDS, GITHUB_SEARCHES, GITHUB_SEARCHES_IN_FLIGHT) as call:
+            normalized = self._normalize(query, language, per_page)
+            matches = None
+            if normalized is not None:
+                key, clean_query = normalized
+                matches, _ = await self.inflight.ado(key, lambda: self._asearch_code(key, clean_query, language, per_page))
+            call.result = _search_result(matches)
+            return matches or []
 
-                matches.append({
-                    "repo": result.repository.full_name,
-                    "url": result.html_url,
-                    "path": result.path,
-                    "snippet": result.decoded_content[:500] if hasattr(result, 'decoded_content') else ""
-                })
+    def rate_limit_stats(self) -> Dict[str, Any]:
+        return self.scheduler.metrics()
 
-            return matches
-        except Exception as e:
-            logger.error(f"GitHub search error: {e}")
-            return []
+    def cache_stats(self) -> Dict[str, Any]:
+        if self.search_cache is None:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "search": self.search_cache.stats(),
+            "content": self.content_cache.stats()
+        }
 
-github_service = GitHubService()
+github_service: LazyService[GitHubService] = LazyService(GitHubService)
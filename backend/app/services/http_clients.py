@@ -0,0 +1,183 @@
+import threading
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Union
+import httpx
+from app.core.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+Client = Union[httpx.Client, httpx.AsyncClient]
+
+@lru_cache(maxsize=1)
+def _h2_installed() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("HTTP2_ENABLED is set but the h2 package is not installed; using HTTP/1.1")
+        return False
+    return True
+
+def _http2_enabled() -> bool:
+    return settings.HTTP2_ENABLED and _h2_installed()
+
+class PoolMetrics:
+    """Requests sent and connections opened by one client, fed by an httpx request hook."""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+        self._lock = threading.Lock()
+
+    def _count(self, event_name: str):
+        with self._lock:
+            if event_name == "connection.connect_tcp.complete":
+                self.connections_opened += 1
+            elif event_name == "connection.start_tls.complete":
+                self.tls_handshakes += 1
+
+    def trace(self, event_name: str, info: Dict[str, Any]):
+        self._count(event_name)
+
+    async def atrace(self, event_name: str, info: Dict[str, Any]):
+        self._count(event_name)
+
+    def on_request(self, request: httpx.Request):
+        with self._lock:
+            self.requests += 1
+        # httpcore reports connection setup through the trace extension
+        request.extensions["trace"] = self.trace
+
+    async def aon_request(self, request: httpx.Request):
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = self.atrace
+
+    def as_dict(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "connections_opened": self.connections_opened,
+                "tls_handshakes": self.tls_handshakes
+            }
+
+def _connection_pools(client: Client) -> List[Any]:
+    """The httpcore pools behind a client: its default transport and any proxy mounts."""
+    transports = [client._transport] + [t for t in client._mounts.values() if t is not None]
+    return [t._pool for t in transports if hasattr(t, "_pool")]
+
+class HTTPClients:
+    """
+    Shared httpx clients, one sync and one async per upstream (GitHub, OpenAI),
+    sized by the HTTP_* settings. Connections are kept alive between calls, so
+    repeated requests to a host skip the TCP and TLS handshakes. Services
+    configure their upstream once and look the client up on every use; the
+    FastAPI lifespan closes all clients on shutdown, after which the next
+    lookup builds fresh ones.
+    """
+
+    def __init__(self):
+        self._options: Dict[str, Dict[str, Any]] = {}
+        self._clients: Dict[str, httpx.Client] = {}
+        self._async_clients: Dict[str, httpx.AsyncClient] = {}
+        self._metrics: Dict[str, PoolMetrics] = {}
+        self._lock = threading.Lock()
+        self.generation = 0
+
+    def configure(self, name: str, base_url: str = "", headers: Optional[Dict[str, str]] = None, proxy: Optional[str] = None, timeout: Optional[float] = None):
+        self._options[name] = {"base_url": base_url, "headers": headers, "proxy": proxy, "timeout": timeout}
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS
+        )
+
+    def _client_kwargs(self, name: str) -> Dict[str, Any]:
+        options = self._options.get(name, {})
+        return {
+            "base_url": options.get("base_url") or "",
+            "headers": options.get("headers"),
+            "proxy": options.get("proxy"),
+            "timeout": httpx.Timeout(
+                options.get("timeout") or settings.HTTP_TIMEOUT_SECONDS,
+                connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS
+            ),
+            "limits": self._limits(),
+            "http2": _http2_enabled()
+        }
+
+    def client(self, name: str) -> httpx.Client:
+        if name not in self._clients:
+            with self._lock:
+                if name not in self._clients:
+                    metrics = self._metrics.setdefault(f"{name}.sync", PoolMetrics())
+                    self._clients[name] = httpx.Client(
+                        event_hooks={"request": [metrics.on_request]},
+                        **self._client_kwargs(name)
+                    )
+        return self._clients[name]
+
+    def async_client(self, name: str) -> httpx.AsyncClient:
+        if name not in self._async_clients:
+            with self._lock:
+                if name not in self._async_clients:
+                    metrics = self._metrics.setdefault(f"{name}.async", PoolMetrics())
+                    self._async_clients[name] = httpx.AsyncClient(
+                        event_hooks={"request": [metrics.aon_request]},
+                        **self._client_kwargs(name)
+                    )
+        return self._async_clients[name]
+
+    def open(self):
+        """Build every configured client up front, so the first request does not pay for it."""
+        for name in self._options:
+            self.client(name)
+            self.async_client(name)
+
+    async def aclose(self):
+        with self._lock:
+            clients, self._clients = self._clients, {}
+            async_clients, self._async_clients = self._async_clients, {}
+            self.generation += 1
+
+        for client in clients.values():
+            client.close()
+        for name, client in async_clients.items():
+            try:
+                await client.aclose()
+            except RuntimeError as e:
+                # Connections opened on an event loop that has since closed cannot be shut down cleanly
+                logger.warning(f"Could not close async HTTP client '{name}': {e}")
+
+    def _pool_stats(self, client: Client) -> Dict[str, Any]:
+        connections = [connection for pool in _connection_pools(client) for connection in pool.connections]
+        idle = sum(1 for connection in connections if connection.is_idle())
+        active = len(connections) - idle
+        return {
+            "open_connections": len(connections),
+            "active_connections": active,
+            "idle_connections": idle,
+            "utilization": round(active / settings.HTTP_MAX_CONNECTIONS, 4) if settings.HTTP_MAX_CONNECTIONS else 0.0
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        clients = {}
+        for kind, registry in (("sync", self._clients), ("async", self._async_clients)):
+            for name, client in list(registry.items()):
+                clients.setdefault(name, {})[kind] = {
+                    **self._metrics[f"{name}.{kind}"].as_dict(),
+                    **self._pool_stats(client)
+                }
+
+        return {
+            "http2": _http2_enabled(),
+            "max_connections": settings.HTTP_MAX_CONNECTIONS,
+            "max_keepalive_connections": settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            "keepalive_expiry_seconds": settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+            "clients": clients
+        }
+
+http_clients = HTTPClients()
@@ -0,0 +1,198 @@
+import asyncio
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.core.config import settings
+from app.core.exceptions import JobQueueFullError
+from app.schemas.report import CheckResponse
+from app.storage.job_store import JobStore
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+PipelineRunner = Callable[..., Awaitable[Dict[str, Any]]]
+
+def _summarize_stage(stage: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep stage progress small enough to poll: names and counts rather than full code."""
+    if stage == "code_splitting":
+        return {
+            "total_blocks": result.get("total_blocks", 0),
+            "blocks": [
+                {"name": block["name"], "type": block["type"], "lines": block.get("lines")}
+                for block in result.get("blocks", [])
+            ]
+        }
+    if stage == "git_search":
+        return {
+            "search_results": [
+                {
+                    "block_name": r.get("block_name"),
+                    "search_query": r.get("search_query"),
+                    "matches": len(r.get("found_matches", [])),
+                    "error": r.get("error")
+                }
+                for r in result.get("search_results", [])
+            ]
+        }
+    return {"comparisons": len(result.get("comparisons", []))}
+
+def _log_write_error(future: Future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"Job store write failed: {future.exception()}")
+
+class JobQueue:
+    """
+    Bounded asyncio queue drained by a fixed pool of worker tasks. Each job runs
+    the plagiarism pipeline and records its status, per-stage progress and final
+    CheckResponse in the job store.
+
+    Store writes run on one writer thread, off the event loop and in the order
+    they are issued, so a job's progress never overtakes its final result. Jobs
+    carry this queue's instance_id, and a monitor task keeps the instance's
+    heartbeat fresh and fails the jobs of instances (other workers, earlier runs
+    of this one) whose heartbeat stopped.
+    """
+
+    STAGE_KEYS = {
+        "code_splitting": "stage_1_result",
+        "git_search": "stage_2_result",
+        "similarity_analysis": "stage_3_result"
+    }
+
+    def __init__(self, store: JobStore, runner: PipelineRunner, workers: int, max_size: int):
+        self.store = store
+        self.runner = runner
+        self.worker_count = max(1, workers)
+        self.max_size = max_size
+        # Pids are reused after a restart and repeat across containers; this id is never reused
+        self.instance_id = uuid.uuid4().hex
+        self.queue: Optional[asyncio.Queue] = None
+        self.workers: List[asyncio.Task] = []
+        self._writer: Optional[ThreadPoolExecutor] = None
+
+    def _write_nowait(self, func: Callable, *args, **kwargs) -> Future:
+        """Queue a store write on the writer thread; safe to call from any thread."""
+        future = self._writer.submit(func, *args, **kwargs)
+        future.add_done_callback(_log_write_error)
+        return future
+
+    async def _write(self, func: Callable, *args, **kwargs) -> Any:
+        return await asyncio.wrap_future(self._write_nowait(func, *args, **kwargs))
+
+    async def start(self):
+        if self.workers:
+            return
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job-store")
+        await self._write(self.store.heartbeat, self.instance_id)
+        await self._fail_orphaned()
+        self.queue = asyncio.Queue(maxsize=self.max_size)
+        self.workers = [asyncio.create_task(self._worker(i)) for i in range(self.worker_count)]
+        self.workers.append(asyncio.create_task(self._monitor()))
+        logger.info(f"Job queue started with {self.worker_count} workers (max queued: {self.max_size})")
+
+    async def stop(self):
+        for task in self.workers:
+            task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        if self._writer is not None:
+            # Let writes already issued (final results) reach the store
+            await asyncio.to_thread(self._writer.shutdown)
+            self._writer = None
+
+    async def _fail_orphaned(self):
+        failed = await self._write(
+            self.store.fail_orphaned,
+            "Job interrupted: the server process running it stopped",
+            settings.JOB_HEARTBEAT_SECONDS * 3
+        )
+        if failed:
+            logger.warning(f"Marked {failed} orphaned jobs as failed")
+
+    async def _monitor(self):
+        while True:
+            await asyncio.sleep(settings.JOB_HEARTBEAT_SECONDS)
+            try:
+                await self._write(self.store.heartbeat, self.instance_id)
+                await self._fail_orphaned()
+            except Exception as e:
+                logger.warning(f"Job queue heartbeat failed: {e}")
+
+    async def submit(
+        self,
+        code: str,
+        source: Optional[str] = None,
+        previous_check_id: Optional[str] = None,
+        assignment_id: Optional[str] = None,
+        submitter_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        if self.queue is None:
+            raise RuntimeError("Job queue is not running")
+
+        await self._write(self.store.prune, time.time() - settings.JOB_RESULT_TTL_SECONDS)
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "source": source,
+            "stage": None,
+            "progress": {},
+            "result": None,
+            "error": None,
+            "instance_id": self.instance_id,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None
+        }
+
+        try:
+            options = {"previous_check_id": previous_check_id, "assignment_id": assignment_id, "submitter_id": submitter_id}
+            self.queue.put_nowait((job["id"], code, options))
+        except asyncio.QueueFull:
+            raise JobQueueFullError(f"Job queue is full ({self.max_size} jobs waiting)")
+
+        # Issued before a worker can take the job, so the job exists before its status updates arrive
+        await self._write(self.store.set, job["id"], job)
+        logger.info(f"Job {job['id']} queued ({self.queue.qsize()} waiting)")
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.store.get(job_id)
+
+    def queue_depth(self) -> int:
+        return self.queue.qsize() if self.queue is not None else 0
+
+    async def _worker(self, index: int):
+        while True:
+            job_id, code, options = await self.queue.get()
+            try:
+                await self._run(job_id, code, options)
+            finally:
+                self.queue.task_done()
+
+    async def _run(self, job_id: str, code: str, options: Dict[str, Any]):
+        """options: previous_check_id, assignment_id and submitter_id, passed on to the runner."""
+        await self._write(self.store.update, job_id, status="running", started_at=time.time())
+        progress: Dict[str, Any] = {}
+
+        def on_progress(stage: str, result: Dict[str, Any]):
+            # Called from inside the pipeline, which cannot wait for the write
+            progress[self.STAGE_KEYS.get(stage, stage)] = _summarize_stage(stage, result)
+            self._write_nowait(self.store.update, job_id, stage=stage, progress=dict(progress))
+
+        try:
+            result = await self.runner(code, on_progress=on_progress, **options)
+            response = CheckResponse.from_pipeline_result(result)
+            await self._write(
+                self.store.update,
+                job_id,
+                status="completed" if response.success else "failed",
+                result=response.model_dump(),
+                error=response.error,
+                finished_at=time.time()
+            )
+            logger.info(f"Job {job_id} finished (success={response.success})")
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            await self._write(self.store.update, job_id, status="failed", error=str(e), finished_at=time.time())
@@ -1,42 +1,306 @@
+import asyncio
+import hashlib
 import json
-from typing import Any
-from langchain_openai import ChatOpenAI
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Type
+from pydantic import BaseModel, ValidationError
+from tenacity import AsyncRetrying, Retrying, retry_if_exception, stop_after_attempt, wait_exponential_jitter
 from app.core.config import settings
+from app.core.exceptions import ConfigurationError, LLMError
+from app.services.http_clients import http_clients
+from app.storage.sqlite_cache import SQLiteCache
+from app.utils.lazy import LazyService
+from app.utils.llm_usage import record_cache_hit, record_usage
 from app.utils.logger import get_logger
-import httpx
+from app.utils.metrics import LLM_CALLS, LLM_CALLS_IN_FLIGHT, LLM_CALL_SECONDS, LLM_TOKENS, observe_call
+from app.utils.singleflight import SingleFlight
+from app.utils.tokens import count_tokens
 
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
 
+logger = get_logger(__name__)
 
-proxies = {
-    'https': settings.PROXY
-}
+MODEL = "gpt-5-nano"
 
-logger = get_logger(__name__)
+def _is_retryable(error: BaseException) -> bool:
+    """Worth another attempt: the API was unreachable, overloaded or throttling, or the reply did not match the schema."""
+    # Deferred with the rest of the OpenAI SDK; by the time a call has failed it is loaded
+    import openai
+
+    return isinstance(error, (
+        openai.APIConnectionError,
+        openai.APITimeoutError,
+        openai.RateLimitError,
+        openai.InternalServerError,
+        LLMError
+    ))
 
 class LLMService:
+    """
+    Chat model calls that return validated JSON.
+
+    With a schema, replies come from the model's native structured output
+    (JSON schema, strict) when LLM_STRUCTURED_OUTPUT is on, or from JSON text
+    validated against the schema otherwise. Transient API errors and
+    malformed replies are retried with exponential backoff; when every attempt
+    fails LLMError is raised (batch calls put None in that slot) so the caller
+    can fall back instead of reading an empty reply as 0%. Successful replies
+    are cached on disk by prompt hash, so an identical prompt is only paid for
+    once; while one is in flight, other callers with the same prompt wait for it.
+    """
+
     def __init__(self):
-        self.llm = ChatOpenAI(
-            api_key=settings.OPENAI_API_KEY,
-            http_client=httpx.Client(proxy=proxies.get('https')),
-            # base_url=settings.OPENAI_API_BASE_URL,
-            model="gpt-5-nano",
-            temperature=0.3
-        )
+        http_clients.configure("openai", proxy=settings.PROXY or None, timeout=settings.LLM_TIMEOUT_SECONDS)
+        self._llm: Optional["ChatOpenAI"] = None
+        self._llm_generation = -1
+        self._structured: Dict[Type[BaseModel], Any] = {}
+        self.cache: Optional[SQLiteCache] = None
+        self.inflight: SingleFlight[dict] = SingleFlight("llm")
+
+        if settings.LLM_CACHE_ENABLED:
+            self.cache = SQLiteCache(
+                settings.LLM_CACHE_PATH,
+                namespace="llm_responses",
+                ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+                stale_seconds=0,
+                max_entries=settings.LLM_CACHE_MAX_ENTRIES
+            )
+
+    @property
+    def llm(self) -> "ChatOpenAI":
+        """The chat model, rebuilt on the shared clients whenever the pool has been closed and reopened."""
+        if self._llm is None or self._llm_generation != http_clients.generation:
+            if not settings.OPENAI_API_KEY:
+                raise ConfigurationError("OPENAI_API_KEY is not set")
+            # Deferred: langchain_openai pulls in LangChain and the OpenAI SDK
+            from langchain_openai import ChatOpenAI
+
+            self._llm = ChatOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                http_client=http_clients.client("openai"),
+                http_async_client=http_clients.async_client("openai"),
+                base_url=settings.OPENAI_API_BASE_URL or None,
+                model=MODEL,
+                temperature=0.3,
+                # Retries are handled here so malformed replies are retried the same way
+                max_retries=0
+            )
+            self._llm_generation = http_clients.generation
+            self._structured = {}
+        return self._llm
+
+    @llm.setter
+    def llm(self, model: "ChatOpenAI"):
+        """Swap in another chat model (benchmarks, tests); it is kept until the pool is closed."""
+        self._llm = model
+        self._llm_generation = http_clients.generation
+        self._structured = {}
+
+    def _structured_llm(self, schema: Type[BaseModel]):
+        if schema not in self._structured:
+            self._structured[schema] = self.llm.with_structured_output(
+                schema,
+                method="json_schema",
+                strict=True,
+                include_raw=True
+            )
+        return self._structured[schema]
+
+    def _cache_key(self, prompt: str, schema: Optional[Type[BaseModel]]) -> str:
+        name = schema.__name__ if schema else "json"
+        return hashlib.sha256(f"{MODEL}|{name}|{prompt}".encode("utf-8")).hexdigest()
+
+    def _cached(self, key: str) -> Optional[dict]:
+        if self.cache is None:
+            return None
+        cached, _ = self.cache.get(key)
+        if cached is not None:
+            record_cache_hit()
+            LLM_CALLS.labels(result="cache_hit").inc()
+        return cached
+
+    def _remember(self, key: str, result: dict):
+        if self.cache is not None:
+            self.cache.set(key, result)
+
+    def _parse_json(self, response: str) -> dict:
+        try:
+            return json.loads(response)
+        except json.JSONDecodeError:
+            logger.error(f"Failed to parse JSON response: {response}")
+            return {}
+
+    def _usage(self, prompt: str, response: Any) -> tuple:
+        """(prompt_tokens, completion_tokens) as reported by the API, or counted locally when it reports none."""
+        usage = getattr(response, "usage_metadata", None) or {}
+        prompt_tokens = usage.get("input_tokens")
+        completion_tokens = usage.get("output_tokens")
+        if prompt_tokens is None:
+            prompt_tokens = count_tokens(prompt)
+        if completion_tokens is None:
+            completion_tokens = count_tokens(response.content)
+        return prompt_tokens, completion_tokens
+
+    def _record(self, prompt: str, response: Any, started: float):
+        prompt_tokens, completion_tokens = self._usage(prompt, response)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.debug(f"LLM call: {prompt_tokens} prompt + {completion_tokens} completion tokens in {elapsed_ms:.0f} ms")
+        record_usage(prompt_tokens, completion_tokens, elapsed_ms)
+        LLM_TOKENS.labels(kind="prompt").inc(prompt_tokens)
+        LLM_TOKENS.labels(kind="completion").inc(completion_tokens)
+
+    def _validate(self, content: str, schema: Type[BaseModel]) -> dict:
+        try:
+            return schema.model_validate_json(content).model_dump()
+        except ValidationError as e:
+            raise LLMError(f"Reply does not match {schema.__name__}: {e.errors()[:3]}") from e
+
+    def _structured_result(self, prompt: str, output: Dict[str, Any], started: float) -> dict:
+        self._record(prompt, output["raw"], started)
+        if output.get("parsing_error") is not None or output.get("parsed") is None:
+            raise LLMError(f"Malformed structured reply: {output.get('parsing_error')}")
+        return output["parsed"].model_dump()
+
+    def _call_json(self, prompt: str, schema: Optional[Type[BaseModel]]) -> dict:
+        started = time.perf_counter()
+        if schema is not None and settings.LLM_STRUCTURED_OUTPUT:
+            return self._structured_result(prompt, self._structured_llm(schema).invoke(prompt), started)
+
+        response = self.llm.invoke(prompt)
+        self._record(prompt, response, started)
+        return self._validate(response.content, schema) if schema else self._parse_json(response.content)
+
+    async def _acall_json(self, prompt: str, schema: Optional[Type[BaseModel]]) -> dict:
+        started = time.perf_counter()
+        if schema is not None and settings.LLM_STRUCTURED_OUTPUT:
+            return self._structured_result(prompt, await self._structured_llm(schema).ainvoke(prompt), started)
+
+        response = await self.llm.ainvoke(prompt)
+        self._record(prompt, response, started)
+        return self._validate(response.content, schema) if schema else self._parse_json(response.content)
+
+    def _retry_options(self) -> Dict[str, Any]:
+        return {
+            "stop": stop_after_attempt(settings.LLM_MAX_RETRIES + 1),
+            "wait": wait_exponential_jitter(initial=settings.LLM_RETRY_BASE_SECONDS, max=30),
+            "retry": retry_if_exception(_is_retryable),
+            "reraise": True
+        }
 
     def invoke(self, prompt: str) -> str:
         try:
+            started = time.perf_counter()
             response = self.llm.invoke(prompt)
+            self._record(prompt, response, started)
             return response.content
         except Exception as e:
             logger.error(f"LLM invocation error: {e}")
             raise
 
-    def invoke_json(self, prompt: str) -> dict:
-        response = self.invoke(prompt)
+    def invoke_json(self, prompt: str, schema: Optional[Type[BaseModel]] = None) -> dict:
+        """Cached, retried call; raises LLMError once every attempt has failed."""
+        key = self._cache_key(prompt, schema)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        result, shared = self.inflight.do(key, lambda: self._invoke_uncached(key, prompt, schema))
+        if shared:
+            # Paid for by the concurrent caller; counts like a cache hit for this check
+            record_cache_hit()
+        return result
+
+    def _invoke_uncached(self, key: str, prompt: str, schema: Optional[Type[BaseModel]]) -> dict:
+        with observe_call(LLM_CALL_SECONDS, LLM_CALLS, LLM_CALLS_IN_FLIGHT):
+            try:
+                for attempt in Retrying(**self._retry_options()):
+                    with attempt:
+                        result = self._call_json(prompt, schema)
+            except Exception as e:
+                logger.error(f"LLM invocation error: {e}")
+                raise LLMError(f"LLM call failed: {e}") from e
+
+        self._remember(key, result)
+        return result
+
+    async def ainvoke(self, prompt: str) -> str:
         try:
-            return json.loads(response)
-        except json.JSONDecodeError:
-            logger.error(f"Failed to parse JSON response: {response}")
-            return {}
+            started = time.perf_counter()
+            response = await self.llm.ainvoke(prompt)
+            self._record(prompt, response, started)
+            return response.content
+        except Exception as e:
+            logger.error(f"LLM invocation error: {e}")
+            raise
+
+    async def ainvoke_json(self, prompt: str, schema: Optional[Type[BaseModel]] = None) -> dict:
+        key = self._cache_key(prompt, schema)
+        # The reply cache is SQLite; read and write it from a worker thread
+        cached = await asyncio.to_thread(self._cached, key)
+        if cached is not None:
+            return cached
+
+        result, shared = await self.inflight.ado(key, lambda: self._ainvoke_uncached(key, prompt, schema))
+        if shared:
+            record_cache_hit()
+        return result
+
+    async def _ainvoke_uncached(self, key: str, prompt: str, schema: Optional[Type[BaseModel]]) -> dict:
+        with observe_call(LLM_CALL_SECONDS, LLM_CALLS, LLM_CALLS_IN_FLIGHT):
+            try:
+                async for attempt in AsyncRetrying(**self._retry_options()):
+                    with attempt:
+                        result = await self._acall_json(prompt, schema)
+            except Exception as e:
+                logger.error(f"LLM invocation error: {e}")
+                raise LLMError(f"LLM call failed: {e}") from e
+
+        await asyncio.to_thread(self._remember, key, result)
+        return result
+
+    def lookup(self, prompt: str, schema: Optional[Type[BaseModel]] = None) -> Optional[dict]:
+        """Cached reply for a prompt, without calling the model."""
+        return self._cached(self._cache_key(prompt, schema))
+
+    def remember(self, prompt: str, result: dict, schema: Optional[Type[BaseModel]] = None):
+        """Store a reply obtained another way (e.g. one entry of a batch reply) under the prompt it answers."""
+        self._remember(self._cache_key(prompt, schema), result)
+
+    def _try_invoke_json(self, prompt: str, schema: Optional[Type[BaseModel]]) -> Optional[dict]:
+        try:
+            return self.invoke_json(prompt, schema)
+        except LLMError:
+            return None
+
+    def batch_json(self, prompts: List[str], max_concurrency: int = 4, schema: Optional[Type[BaseModel]] = None) -> List[Optional[dict]]:
+        """Run prompts concurrently; a call that failed every attempt yields None in its slot."""
+        if len(prompts) <= 1 or max_concurrency <= 1:
+            return [self._try_invoke_json(prompt, schema) for prompt in prompts]
+
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(prompts))) as executor:
+            # Each call runs in a copy of the caller's context so its usage counts towards the same check
+            futures = [executor.submit(copy_context().run, self._try_invoke_json, prompt, schema) for prompt in prompts]
+            return [future.result() for future in futures]
+
+    async def abatch_json(self, prompts: List[str], max_concurrency: int = 4, schema: Optional[Type[BaseModel]] = None) -> List[Optional[dict]]:
+        """Async counterpart of batch_json, bounded by a semaphore."""
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def run(prompt: str) -> Optional[dict]:
+            async with semaphore:
+                try:
+                    return await self.ainvoke_json(prompt, schema)
+                except LLMError:
+                    return None
+
+        return await asyncio.gather(*(run(prompt) for prompt in prompts))
+
+    def cache_stats(self) -> Dict[str, Any]:
+        if self.cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.cache.stats()}
 
-llm_service = LLMService()
+llm_service: LazyService[LLMService] = LazyService(LLMService)
@@ -0,0 +1,160 @@
+import io
+import textwrap
+import tokenize
+from typing import List, Tuple
+from app.core.config import settings
+from app.utils.tokens import count_tokens, truncate_tokens
+
+# Smallest share of the budget a code side is cut down to, however long the template
+MIN_SIDE_TOKENS = 32
+TRUNCATION_MARK = "# ... (truncated)"
+
+PAIR_TEMPLATE = """Compare these two code snippets and determine similarity percentage.
+
+Student Code:
+```python
+{block_code}
+```
+
+Found Code on GitHub:
+```python
+{match_code}
+```
+
+Respond ONLY with valid JSON (no markdown, no extra text):
+{{
+    "similarity_percent": <0-100>,
+    "is_suspicious": <true or false>,
+    "reason": "<brief reason>"
+}}"""
+
+BATCH_SECTION_TEMPLATE = """### Pair {index}
+
+Student Code:
+```python
+{block_code}
+```
+
+Found Code on GitHub:
+```python
+{match_code}
+```"""
+
+BATCH_TEMPLATE = """Compare each pair of code snippets below and determine the similarity percentage for every pair.
+
+{body}
+
+Respond ONLY with valid JSON (no markdown, no extra text), one entry per pair in the same order:
+{{
+    "results": [
+        {{
+            "index": <pair number>,
+            "similarity_percent": <0-100>,
+            "is_suspicious": <true or false>,
+            "reason": "<brief reason>"
+        }}
+    ]
+}}"""
+
+_CODE_START = {tokenize.NEWLINE, tokenize.NL, tokenize.INDENT, tokenize.DEDENT, tokenize.ENCODING}
+
+def _removable_spans(code: str) -> List[Tuple[Tuple[int, int], Tuple[int, int]]]:
+    """(start, end) positions of comments and of strings that form a statement on their own (docstrings)."""
+    spans = []
+    previous = tokenize.ENCODING
+    pending_string = None
+
+    for token in tokenize.generate_tokens(io.StringIO(code).readline):
+        if token.type == tokenize.COMMENT:
+            spans.append((token.start, token.end))
+        elif token.type == tokenize.STRING and previous in _CODE_START:
+            pending_string = (token.start, token.end)
+        elif pending_string is not None:
+            if token.type in (tokenize.NEWLINE, tokenize.ENDMARKER):
+                spans.append(pending_string)
+            pending_string = None
+
+        if token.type not in (tokenize.COMMENT, tokenize.NL):
+            previous = token.type
+    return spans
+
+def strip_code(code: str) -> str:
+    """
+    Drop comments, docstrings, trailing whitespace, blank lines and common
+    indentation. Code that does not tokenize (a truncated snippet) only loses
+    whole-line comments and the layout.
+    """
+    lines = code.splitlines()
+    try:
+        spans = _removable_spans(code)
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        spans = []
+        lines = [line for line in lines if not line.lstrip().startswith("#")]
+
+    for (start_row, start_col), (end_row, end_col) in sorted(spans, reverse=True):
+        head = lines[start_row - 1][:start_col]
+        tail = lines[end_row - 1][end_col:]
+        lines[start_row - 1:end_row] = [head + tail]
+
+    kept = [line.rstrip() for line in lines if line.strip()]
+    return textwrap.dedent("\n".join(kept))
+
+def _truncate(code: str, max_tokens: int) -> str:
+    if count_tokens(code) <= max_tokens:
+        return code
+    head = truncate_tokens(code, max(1, max_tokens - count_tokens("\n" + TRUNCATION_MARK)))
+    # Cut at a line boundary so the model never sees half a statement
+    if "\n" in head:
+        head = head[:head.rindex("\n")]
+    return f"{head}\n{TRUNCATION_MARK}"
+
+def fit(codes: List[str], budget: int) -> List[str]:
+    """
+    Strip every code side and share the token budget between them: sides that
+    need less than an equal share keep all of it, and the rest is split over the
+    longer sides.
+    """
+    stripped = [strip_code(code) for code in codes]
+    sizes = [count_tokens(code) for code in stripped]
+    allowed = [0] * len(stripped)
+
+    remaining = max(budget, MIN_SIDE_TOKENS * len(stripped))
+    left = len(stripped)
+    for i in sorted(range(len(stripped)), key=lambda i: sizes[i]):
+        allowed[i] = min(sizes[i], max(MIN_SIDE_TOKENS, remaining // left))
+        remaining -= allowed[i]
+        left -= 1
+
+    return [_truncate(code, limit) for code, limit in zip(stripped, allowed)]
+
+class PromptBuilder:
+    """
+    Builds similarity prompts that fit LLM_PROMPT_TOKEN_BUDGET tokens per pair
+    (counted with tiktoken), after stripping comments, docstrings and layout
+    from both sides. A batch prompt gets the budget once per pair it holds, so
+    batching does not cut how much of each pair the model sees. The GitHub
+    side is already the region aligned with the block, so truncation keeps its start.
+    """
+
+    def _code_budget(self, template_tokens: int, pairs: int = 1) -> int:
+        return settings.LLM_PROMPT_TOKEN_BUDGET * pairs - template_tokens
+
+    def pair_prompt(self, block_code: str, match_code: str) -> str:
+        template_tokens = count_tokens(PAIR_TEMPLATE.format(block_code="", match_code=""))
+        block_code, match_code = fit([block_code, match_code], self._code_budget(template_tokens))
+        return PAIR_TEMPLATE.format(block_code=block_code, match_code=match_code)
+
+    def batch_prompt(self, pairs: List[Tuple[str, str]]) -> str:
+        empty_sections = "\n\n".join(
+            BATCH_SECTION_TEMPLATE.format(index=index, block_code="", match_code="") for index in range(len(pairs))
+        )
+        template_tokens = count_tokens(BATCH_TEMPLATE.format(body=empty_sections))
+        fitted = fit([code for pair in pairs for code in pair], self._code_budget(template_tokens, len(pairs)))
+
+        sections = [
+            BATCH_SECTION_TEMPLATE.format(index=index, block_code=fitted[2 * index], match_code=fitted[2 * index + 1])
+            for index in range(len(pairs))
+        ]
+        return BATCH_TEMPLATE.format(body="\n\n".join(sections))
+
+prompt_builder = PromptBuilder()
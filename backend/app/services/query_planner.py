@@ -0,0 +1,232 @@
+import ast
+import json
+import keyword
+import math
+import os
+import re
+from typing import Any, Dict, List, Optional
+from app.core.config import settings
+from app.services.code_parser import code_parser
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "python_token_df.json")
+
+# How much a term says about a block depends on where it appears
+KIND_WEIGHTS = {"definition": 1.3, "literal": 1.2, "call": 1.1, "attribute": 1.0, "name": 0.8}
+_WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]{2,}")
+_IGNORED = frozenset(keyword.kwlist) | {"self", "cls", "args", "kwargs", "None", "True", "False"}
+
+def _add(terms: Dict[str, str], term: str, kind: str):
+    if len(term) < 3 or term in _IGNORED or term.startswith("__"):
+        return
+    current = terms.get(term)
+    if current is None or KIND_WEIGHTS[kind] > KIND_WEIGHTS[current]:
+        terms[term] = kind
+
+def _docstring_nodes(node: ast.AST) -> set:
+    docstrings = set()
+    for child in ast.walk(node):
+        body = getattr(child, "body", None)
+        if (isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Module)) and body
+                and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant)
+                and isinstance(body[0].value.value, str)):
+            docstrings.add(id(body[0].value))
+    return docstrings
+
+def extract_terms(node: ast.AST) -> Dict[str, str]:
+    """Identifiers and string-literal words of a definition, each tagged with the most telling place it occurs."""
+    terms: Dict[str, str] = {}
+    docstrings = _docstring_nodes(node)
+
+    for child in ast.walk(node):
+        if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            _add(terms, child.name, "definition")
+        elif isinstance(child, ast.arg):
+            _add(terms, child.arg, "name")
+        elif isinstance(child, ast.Call):
+            func = child.func
+            if isinstance(func, ast.Name):
+                _add(terms, func.id, "call")
+            elif isinstance(func, ast.Attribute):
+                _add(terms, func.attr, "call")
+        elif isinstance(child, ast.Attribute):
+            _add(terms, child.attr, "attribute")
+        elif isinstance(child, ast.Name):
+            _add(terms, child.id, "name")
+        elif isinstance(child, ast.Constant) and isinstance(child.value, str) and id(child) not in docstrings:
+            for word in _WORD.findall(child.value):
+                _add(terms, word, "literal")
+
+    return terms
+
+def _is_trivial_body(body: List[ast.stmt]) -> bool:
+    if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) and isinstance(body[0].value.value, str):
+        body = body[1:]
+    if not body:
+        return True
+    if len(body) > 1:
+        return False
+
+    stmt = body[0]
+    if isinstance(stmt, ast.Pass):
+        return True
+    if isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Constant):
+        return True
+    if isinstance(stmt, ast.Return):
+        return stmt.value is None or isinstance(stmt.value, (ast.Name, ast.Attribute, ast.Constant))
+    if isinstance(stmt, ast.Raise):
+        return True
+    return False
+
+def _is_boilerplate_init(node: ast.AST) -> bool:
+    """__init__ that only stores its arguments (and maybe calls super().__init__)."""
+    if node.name != "__init__":
+        return False
+    for stmt in node.body:
+        if isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Constant):
+            continue
+        if isinstance(stmt, (ast.Assign, ast.AnnAssign)):
+            targets = stmt.targets if isinstance(stmt, ast.Assign) else [stmt.target]
+            if (all(isinstance(t, ast.Attribute) and isinstance(t.value, ast.Name) and t.value.id == "self" for t in targets)
+                    and isinstance(stmt.value, (ast.Name, ast.Constant, ast.List, ast.Dict, ast.Tuple, type(None)))):
+                continue
+            return False
+        if (isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Call)
+                and isinstance(stmt.value.func, ast.Attribute) and stmt.value.func.attr == "__init__"):
+            continue
+        return False
+    return True
+
+class QueryPlanner:
+    """
+    Turns a code block into a GitHub code-search query, or decides it is not worth one.
+
+    Terms come from the block's AST and are weighted by inverse document frequency
+    against a table of how common each token is across ordinary Python functions
+    (built by scripts/build_query_corpus.py from the standard library), so
+    distinctive names and string literals win over `data`, `result` or `append`.
+    Each plan carries a usefulness score in [0, 1]; trivial blocks and plans below
+    QUERY_MIN_USEFULNESS are not searched.
+    """
+
+    def __init__(self, corpus_path: str = CORPUS_PATH):
+        self.documents = 1
+        self.doc_freq: Dict[str, int] = {}
+        try:
+            with open(corpus_path, encoding="utf-8") as f:
+                corpus = json.load(f)
+            self.documents = corpus["documents"]
+            self.doc_freq = corpus["doc_freq"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Query corpus not loaded ({e}); all terms weighted equally")
+        self.max_idf = math.log(self.documents + 1)
+
+    def idf(self, term: str) -> float:
+        return math.log((self.documents + 1) / (self.doc_freq.get(term.lower(), 0) + 1))
+
+    def _parse(self, code: str) -> Optional[ast.AST]:
+        try:
+            tree = ast.parse(code)
+        except SyntaxError:
+            return None
+        definitions = [n for n in tree.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))]
+        return definitions[0] if len(definitions) == 1 else tree
+
+    def _skip_reason(self, block: Dict[str, Any], node: Optional[ast.AST]) -> Optional[str]:
+        tokens = block.get("tokens")
+        if tokens is None:
+            tokens = code_parser.normalized_tokens(block["code"])
+        if len(tokens) < settings.QUERY_MIN_TOKENS:
+            return "too short to search"
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            if _is_boilerplate_init(node):
+                return "constructor boilerplate"
+            if _is_trivial_body(node.body):
+                return "trivial body"
+        return None
+
+    def plan(self, block: Dict[str, Any]) -> Dict[str, Any]:
+        """Return {"query", "terms", "usefulness", "skip_reason"}; query is "" when the block should not be searched."""
+        node = self._parse(block["code"])
+        skip_reason = self._skip_reason(block, node)
+        if skip_reason:
+            return {"query": "", "terms": [], "usefulness": 0.0, "skip_reason": skip_reason}
+
+        if node is not None:
+            terms = extract_terms(node)
+        else:
+            terms = {word: "name" for word in _WORD.findall(block["code"]) if word not in _IGNORED}
+
+        weighted = sorted(
+            (
+                (term, self.idf(term) * KIND_WEIGHTS[kind] * min(1.0, len(term) / 6))
+                for term, kind in terms.items()
+            ),
+            key=lambda item: item[1],
+            reverse=True
+        )[:settings.QUERY_MAX_TERMS]
+
+        # Rarity of the two strongest terms, squared so that a pile of ordinary words does not add up to a good query
+        rarity = [min(1.0, self.idf(term) / self.max_idf) ** 2 for term, _ in weighted[:2]] if self.max_idf else []
+        usefulness = round(sum(rarity) / 2, 3)
+        chosen = [{"term": term, "weight": round(weight, 3)} for term, weight in weighted]
+
+        if usefulness < settings.QUERY_MIN_USEFULNESS:
+            return {"query": "", "terms": chosen, "usefulness": usefulness, "skip_reason": "no distinctive terms"}
+
+        return {
+            "query": " ".join(term for term, _ in weighted),
+            "terms": chosen,
+            "usefulness": usefulness,
+            "skip_reason": None
+        }
+
+    def group(self, plans: List[Dict[str, Any]], per_page: int) -> List[Dict[str, Any]]:
+        """
+        Collapse plans into searches: identical queries are sent once, and with
+        QUERY_BATCH_SIZE > 1 several blocks' top terms are OR-ed into one query.
+        Returns [{"query", "per_page", "members": [plan index, ...], "batched": bool}].
+        """
+        searches: List[Dict[str, Any]] = []
+        by_query: Dict[str, Dict[str, Any]] = {}
+        single = []
+
+        for i, plan in enumerate(plans):
+            if not plan["query"]:
+                continue
+            if plan["query"] in by_query:
+                by_query[plan["query"]]["members"].append(i)
+                continue
+            search = {"query": plan["query"], "per_page": per_page, "members": [i], "batched": False}
+            by_query[plan["query"]] = search
+            single.append(search)
+
+        batch_size = max(1, settings.QUERY_BATCH_SIZE)
+        if batch_size == 1:
+            return single
+
+        for start in range(0, len(single), batch_size):
+            chunk = single[start:start + batch_size]
+            if len(chunk) == 1:
+                searches.append(chunk[0])
+                continue
+            top_terms = [plans[search["members"][0]]["terms"][0]["term"] for search in chunk]
+            searches.append({
+                "query": " OR ".join(top_terms),
+                "per_page": per_page * len(chunk),
+                "members": [member for search in chunk for member in search["members"]],
+                "batched": True
+            })
+        return searches
+
+    def assign(self, plan: Dict[str, Any], matches: List[Dict[str, Any]], per_page: int) -> List[Dict[str, Any]]:
+        """Pick the hits of a batched (OR) search that belong to this plan: those containing its top term."""
+        term = plan["terms"][0]["term"].lower()
+        return [
+            match for match in matches
+            if term in match.get("content", "").lower() or term in match.get("path", "").lower()
+        ][:per_page]
+
+query_planner = QueryPlanner()
@@ -0,0 +1,204 @@
+import ast
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional, Tuple
+from app.services.code_parser import code_parser
+from app.services.fingerprint_index import containment, fingerprint
+
+# Keeps Greedy String Tiling cheap on very long inputs
+MAX_TOKENS = 1000
+
+# Which definitions of a fetched file a block is aligned against, by block type
+WINDOW_GRANULARITY = {"class": "class", "module": "module", "raw": "module"}
+
+def greedy_string_tiling(a: List[str], b: List[str], min_match: int = 5) -> float:
+    """
+    Greedy String Tiling (Wise, as used by JPlag). Repeatedly marks the longest
+    common unmarked token runs of at least min_match tokens and returns the
+    share of both sequences covered by tiles.
+    """
+    if not a or not b:
+        return 0.0
+
+    marked_a = [False] * len(a)
+    marked_b = [False] * len(b)
+    tiled = 0
+
+    while True:
+        max_len = min_match
+        found = []
+
+        for i in range(len(a)):
+            if marked_a[i]:
+                continue
+            for j in range(len(b)):
+                if marked_b[j] or a[i] != b[j]:
+                    continue
+                length = 0
+                while (i + length < len(a) and j + length < len(b)
+                       and not marked_a[i + length] and not marked_b[j + length]
+                       and a[i + length] == b[j + length]):
+                    length += 1
+                if length > max_len:
+                    max_len = length
+                    found = [(i, j)]
+                elif length == max_len and length > min_match - 1:
+                    found.append((i, j))
+
+        if not found:
+            break
+
+        placed = False
+        for i, j in found:
+            if any(marked_a[i:i + max_len]) or any(marked_b[j:j + max_len]):
+                continue
+            for offset in range(max_len):
+                marked_a[i + offset] = True
+                marked_b[j + offset] = True
+            tiled += max_len
+            placed = True
+
+        if not placed:
+            break
+
+    return 2 * tiled / (len(a) + len(b))
+
+def alignment_ratio(a: List[str], b: List[str]) -> float:
+    """Longest-matching-blocks alignment ratio of two token sequences."""
+    if not a or not b:
+        return 0.0
+    return SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+def ast_shape(code: str) -> Optional[List[str]]:
+    """Pre-order sequence of AST node types, or None when the code does not parse."""
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return None
+    return [type(node).__name__ for node in ast.walk(tree)
+            if not isinstance(node, (ast.Load, ast.Store, ast.Del, ast.Module))]
+
+def tree_similarity(a: str, b: str) -> Optional[float]:
+    """
+    Approximates tree edit distance by aligning the node-type sequences of both
+    trees. Returns None when either side cannot be parsed (e.g. a truncated snippet).
+    """
+    shape_a = ast_shape(a)
+    shape_b = ast_shape(b)
+    if not shape_a or not shape_b:
+        return None
+    return alignment_ratio(shape_a[:MAX_TOKENS], shape_b[:MAX_TOKENS])
+
+class SimilarityEngine:
+    """Deterministic structural similarity between two pieces of Python code."""
+
+    WEIGHTS = {"tiling": 0.5, "alignment": 0.3, "tree": 0.2}
+
+    def score(self, code_a: str, code_b: str, min_match: int = 5) -> Dict[str, Any]:
+        tokens_a = code_parser.normalized_tokens(code_a)[:MAX_TOKENS]
+        tokens_b = code_parser.normalized_tokens(code_b)[:MAX_TOKENS]
+
+        components = {
+            "tiling": greedy_string_tiling(tokens_a, tokens_b, min_match),
+            "alignment": alignment_ratio(tokens_a, tokens_b),
+            "tree": tree_similarity(code_a, code_b)
+        }
+
+        available = {name: value for name, value in components.items() if value is not None}
+        total_weight = sum(self.WEIGHTS[name] for name in available)
+        combined = sum(self.WEIGHTS[name] * value for name, value in available.items()) / total_weight
+
+        return {
+            "similarity_percent": round(combined * 100),
+            "components": {name: round(value, 4) for name, value in available.items()}
+        }
+
+    def quick_score(self, code_a: str, code_b: str, tokens_a: Optional[List[str]] = None, tokens_b: Optional[List[str]] = None) -> int:
+        """
+        Cheap similarity (0-100) for ranking candidates: the share of code_a's
+        fingerprints found in code_b, with token overlap to break ties.
+        """
+        if tokens_a is None:
+            tokens_a = code_parser.normalized_tokens(code_a)
+        return self._quick_scorer(code_a, tokens_a)(code_b, tokens_b)
+
+    def _quick_scorer(self, code_a: str, tokens_a: List[str]):
+        """quick_score with code_a's fingerprints and token counts computed once, for scoring many windows."""
+        fingerprints_a = fingerprint(code_a, tokens=tokens_a)
+        counts_a = Counter(tokens_a)
+
+        def score(code_b: str, tokens_b: Optional[List[str]] = None) -> int:
+            if tokens_b is None:
+                tokens_b = code_parser.normalized_tokens(code_b)
+            shared = containment(fingerprints_a, fingerprint(code_b, tokens=tokens_b))
+            # Dice coefficient of the token multisets; order-blind, so only a tiebreaker
+            overlap = 2 * sum((counts_a & Counter(tokens_b)).values()) / (len(tokens_a) + len(tokens_b)) if tokens_a and tokens_b else 0.0
+            return round((0.8 * shared + 0.2 * overlap) * 100)
+
+        return score
+
+    def _definitions(self, block: Dict[str, Any], content: str) -> List[Dict[str, Any]]:
+        """The file's definitions at the block's own granularity, or [] when it does not parse (Python 2, fragments)."""
+        try:
+            tree = ast.parse(content)
+        except (SyntaxError, ValueError):
+            return []
+        return code_parser.blocks_from_tree(content, tree, WINDOW_GRANULARITY.get(block.get("type"), "method"), raw_fallback=False)
+
+    def align_window(self, block: Dict[str, Any], content: str) -> Dict[str, Any]:
+        """
+        Find the region of a fetched file that best matches the block:
+        {"snippet", "lines", "local_score"}. Parsable files are aligned per
+        definition; others with line windows of the block's length, first at
+        half-window steps, then line by line around the best one.
+        """
+        if not content:
+            return {"snippet": "", "lines": None, "local_score": 0}
+
+        tokens = block.get("tokens")
+        if tokens is None:
+            tokens = code_parser.normalized_tokens(block["code"])
+
+        score = self._quick_scorer(block["code"], tokens)
+
+        def window(lines: Tuple[int, int], text: str, text_tokens: Optional[List[str]] = None) -> Dict[str, Any]:
+            return {"snippet": text, "lines": lines, "local_score": score(text, text_tokens)}
+
+        definitions = self._definitions(block, content)
+        if definitions:
+            return max(
+                (window(tuple(d["lines"]), d["code"], d["tokens"]) for d in definitions),
+                key=lambda w: w["local_score"]
+            )
+
+        lines = content.splitlines(keepends=True)
+        size = max(1, block["code"].count("\n") + 1)
+        if len(lines) <= size:
+            return window((1, max(1, len(lines))), content)
+
+        def at(start: int) -> Dict[str, Any]:
+            return window((start + 1, start + size), "".join(lines[start:start + size]))
+
+        last = len(lines) - size
+        step = max(1, size // 2)
+        best_start = max(range(0, last + 1, step), key=lambda start: at(start)["local_score"])
+        # The best coarse window overlaps the match; try every start that still overlaps it
+        return max(
+            (at(start) for start in range(max(0, best_start - size + 1), min(last, best_start + size - 1) + 1)),
+            key=lambda w: w["local_score"]
+        )
+
+    def rank_candidates(self, block: Dict[str, Any], matches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Align the block against each fetched file and return copies of the matches
+        whose "snippet" is the best-aligned window, with its "lines" and
+        "local_score", best first (ties keep search order).
+        """
+        ranked = [
+            {**match, **self.align_window(block, match.get("content", ""))}
+            for match in matches
+        ]
+        ranked.sort(key=lambda match: match["local_score"], reverse=True)
+        return ranked
+
+similarity_engine = SimilarityEngine()
@@ -0,0 +1,211 @@
+import textwrap
+import threading
+import time
+import uuid
+import zlib
+from typing import Any, Dict, List, Optional, Set
+from app.core.config import settings
+from app.services.code_parser import code_parser
+from app.services.fingerprint_index import containment, fingerprint
+from app.storage.sqlite_cache import SQLiteCache
+from app.storage.ttl_cache import TTLCache
+from app.utils.hashing import code_hash, token_hash
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Template lines with fewer tokens ("else:", "return result") are too common to subtract
+MIN_LINE_TOKENS = 3
+# A block is only trimmed when it shares at least this many lines with the template (e.g. signature and docstring)
+MIN_SHARED_LINES = 2
+# A worker re-reads an assignment's template after this long, so uploads to another worker are picked up
+LOCAL_TTL_SECONDS = 60
+
+def line_key(line: str) -> Optional[int]:
+    """Hash of a line's tokens, ignoring comments and layout; None for lines too short to be distinctive."""
+    tokens = code_parser.lexical_tokens(line)
+    if len(tokens) < MIN_LINE_TOKENS:
+        return None
+    return zlib.crc32(" ".join(tokens).encode("utf-8"))
+
+class AssignmentTemplate:
+    """
+    The starter code of one assignment, reduced to hash sets: code hashes of
+    its blocks, winnowed fingerprints and distinctive lines. Every check
+    against it is a set lookup, so the template size does not matter.
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        self.assignment_id: str = data["assignment_id"]
+        self.version: str = data["version"]
+        self.data = data
+        self.code_hashes: Set[str] = set(data["code_hashes"])
+        self.fingerprints: Set[int] = set(data["fingerprints"])
+        self.lines: Set[int] = set(data["lines"])
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "assignment_id": self.assignment_id,
+            "version": self.version,
+            "files": self.data["files"],
+            "blocks": len(self.code_hashes),
+            "lines": len(self.lines),
+            "fingerprints": len(self.fingerprints),
+            "uploaded_at": self.data["uploaded_at"]
+        }
+
+    def match(self, block: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        How much of a block is starter code: {"excluded": True, "reason"} when it
+        is (nearly) all template, {"excluded": False, "code", "removed_lines"}
+        when template lines were subtracted, None when it is the student's own.
+        """
+        # Exact code only (comments and layout ignored): the structural hash also ignores names and
+        # literals, so a student block that merely has the template's shape would be dropped
+        if (block.get("hash") or code_hash(block["code"])) in self.code_hashes:
+            return {"excluded": True, "reason": "Starter code: identical to a block of the assignment template"}
+
+        tokens = block.get("tokens")
+        fingerprints = fingerprint(block["code"], tokens=tokens)
+        share = containment(fingerprints, self.fingerprints)
+        if fingerprints and share >= settings.TEMPLATE_MATCH_THRESHOLD:
+            return {"excluded": True, "reason": f"Starter code: {round(share * 100)}% of fingerprints come from the assignment template"}
+
+        lines = block["code"].splitlines()
+        kept = [line for line in lines if line_key(line) not in self.lines]
+        removed = len(lines) - len(kept)
+        if removed < MIN_SHARED_LINES:
+            return None
+        if not any(line_key(line) is not None for line in kept):
+            return {"excluded": True, "reason": "Starter code: only template lines remain after subtracting the assignment template"}
+        return {"excluded": False, "code": textwrap.dedent("\n".join(kept)), "removed_lines": removed}
+
+def build_template(assignment_id: str, files: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Stored form of a template from parsed files ({"filename", "code", "blocks"} as parse_sources returns them)."""
+    code_hashes: Set[str] = set()
+    fingerprints: Set[int] = set()
+    lines: Set[int] = set()
+
+    for file in files:
+        if not file.get("code"):
+            continue
+        # Lines and fingerprints come from the whole file, so module-level code (imports, constants) counts too
+        for line in file["code"].splitlines():
+            key = line_key(line)
+            if key is not None:
+                lines.add(key)
+        fingerprints |= fingerprint(file["code"])
+        for block in file["blocks"]:
+            code_hashes.add(block.get("hash") or code_hash(block["code"]))
+
+    return {
+        "assignment_id": assignment_id,
+        "version": uuid.uuid4().hex,
+        "files": [file["filename"] for file in files if file.get("code")],
+        "code_hashes": sorted(code_hashes),
+        "fingerprints": sorted(fingerprints),
+        "lines": sorted(lines),
+        "uploaded_at": time.time()
+    }
+
+class TemplateStore:
+    """
+    Per-assignment starter-code templates, persisted in SQLite so every worker
+    sees an upload; each worker keeps the ones in use loaded as sets.
+    """
+
+    def __init__(self):
+        self._store: Optional[SQLiteCache] = None
+        self._store_lock = threading.Lock()
+        self.loaded = TTLCache("templates", ttl_seconds=LOCAL_TTL_SECONDS, max_size=settings.TEMPLATE_MAX_ASSIGNMENTS)
+
+    @property
+    def store(self) -> SQLiteCache:
+        # Opened on first use: most deployments never upload a template
+        if self._store is None:
+            with self._store_lock:
+                if self._store is None:
+                    self._store = SQLiteCache(
+                        settings.TEMPLATE_STORE_PATH,
+                        namespace="assignment_templates",
+                        ttl_seconds=settings.TEMPLATE_TTL_SECONDS,
+                        stale_seconds=0,
+                        max_entries=settings.TEMPLATE_MAX_ASSIGNMENTS
+                    )
+        return self._store
+
+    def save(self, assignment_id: str, files: List[Dict[str, Any]]) -> AssignmentTemplate:
+        """Replace the assignment's template with these files."""
+        template = AssignmentTemplate(build_template(assignment_id, files))
+        self.store.set(assignment_id, template.data)
+        self.loaded.set(assignment_id, template)
+        logger.info(
+            f"Template for assignment '{assignment_id}': {len(template.data['files'])} files, "
+            f"{len(template.code_hashes)} blocks, {len(template.lines)} lines"
+        )
+        return template
+
+    def get(self, assignment_id: str) -> Optional[AssignmentTemplate]:
+        template = self.loaded.get(assignment_id)
+        if template is not None:
+            return template
+
+        data, _ = self.store.get(assignment_id)
+        if data is None:
+            return None
+        template = AssignmentTemplate(data)
+        self.loaded.set(assignment_id, template)
+        return template
+
+    def delete(self, assignment_id: str) -> bool:
+        existed = self.get(assignment_id) is not None
+        self.store.delete(assignment_id)
+        self.loaded.delete(assignment_id)
+        return existed
+
+    def apply(self, template: AssignmentTemplate, blocks: List[Dict[str, Any]], resolved: Dict[int, Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Settle blocks that are starter code as not suspicious and cut template
+        lines out of the rest, in place, so later stages only see student code.
+        """
+        excluded = trimmed = removed_lines = 0
+        for i, block in enumerate(blocks):
+            if i in resolved:
+                continue
+            outcome = template.match(block)
+            if outcome is None:
+                continue
+
+            if outcome["excluded"]:
+                block["template"] = True
+                resolved[i] = {
+                    "block_name": block["name"],
+                    "block_type": block["type"],
+                    "similarity_percent": 0,
+                    "is_suspicious": False,
+                    "source": None,
+                    "source_repo": None,
+                    "source_url": None,
+                    "reason": outcome["reason"],
+                    "engine": "template"
+                }
+                excluded += 1
+                continue
+
+            tokens = code_parser.normalized_tokens(outcome["code"])
+            block.update(code=outcome["code"], tokens=tokens, structural_hash=token_hash(tokens))
+            # The result cache key must describe the trimmed code, not the submitted one
+            block.pop("hash", None)
+            block["template_lines_removed"] = outcome["removed_lines"]
+            trimmed += 1
+            removed_lines += outcome["removed_lines"]
+
+        return {
+            "assignment_id": template.assignment_id,
+            "version": template.version,
+            "blocks_excluded": excluded,
+            "blocks_trimmed": trimmed,
+            "lines_removed": removed_lines
+        }
+
+template_store = TemplateStore()
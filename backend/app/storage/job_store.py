@@ -0,0 +1,160 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+from app.core.config import settings
+from app.storage.memory_store import MemoryStore
+
+ACTIVE_STATUSES = ("queued", "running")
+
+class JobStore(MemoryStore):
+    """
+    In-process job store. Jobs are plain dicts keyed by job id; each carries the
+    instance_id of the job queue that owns it, and every queue instance reports
+    a heartbeat so jobs of an instance that stopped can be told apart.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self.heartbeats: Dict[str, float] = {}
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self.data[key] = value
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            job = self.data.get(key)
+            return dict(job) if job is not None else None
+
+    def delete(self, key: str):
+        with self._lock:
+            self.data.pop(key, None)
+
+    def update(self, job_id: str, **fields) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self.data.get(job_id)
+            if job is None:
+                return None
+            job.update(fields)
+            return dict(job)
+
+    def prune(self, older_than: float):
+        """Drop finished jobs whose finished_at is before the given timestamp."""
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self.data.items()
+                if job.get("finished_at") and job["finished_at"] < older_than
+            ]
+            for job_id in expired:
+                del self.data[job_id]
+
+    def heartbeat(self, instance_id: str):
+        with self._lock:
+            self.heartbeats[instance_id] = time.time()
+
+    def fail_orphaned(self, error: str, max_age: float) -> int:
+        """
+        Mark queued/running jobs as failed when the instance that owns them sent no
+        heartbeat in the last max_age seconds. Returns how many jobs were failed.
+        """
+        cutoff = time.time() - max_age
+        failed = 0
+        with self._lock:
+            live = {instance for instance, at in self.heartbeats.items() if at >= cutoff}
+            for job in self.data.values():
+                if job.get("status") in ACTIVE_STATUSES and job.get("instance_id") not in live:
+                    job.update(status="failed", error=error, finished_at=time.time())
+                    failed += 1
+        return failed
+
+class SQLiteJobStore(JobStore):
+    """Job store persisted in SQLite so any uvicorn worker can answer status polls."""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                finished_at REAL,
+                data TEXT NOT NULL
+            )"""
+        )
+        self._connection().execute(
+            """CREATE TABLE IF NOT EXISTS job_instances (
+                id TEXT PRIMARY KEY,
+                heartbeat_at REAL NOT NULL
+            )"""
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def set(self, key: str, value: Any):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO jobs (id, status, finished_at, data) VALUES (?, ?, ?, ?)",
+            (key, value.get("status"), value.get("finished_at"), json.dumps(value))
+        )
+
+    def get(self, key: str) -> Any:
+        row = self._connection().execute("SELECT data FROM jobs WHERE id = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete(self, key: str):
+        self._connection().execute("DELETE FROM jobs WHERE id = ?", (key,))
+
+    def update(self, job_id: str, **fields) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self.get(job_id)
+            if job is None:
+                return None
+            job.update(fields)
+            self.set(job_id, job)
+            return job
+
+    def prune(self, older_than: float):
+        self._connection().execute(
+            "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+            (older_than,)
+        )
+
+    def heartbeat(self, instance_id: str):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO job_instances (id, heartbeat_at) VALUES (?, ?)",
+            (instance_id, time.time())
+        )
+
+    def fail_orphaned(self, error: str, max_age: float) -> int:
+        conn = self._connection()
+        cutoff = time.time() - max_age
+        failed = 0
+        with self._lock:
+            conn.execute("DELETE FROM job_instances WHERE heartbeat_at < ?", (cutoff,))
+            # Other uvicorn workers (and hosts) share this file; only jobs of instances that went quiet are orphaned
+            live = {row[0] for row in conn.execute("SELECT id FROM job_instances")}
+            rows = conn.execute("SELECT data FROM jobs WHERE status IN (?, ?)", ACTIVE_STATUSES).fetchall()
+            for (data,) in rows:
+                job = json.loads(data)
+                if job.get("instance_id") in live:
+                    continue
+                job.update(status="failed", error=error, finished_at=time.time())
+                self.set(job["id"], job)
+                failed += 1
+        return failed
+
+def create_job_store() -> JobStore:
+    if settings.JOB_STORE_BACKEND == "sqlite":
+        return SQLiteJobStore(settings.JOB_STORE_PATH)
+    return JobStore()
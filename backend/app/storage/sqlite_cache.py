@@ -0,0 +1,180 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+FRESH = "fresh"
+STALE = "stale"
+
+class SQLiteCache:
+    """
+    Persistent key/value cache backed by a SQLite file.
+
+    Entries are fresh for ttl_seconds and may then be served as stale for a
+    further stale_seconds while the caller revalidates them. The file runs in
+    WAL mode so several uvicorn workers can share it, and the least recently
+    used entries are evicted once a namespace grows past max_entries.
+    """
+
+    def __init__(self, path: str, namespace: str, ttl_seconds: float, stale_seconds: float, max_entries: int):
+        self.path = path
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._writes_since_evict = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._init_schema()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._connection()
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                fresh_until REAL NOT NULL,
+                stale_until REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )"""
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_cache_entries_lru ON cache_entries (namespace, accessed_at)"
+        )
+
+    def get(self, key: str) -> Tuple[Any, Optional[str]]:
+        """Return (value, FRESH | STALE) or (None, None) when missing or past its stale window."""
+        now = time.time()
+        try:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, fresh_until, stale_until FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+
+            if row is None or row[2] <= now:
+                self.misses += 1
+                return None, None
+
+            conn.execute(
+                "UPDATE cache_entries SET accessed_at = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key)
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Cache read failed ({self.namespace}): {e}")
+            self.misses += 1
+            return None, None
+
+        if row[1] > now:
+            self.hits += 1
+            return json.loads(row[0]), FRESH
+
+        self.stale_hits += 1
+        return json.loads(row[0]), STALE
+
+    def get_any(self, key: str) -> Any:
+        """Return a stored value regardless of age; used as a fallback when the upstream fails."""
+        try:
+            row = self._connection().execute(
+                "SELECT value FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"Cache read failed ({self.namespace}): {e}")
+            return None
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any):
+        now = time.time()
+        try:
+            self._connection().execute(
+                """INSERT OR REPLACE INTO cache_entries
+                   (namespace, key, value, fresh_until, stale_until, accessed_at)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (
+                    self.namespace,
+                    key,
+                    json.dumps(value),
+                    now + self.ttl_seconds,
+                    now + self.ttl_seconds + self.stale_seconds,
+                    now
+                )
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Cache write failed ({self.namespace}): {e}")
+            return
+
+        self._writes_since_evict += 1
+        if self._writes_since_evict >= 100:
+            self._writes_since_evict = 0
+            self.evict()
+
+    def delete(self, key: str):
+        try:
+            self._connection().execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key = ?",
+                (self.namespace, key)
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Cache delete failed ({self.namespace}): {e}")
+
+    def evict(self):
+        """Drop entries past their stale window, then trim to max_entries by LRU."""
+        try:
+            conn = self._connection()
+            conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND stale_until <= ?",
+                (self.namespace, time.time())
+            )
+            conn.execute(
+                """DELETE FROM cache_entries WHERE namespace = ? AND key IN (
+                       SELECT key FROM cache_entries WHERE namespace = ?
+                       ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                   )""",
+                (self.namespace, self.namespace, self.max_entries)
+            )
+        except sqlite3.Error as e:
+            logger.error(f"Cache eviction failed ({self.namespace}): {e}")
+
+    def size(self) -> int:
+        try:
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?",
+                (self.namespace,)
+            ).fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.namespace,
+            "path": self.path,
+            "size": self.size(),
+            "max_size": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "stale_seconds": self.stale_seconds,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses
+        }
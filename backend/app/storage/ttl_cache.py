@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from app.core.config import settings
+from app.storage.memory_store import MemoryStore
+
+class TTLCache(MemoryStore):
+    """MemoryStore with per-entry expiry, LRU eviction past max_size and hit/miss counters."""
+
+    def __init__(self, name: str, ttl_seconds: float, max_size: int):
+        super().__init__()
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.data: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self.data[key] = (time.monotonic() + ttl, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.max_size:
+                self.data.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self.data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self.data[key]
+                self.misses += 1
+                return None
+
+            self.data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def delete(self, key: str):
+        with self._lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self.data),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+submission_cache = TTLCache(
+    "submissions",
+    ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS,
+    max_size=settings.RESULT_CACHE_MAX_SUBMISSIONS
+)
+block_cache = TTLCache(
+    "blocks",
+    ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS,
+    max_size=settings.RESULT_CACHE_MAX_BLOCKS
+)
+# Per-block results of past checks, keyed by check id, for incremental re-checks
+check_history = TTLCache(
+    "checks",
+    ttl_seconds=settings.CHECK_HISTORY_TTL_SECONDS,
+    max_size=settings.CHECK_HISTORY_MAX_SIZE
+)
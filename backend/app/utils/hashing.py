@@ -0,0 +1,33 @@
+import hashlib
+import io
+import tokenize
+from typing import List
+
+_SKIPPED_TOKENS = {tokenize.COMMENT, tokenize.NL, tokenize.ENCODING, tokenize.ENDMARKER}
+
+def normalize_code(code: str) -> str:
+    """Drop comments, blank lines and layout-only whitespace so cosmetic edits hash the same."""
+    try:
+        parts = []
+        for token in tokenize.generate_tokens(io.StringIO(code).readline):
+            if token.type in _SKIPPED_TOKENS:
+                continue
+            if token.type == tokenize.NEWLINE:
+                parts.append("\n")
+            elif token.type == tokenize.INDENT:
+                parts.append("<INDENT>")
+            elif token.type == tokenize.DEDENT:
+                parts.append("<DEDENT>")
+            else:
+                parts.append(token.string)
+        return " ".join(parts)
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        lines = [line.rstrip() for line in code.strip().splitlines()]
+        return "\n".join(line for line in lines if line.strip())
+
+def code_hash(code: str) -> str:
+    return hashlib.sha256(normalize_code(code).encode("utf-8")).hexdigest()
+
+def token_hash(tokens: List[str]) -> str:
+    """Hash of a normalized token stream: identical for blocks that differ only in names, literals and layout."""
+    return hashlib.sha256(" ".join(tokens).encode("utf-8")).hexdigest()
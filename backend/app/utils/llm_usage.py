@@ -0,0 +1,57 @@
+import threading
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+class LLMUsage:
+    """Token counts and summed call latency of the LLM calls made for one check."""
+
+    def __init__(self):
+        self.calls = 0
+        self.cache_hits = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.llm_ms = 0.0
+        self._lock = threading.Lock()
+
+    def record_cache_hit(self):
+        with self._lock:
+            self.cache_hits += 1
+
+    def record(self, prompt_tokens: int, completion_tokens: int, elapsed_ms: float, calls: int = 1):
+        with self._lock:
+            self.calls += calls
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.llm_ms += elapsed_ms
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "cache_hits": self.cache_hits,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "total_tokens": self.prompt_tokens + self.completion_tokens,
+                "llm_ms": round(self.llm_ms, 1)
+            }
+
+# Tasks started during a check (and asyncio.to_thread calls) run in a copy of its context and add to the
+# same LLMUsage. Plain worker threads do not inherit it: submit their work through copy_context().run,
+# as LLMService.batch_json does.
+_current_usage: ContextVar[Optional[LLMUsage]] = ContextVar("llm_usage", default=None)
+
+def start_usage() -> LLMUsage:
+    """Begin counting LLM usage for the current check (request, job or stream)."""
+    usage = LLMUsage()
+    _current_usage.set(usage)
+    return usage
+
+def record_usage(prompt_tokens: int, completion_tokens: int, elapsed_ms: float, calls: int = 1):
+    usage = _current_usage.get()
+    if usage is not None:
+        usage.record(prompt_tokens, completion_tokens, elapsed_ms, calls)
+
+def record_cache_hit():
+    usage = _current_usage.get()
+    if usage is not None:
+        usage.record_cache_hit()
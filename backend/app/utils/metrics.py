@@ -0,0 +1,122 @@
+import time
+from contextlib import contextmanager
+from typing import Iterator
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+
+# Seconds; spans a cache hit (milliseconds) up to a slow LLM batch (a minute)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# The service's own metrics, kept apart from prometheus_client's process-wide default registry
+registry = CollectorRegistry()
+
+class CallObservation:
+    """Outcome of an instrumented call; set result before leaving the block, errors are recorded automatically."""
+
+    def __init__(self, result: str):
+        self.result = result
+
+@contextmanager
+def observe_call(duration: Histogram, results: Counter, in_flight: Gauge, result: str = "ok") -> Iterator[CallObservation]:
+    """Time a call, count it by result ("error" when it raises) and track it as in flight."""
+    observation = CallObservation(result)
+    started = time.perf_counter()
+    with in_flight.track_inprogress():
+        try:
+            yield observation
+        except BaseException:
+            observation.result = "error"
+            raise
+        finally:
+            duration.observe(time.perf_counter() - started)
+            results.labels(result=observation.result).inc()
+
+STAGE_SECONDS = Histogram(
+    "plagiarism_stage_duration_seconds",
+    "Time of one run of a pipeline stage; streamed checks run search and scoring once per block.",
+    ["stage"],
+    buckets=DEFAULT_BUCKETS,
+    registry=registry
+)
+STAGE_ERRORS = Counter(
+    "plagiarism_stage_errors_total",
+    "Pipeline stages that ended the check with an error.",
+    ["stage"],
+    registry=registry
+)
+CHECK_SECONDS = Histogram(
+    "plagiarism_check_duration_seconds",
+    "End-to-end time of a check, by result (ok, error, cached, coalesced).",
+    ["result"],
+    buckets=DEFAULT_BUCKETS,
+    registry=registry
+)
+CHECKS = Counter(
+    "plagiarism_checks_total",
+    "Checks run, by result (ok, error, cached, coalesced).",
+    ["result"],
+    registry=registry
+)
+CHECKS_IN_FLIGHT = Gauge(
+    "plagiarism_checks_in_flight",
+    "Checks currently running.",
+    registry=registry
+)
+BLOCK_SECONDS = Histogram(
+    "plagiarism_stage_block_duration_seconds",
+    "Time a pipeline stage spends per block it is given (stage time / blocks), once per stage run.",
+    ["stage"],
+    buckets=DEFAULT_BUCKETS,
+    registry=registry
+)
+GITHUB_SEARCH_SECONDS = Histogram(
+    "plagiarism_github_search_duration_seconds",
+    "Time of one search_code call, including cache lookup and content fetches.",
+    buckets=DEFAULT_BUCKETS,
+    registry=registry
+)
+GITHUB_SEARCHES = Counter(
+    "plagiarism_github_searches_total",
+    "search_code calls by result (matches, empty, invalid_query, error).",
+    ["result"],
+    registry=registry
+)
+GITHUB_SEARCHES_IN_FLIGHT = Gauge(
+    "plagiarism_github_searches_in_flight",
+    "search_code calls currently running.",
+    registry=registry
+)
+GITHUB_CACHE_LOOKUPS = Counter(
+    "plagiarism_github_cache_lookups_total",
+    "GitHub search cache lookups by state (fresh, stale, miss).",
+    ["state"],
+    registry=registry
+)
+LLM_CALL_SECONDS = Histogram(
+    "plagiarism_llm_call_duration_seconds",
+    "Time of one invoke_json call that reached the model, including retries.",
+    buckets=DEFAULT_BUCKETS,
+    registry=registry
+)
+LLM_CALLS = Counter(
+    "plagiarism_llm_calls_total",
+    "invoke_json calls by result (ok, cache_hit, error).",
+    ["result"],
+    registry=registry
+)
+LLM_CALLS_IN_FLIGHT = Gauge(
+    "plagiarism_llm_calls_in_flight",
+    "invoke_json calls currently waiting on the model.",
+    registry=registry
+)
+LLM_TOKENS = Counter(
+    "plagiarism_llm_tokens_total",
+    "Tokens sent to and received from the model.",
+    ["kind"],
+    registry=registry
+)
+SINGLEFLIGHT_CALLS = Counter(
+    "plagiarism_singleflight_calls_total",
+    "Coalescable calls by scope (check, github_search, llm) and role: a leader runs the call, a follower waits on it.",
+    ["scope", "role"],
+    registry=registry
+)
@@ -0,0 +1,108 @@
+import asyncio
+import copy
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Generic, Hashable, Tuple, TypeVar
+from app.core.config import settings
+from app.utils.metrics import SINGLEFLIGHT_CALLS
+
+T = TypeVar("T")
+
+class _LeaderAborted(Exception):
+    """The call being waited on was cancelled or interrupted; the waiter tries again itself."""
+
+def _retrieve(future: "asyncio.Future"):
+    """Mark the outcome as seen, for waiters whose follower was cancelled before it could read it."""
+    if not future.cancelled():
+        future.exception()
+
+class _Call:
+    def __init__(self):
+        self.future: Future = Future()
+        self.followers = 0
+
+class SingleFlight(Generic[T]):
+    """
+    Coalesces concurrent calls that share a key: the first caller (the leader)
+    runs the function, callers arriving while it is in flight wait for it and
+    get its result, or its exception. Nothing is kept once the call finishes;
+    caching is left to the caller.
+
+    do() and ado() share one table, so a request on the event loop and a job
+    in a worker thread wait on the same call. Followers get a deep copy, so a
+    shared result can be changed by whoever receives it. A sync follower must
+    not run on the thread of the event loop its async leader runs on.
+    """
+
+    def __init__(self, scope: str):
+        self.scope = scope
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key: Hashable) -> Tuple[_Call, bool]:
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                SINGLEFLIGHT_CALLS.labels(scope=self.scope, role="follower").inc()
+                return call, False
+            call = self._calls[key] = _Call()
+            SINGLEFLIGHT_CALLS.labels(scope=self.scope, role="leader").inc()
+            return call, True
+
+    def _settle(self, key: Hashable, call: _Call, result: Any = None, error: BaseException = None):
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+            followers = call.followers
+        if not followers:
+            return
+        if error is not None:
+            call.future.set_exception(error if isinstance(error, Exception) else _LeaderAborted())
+        else:
+            # A snapshot the leader cannot change afterwards; each follower copies it again
+            call.future.set_result(copy.deepcopy(result))
+
+    def do(self, key: Hashable, func: Callable[[], T]) -> Tuple[T, bool]:
+        """(result, shared): shared is True when the result came from another caller's call."""
+        if not settings.SINGLEFLIGHT_ENABLED:
+            return func(), False
+
+        while True:
+            call, leader = self._join(key)
+            if leader:
+                try:
+                    result = func()
+                except BaseException as e:
+                    self._settle(key, call, error=e)
+                    raise
+                self._settle(key, call, result)
+                return result, False
+
+            try:
+                return copy.deepcopy(call.future.result()), True
+            except _LeaderAborted:
+                continue
+
+    async def ado(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        if not settings.SINGLEFLIGHT_ENABLED:
+            return await func(), False
+
+        while True:
+            call, leader = self._join(key)
+            if leader:
+                try:
+                    result = await func()
+                except BaseException as e:
+                    self._settle(key, call, error=e)
+                    raise
+                self._settle(key, call, result)
+                return result, False
+
+            waiter = asyncio.wrap_future(call.future)
+            waiter.add_done_callback(_retrieve)
+            try:
+                # Shielded: a cancelled follower must not cancel the shared future
+                return copy.deepcopy(await asyncio.shield(waiter)), True
+            except _LeaderAborted:
+                continue
@@ -0,0 +1,53 @@
+import threading
+from typing import Optional
+from app.core.config import settings
+from app.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Rough size of an English/code token when no tokenizer is available
+CHARS_PER_TOKEN = 4
+
+_encoding = None
+_encoding_loaded = False
+_lock = threading.Lock()
+
+def _get_encoding():
+    """The tiktoken encoding, loaded on first use; None when tiktoken or its BPE file is unavailable (e.g. offline)."""
+    global _encoding, _encoding_loaded
+    if _encoding_loaded:
+        return _encoding
+
+    with _lock:
+        if not _encoding_loaded:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding(settings.LLM_TOKENIZER_ENCODING)
+            except Exception as e:
+                logger.warning(f"tiktoken encoding '{settings.LLM_TOKENIZER_ENCODING}' unavailable ({e}); estimating tokens from length")
+                _encoding = None
+            _encoding_loaded = True
+    return _encoding
+
+def count_tokens(text: str) -> int:
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Longest prefix of text that fits in max_tokens."""
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+def tokenizer_name() -> Optional[str]:
+    return settings.LLM_TOKENIZER_ENCODING if _get_encoding() is not None else None
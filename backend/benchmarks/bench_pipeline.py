@@ -0,0 +1,409 @@
+"""
+End-to-end benchmark of the check pipeline against local GitHub and OpenAI stand-ins.
+
+Starts fake_github.py (replaying benchmarks/fixtures/github_files.json) and
+fake_openai.py in-process, points the backend at them and runs a seeded
+synthetic corpus of small, medium and large submissions through either
+Orchestrator.execute_pipeline ("orchestrator") or POST /api/v1/check
+("api"). About a third of the functions in each submission are lightly
+renamed copies of recorded GitHub files, so searches, candidate ranking and
+LLM scoring all see real work. Nothing leaves the machine.
+
+Reports p50/p95/p99 latency per submission size, throughput, and peak RSS.
+The result, cache and fingerprint layers are off unless --warm, so every check
+pays for its searches and LLM calls. With --baseline the run is compared to
+an earlier --save-baseline report and the script exits 1 if latency, memory
+or throughput regressed by more than --threshold.
+
+Usage:
+    python benchmarks/bench_pipeline.py --save-baseline benchmarks/baseline.json
+    python benchmarks/bench_pipeline.py --baseline benchmarks/baseline.json --threshold 0.2
+    python benchmarks/bench_pipeline.py --target api --concurrency 4 --llm-latency 0.2 --mode batch
+"""
+import argparse
+import ast
+import gc
+import json
+import os
+import platform
+import random
+import re
+import resource
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+import fake_github
+import fake_openai
+
+DEFAULT_FIXTURES = os.path.join(BENCH_DIR, "fixtures", "github_files.json")
+
+# Functions per submission
+SIZES = {"small": 3, "medium": 10, "large": 30}
+
+# Renames applied to copied functions, as a student hiding a copy would
+RENAMES = {
+    "items": "elements", "values": "numbers", "arr": "data", "left": "lo", "right": "hi",
+    "result": "output", "node": "vertex", "graph": "adjacency", "text": "sentence", "dist": "distances"
+}
+
+TEMPLATES = [
+    '''def {name}({a}, {b}):
+    {acc} = {k}
+    for {i} in range(len({a})):
+        if {a}[{i}] {op} {b}:
+            {acc} += {a}[{i}] * {k2}
+    return {acc}
+''',
+    '''def {name}({a}):
+    {acc} = {{}}
+    for {i} in {a}:
+        {acc}[{i}] = {acc}.get({i}, 0) + {k}
+    return [key for key, count in {acc}.items() if count {op} {k2}]
+''',
+    '''def {name}({a}, {b}={k}):
+    if not {a}:
+        return []
+    {acc} = [{a}[0]]
+    for {i} in {a}[1:]:
+        if abs({i} - {acc}[-1]) {op} {b}:
+            {acc}.append({i} * {k2})
+    return {acc}
+''',
+    '''class {cls}:
+    def __init__(self, {a}):
+        self.{a} = list({a})
+        self.{acc} = {k}
+
+    def {name}(self, {b}):
+        for {i} in self.{a}:
+            if {i} {op} {b}:
+                self.{acc} += {k2}
+        return self.{acc}
+''',
+]
+
+WORDS = ["total", "score", "bucket", "window", "count", "weight", "offset", "level", "limit", "chunk", "ratio", "span"]
+
+
+def recorded_functions(fixtures: List[dict]) -> List[str]:
+    """Top-level functions and classes of the recorded GitHub files."""
+    functions = []
+    for fixture in fixtures:
+        tree = ast.parse(fixture["content"])
+        for node in tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+                functions.append(ast.get_source_segment(fixture["content"], node))
+    return functions
+
+
+def copied(source: str) -> str:
+    for old, new in RENAMES.items():
+        source = re.sub(rf"\b{old}\b", new, source)
+    return source
+
+
+def original(rng: random.Random, serial: int) -> str:
+    first, second = rng.sample(WORDS, 2)
+    return rng.choice(TEMPLATES).format(
+        name=f"{first}_{second}_{serial}",
+        cls=f"{first.title()}{second.title()}{serial}",
+        a=rng.choice(["rows", "samples", "readings", "entries"]),
+        b=rng.choice(["bound", "cutoff", "pivot_value", "margin"]),
+        acc=rng.choice(["acc", "collected", "running", "tally"]),
+        i=rng.choice(["x", "item", "value", "entry"]),
+        op=rng.choice(["<", ">", ">=", "<="]),
+        k=rng.randint(0, 9),
+        k2=rng.randint(2, 7)
+    )
+
+
+def build_corpus(fixtures: List[dict], per_size: int, seed: int, copy_ratio: float) -> List[Tuple[str, str]]:
+    """(size, code) submissions, interleaved so every size sees the same server conditions."""
+    rng = random.Random(seed)
+    recorded = recorded_functions(fixtures)
+    corpus = []
+    serial = 0
+    for _ in range(per_size):
+        for size, functions in SIZES.items():
+            parts = []
+            for _ in range(functions):
+                serial += 1
+                parts.append(copied(rng.choice(recorded)) if rng.random() < copy_ratio else original(rng, serial))
+            corpus.append((size, "\n\n".join(parts) + "\n"))
+    return corpus
+
+
+def configure_env(args, github_url: str, openai_url: str):
+    """Must run before anything under app is imported; settings are read once."""
+    env = {
+        "OPENAI_API_KEY": "benchmark",
+        "OPENAI_API_BASE_URL": openai_url,
+        "GITHUB_TOKEN": "benchmark",
+        "GITHUB_TOKENS": "",
+        "GITHUB_API_URL": github_url,
+        "PROXY": "",
+        "LOG_LEVEL": "WARNING",
+        "WARMUP_ON_STARTUP": "false",
+        "SIMILARITY_MODE": args.mode,
+        "LLM_STRUCTURED_OUTPUT": "true" if args.structured else "false",
+    }
+    if not args.warm:
+        env.update({
+            "RESULT_CACHE_ENABLED": "false",
+            "GITHUB_CACHE_ENABLED": "false",
+            "LLM_CACHE_ENABLED": "false",
+            "FINGERPRINT_ENABLED": "false",
+        })
+    os.environ.update(env)
+
+
+def orchestrator_runner() -> Tuple[Callable[[str], bool], Callable[[], None]]:
+    from app.api.deps import get_orchestrator
+
+    orchestrator = get_orchestrator()
+
+    def run(code: str) -> bool:
+        return bool(orchestrator.execute_pipeline(code).get("success"))
+
+    return run, lambda: None
+
+
+def api_runner() -> Tuple[Callable[[str], bool], Callable[[], None]]:
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    client = TestClient(app)
+    client.__enter__()
+
+    def run(code: str) -> bool:
+        response = client.post("/api/v1/check", json={"code": code})
+        return response.status_code == 200 and bool(response.json().get("success"))
+
+    return run, lambda: client.__exit__(None, None, None)
+
+
+def percentile(samples: List[float], percent: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+
+def summarize(latencies: List[float], errors: int) -> Dict[str, Any]:
+    return {
+        "checks": len(latencies),
+        "errors": errors,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def current_rss_mb() -> Optional[float]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return None
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return peak / 2 ** 20 if platform.system() == "Darwin" else peak / 2 ** 10
+
+
+def run_benchmark(args, run: Callable[[str], bool], corpus: List[Tuple[str, str]]) -> Dict[str, Any]:
+    by_size: Dict[str, List[float]] = {size: [] for size in SIZES}
+    errors: Dict[str, int] = {size: 0 for size in SIZES}
+
+    def timed(item: Tuple[str, str]) -> Tuple[str, float, bool]:
+        size, code = item
+        started = time.perf_counter()
+        try:
+            ok = run(code)
+        except Exception as e:
+            print(f"  check failed: {e}", file=sys.stderr)
+            ok = False
+        return size, time.perf_counter() - started, ok
+
+    gc.collect()
+    rss_before = current_rss_mb()
+    if args.tracemalloc:
+        tracemalloc.start()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        for size, elapsed, ok in executor.map(timed, corpus):
+            by_size[size].append(elapsed)
+            if not ok:
+                errors[size] += 1
+    wall = time.perf_counter() - started
+
+    memory: Dict[str, Any] = {"rss_peak_mb": round(peak_rss_mb(), 1)}
+    rss_after = current_rss_mb()
+    if rss_before is not None and rss_after is not None:
+        memory["rss_growth_mb"] = round(rss_after - rss_before, 1)
+    if args.tracemalloc:
+        memory["python_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+        tracemalloc.stop()
+
+    latencies = {size: summarize(samples, errors[size]) for size, samples in by_size.items() if samples}
+    latencies["all"] = summarize([s for samples in by_size.values() for s in samples], sum(errors.values()))
+    return {
+        "latency": latencies,
+        "throughput_per_s": round(len(corpus) / wall, 3),
+        "wall_seconds": round(wall, 2),
+        "memory": memory,
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float, min_delta_ms: float) -> List[str]:
+    """Metrics that got worse than the baseline by more than the threshold (relative)."""
+    regressions = []
+
+    def check(name: str, current: float, previous: float, higher_is_worse: bool = True, floor: float = 0.0):
+        if not previous:
+            return
+        change = (current - previous) / previous
+        worse = change > threshold if higher_is_worse else change < -threshold
+        if worse and abs(current - previous) >= floor:
+            regressions.append(f"{name}: {previous} -> {current} ({change:+.0%})")
+
+    for size, current in report["latency"].items():
+        previous = baseline.get("latency", {}).get(size)
+        if not previous:
+            continue
+        for key in ("p50_ms", "p95_ms", "p99_ms"):
+            check(f"{size} {key}", current[key], previous[key], floor=min_delta_ms)
+
+    check("throughput_per_s", report["throughput_per_s"], baseline.get("throughput_per_s", 0), higher_is_worse=False)
+    check("rss_peak_mb", report["memory"]["rss_peak_mb"], baseline.get("memory", {}).get("rss_peak_mb", 0))
+    return regressions
+
+
+def print_report(report: Dict[str, Any]):
+    config = report["config"]
+    print(f"target={config['target']} mode={config['mode']} concurrency={config['concurrency']} "
+          f"checks={report['latency']['all']['checks']} warm={config['warm']}")
+    print(f"{'size':<8} {'checks':>6} {'errors':>6} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for size, row in report["latency"].items():
+        print(f"{size:<8} {row['checks']:>6} {row['errors']:>6} {row['mean_ms']:>7.1f}ms {row['p50_ms']:>7.1f}ms "
+              f"{row['p95_ms']:>7.1f}ms {row['p99_ms']:>7.1f}ms")
+    print(f"throughput {report['throughput_per_s']:.2f} checks/s over {report['wall_seconds']:.1f}s")
+    print("memory " + " ".join(f"{key}={value}" for key, value in report["memory"].items()))
+    print(f"github searches={report['servers']['github']['searches']} rejected={report['servers']['github']['rejected']}  "
+          f"llm requests={report['servers']['openai']['requests']} replayed={report['servers']['openai']['replayed']} "
+          f"rejected={report['servers']['openai']['rejected']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--target", choices=["orchestrator", "api"], default="orchestrator")
+    parser.add_argument("--per-size", type=int, default=5, help="submissions per size (small, medium, large)")
+    parser.add_argument("--warmup", type=int, default=1, help="unrecorded checks run first")
+    parser.add_argument("--concurrency", type=int, default=1, help="checks in flight at once")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--copy-ratio", type=float, default=0.35, help="share of functions copied from the fixtures")
+    parser.add_argument("--mode", choices=["serial", "concurrent", "batch"], default="serial", help="SIMILARITY_MODE")
+    parser.add_argument("--plain-json", dest="structured", action="store_false", help="disable LLM structured output")
+    parser.add_argument("--warm", action="store_true", help="leave the result, search, LLM and fingerprint caches on")
+    parser.add_argument("--github-fixtures", default=DEFAULT_FIXTURES)
+    parser.add_argument("--github-latency", type=float, default=0.02, help="seconds per GitHub response")
+    parser.add_argument("--search-limit", type=int, default=1000, help="GitHub searches per token per window")
+    parser.add_argument("--llm-fixtures", help="replay recorded LLM replies from this JSON")
+    parser.add_argument("--llm-record", help="write the LLM replies served to this JSON")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per LLM response")
+    parser.add_argument("--llm-rate-limit", type=int, default=0, help="LLM requests per window, 0 for unlimited")
+    parser.add_argument("--window", type=float, default=60.0, help="rate-limit window in seconds for both servers")
+    parser.add_argument("--tracemalloc", action="store_true", help="also report the Python heap peak (slows the run)")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--save-baseline", help="write the report to this file as the new baseline")
+    parser.add_argument("--baseline", help="compare against this report and exit 1 on a regression")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0, help="ignore latency changes smaller than this")
+    args = parser.parse_args()
+
+    github = fake_github.start_server(
+        0,
+        search_limit=args.search_limit,
+        window=args.window,
+        latency=args.github_latency,
+        fixtures=fake_github.load_fixtures(args.github_fixtures)
+    )
+    openai = fake_openai.start_server(
+        0,
+        latency=args.llm_latency,
+        rate_limit=args.llm_rate_limit,
+        window=args.window,
+        fixtures=fake_openai.load_fixtures(args.llm_fixtures) if args.llm_fixtures else None
+    )
+    configure_env(args, github.base_url, openai.base_url)
+
+    fixtures = fake_github.load_fixtures(args.github_fixtures)
+    corpus = build_corpus(fixtures, args.per_size, args.seed, args.copy_ratio)
+    warmup = build_corpus(fixtures, 1, args.seed + 1, args.copy_ratio)[:args.warmup]
+
+    run, close = orchestrator_runner() if args.target == "orchestrator" else api_runner()
+    try:
+        for _, code in warmup:
+            run(code)
+        report = run_benchmark(args, run, corpus)
+    finally:
+        close()
+        github.shutdown()
+        openai.shutdown()
+
+    report["config"] = {
+        "target": args.target,
+        "mode": args.mode,
+        "concurrency": args.concurrency,
+        "per_size": args.per_size,
+        "seed": args.seed,
+        "warm": args.warm,
+        "github_latency": args.github_latency,
+        "llm_latency": args.llm_latency,
+    }
+    report["servers"] = {
+        "github": {"searches": github.searches, "rejected": github.rejected},
+        "openai": openai.stats(),
+    }
+    print_report(report)
+
+    if args.llm_record:
+        openai.save(args.llm_record)
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+
+    failed = report["latency"]["all"]["errors"] > 0
+    if failed:
+        print(f"FAIL: {report['latency']['all']['errors']} check(s) failed")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config", {}).get("target") != args.target:
+            print("warning: baseline was recorded against a different target")
+        regressions = compare(report, baseline, args.threshold, args.min_delta_ms)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            failed = True
+        else:
+            print(f"no regression beyond {args.threshold:.0%} of {args.baseline}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
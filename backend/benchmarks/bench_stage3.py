@@ -0,0 +1,122 @@
+"""
+Benchmark stage 3 (SimilarityFinderAgent) in serial, batch and concurrent modes.
+
+The OpenAI model is replaced by a local chat model that sleeps for a fixed
+latency per call, so the numbers reflect how many round trips each mode
+pays rather than real model speed.
+
+Usage:
+    python benchmarks/bench_stage3.py --blocks 40 --latency 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+from typing import Any, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+for key, value in {
+    "OPENAI_API_KEY": "benchmark",
+    "GITHUB_TOKEN": "benchmark",
+    "OPENAI_API_BASE_URL": "http://localhost",
+    "PROXY": "",
+    "LOG_LEVEL": "WARNING",
+    # Every pair must reach the LLM and pay for its call; the fake model only answers in plain JSON
+    "STRUCTURAL_ENGINE_ENABLED": "false",
+    "LLM_CACHE_ENABLED": "false",
+    "LLM_STRUCTURED_OUTPUT": "false",
+}.items():
+    os.environ.setdefault(key, value)
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from app.core.config import settings
+from app.services.llm_service import llm_service
+from app.agents.specialized.agent_3_similarity_finder import SimilarityFinderAgent
+
+
+class LatencyChatModel(BaseChatModel):
+    latency: float = 0.5
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "latency-fake"
+
+    def _reply(self, messages: List[BaseMessage]) -> ChatResult:
+        prompt = messages[-1].content
+        pair_count = len(re.findall(r"^### Pair \d+", prompt, flags=re.MULTILINE))
+        if pair_count:
+            content = json.dumps({"results": [
+                {"index": i, "similarity_percent": 42, "is_suspicious": False, "reason": "benchmark"}
+                for i in range(pair_count)
+            ]})
+        else:
+            content = json.dumps({"similarity_percent": 42, "is_suspicious": False, "reason": "benchmark"})
+        self.calls += 1
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        return self._reply(messages)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._reply(messages)
+
+
+def make_input(block_count: int) -> dict:
+    blocks = []
+    search_results = []
+    for i in range(block_count):
+        code = f"def func_{i}(items):\n    total = 0\n    for item in items:\n        total += item * {i}\n    return total\n"
+        blocks.append({"type": "function", "name": f"func_{i}", "code": code, "lines": (1, 5)})
+        search_results.append({
+            "block_name": f"func_{i}",
+            "block_type": "function",
+            "found_matches": [{"repo": "bench/repo", "url": "https://github.com/bench/repo", "path": "a.py", "content": code}]
+        })
+    return {"blocks": blocks, "search_results": search_results}
+
+
+def run(mode: str, input_data: dict, use_async: bool) -> tuple:
+    settings.SIMILARITY_MODE = mode
+    llm_service.llm.calls = 0
+    agent = SimilarityFinderAgent()
+    started = time.perf_counter()
+    if use_async:
+        result = asyncio.run(agent.ainvoke(input_data))
+    else:
+        result = agent.invoke(input_data)
+    elapsed = time.perf_counter() - started
+    assert result["success"], result.get("error")
+    assert len(result["comparisons"]) == len(input_data["blocks"])
+    return elapsed, llm_service.llm.calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--blocks", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per fake LLM call")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="benchmark ainvoke instead of invoke")
+    args = parser.parse_args()
+
+    llm_service.llm = LatencyChatModel(latency=args.latency)
+    input_data = make_input(args.blocks)
+
+    print(f"blocks={args.blocks} latency={args.latency}s concurrency={settings.LLM_CONCURRENCY} batch_size={settings.LLM_BATCH_SIZE}")
+    baseline = None
+    for mode in ("serial", "batch", "concurrent"):
+        elapsed, calls = run(mode, input_data, args.use_async)
+        baseline = baseline or elapsed
+        print(f"{mode:<11} {elapsed:8.2f}s  {calls:4d} LLM calls  {baseline / elapsed:5.1f}x vs serial")
+
+
+if __name__ == "__main__":
+    main()
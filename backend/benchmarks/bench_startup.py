@@ -0,0 +1,113 @@
+"""
+Benchmark worker cold start: importing app.main and bringing up uvicorn.
+
+Each measurement runs in a fresh interpreter, so module caches do not carry
+over. "lazy" is what a worker pays before it can accept requests; "eager" also
+builds the orchestrator and services up front (what every worker used to do
+on import), for comparison. The uvicorn runs time from spawn until every
+worker has logged "Application startup complete".
+
+Usage:
+    python benchmarks/bench_startup.py --runs 5 --workers 4
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SCRIPT = """
+import time
+started = time.perf_counter()
+import app.main
+if {eager}:
+    from app.api.deps import warm_up
+    warm_up()
+print(time.perf_counter() - started)
+"""
+
+
+def child_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    for key, value in {
+        "OPENAI_API_KEY": "benchmark",
+        "GITHUB_TOKEN": "benchmark",
+        "PROXY": "",
+        "LOG_LEVEL": "WARNING",
+    }.items():
+        env.setdefault(key, value)
+    return env
+
+
+def time_import(eager: bool) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT.format(eager=eager)],
+        cwd=BACKEND_DIR,
+        env=child_env(),
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_uvicorn(workers: int, timeout: float = 60.0) -> float:
+    """Seconds from spawning uvicorn until all its workers have finished startup."""
+    command = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(free_port()), "--log-level", "info"]
+    if workers > 1:
+        command += ["--workers", str(workers)]
+
+    env = child_env()
+    # Measure the accept-ready time, not the background warm-up that follows it
+    env["WARMUP_ON_STARTUP"] = "false"
+
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env, stderr=subprocess.PIPE, text=True)
+    ready = 0
+    try:
+        for line in process.stderr:
+            if "Application startup complete" in line:
+                ready += 1
+                if ready == workers:
+                    return time.perf_counter() - started
+            if time.perf_counter() - started > timeout:
+                break
+        raise RuntimeError(f"uvicorn did not start {workers} worker(s) within {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def summarize(label: str, samples: List[float]):
+    print(f"{label:<24} median {statistics.median(samples):6.2f}s  min {min(samples):6.2f}s  max {max(samples):6.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4, help="worker count for the multi-worker spawn")
+    args = parser.parse_args()
+
+    lazy = [time_import(eager=False) for _ in range(args.runs)]
+    eager = [time_import(eager=True) for _ in range(args.runs)]
+    summarize("import (lazy)", lazy)
+    summarize("import (eager)", eager)
+    print(f"{'':<24} {statistics.median(eager) / statistics.median(lazy):.1f}x faster import")
+
+    summarize("uvicorn, 1 worker", [time_uvicorn(1) for _ in range(args.runs)])
+    summarize(f"uvicorn, {args.workers} workers", [time_uvicorn(args.workers) for _ in range(args.runs)])
+
+
+if __name__ == "__main__":
+    main()
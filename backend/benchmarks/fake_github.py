@@ -0,0 +1,315 @@
+"""
+Local stand-in for the GitHub REST API that enforces and reports rate limits.
+
+Serves /search/code and /repos/{owner}/{repo}/contents/{path} with
+X-RateLimit-Limit/Remaining/Reset/Resource headers. Each token gets its own
+search and core budget per window. Over budget, requests get a 403 with
+X-RateLimit-Remaining: 0, like the real API. --secondary-every N also answers
+every Nth search with a 403 + Retry-After (a secondary limit).
+
+By default search results and file contents are synthesized from the query
+words. --fixtures replays recorded files instead (see
+benchmarks/fixtures/github_files.json): a search returns the files sharing the
+most words with the query, and contents serves the recorded source.
+
+Run the server on its own and point the backend at it:
+    python benchmarks/fake_github.py --port 8765 --search-limit 10 --window 60
+    python benchmarks/fake_github.py --port 8765 --fixtures benchmarks/fixtures/github_files.json
+    GITHUB_API_URL=http://127.0.0.1:8765 GITHUB_TOKENS=t2,t3 uvicorn app.main:app
+
+Or drive GitHubService against it and print the scheduler metrics:
+    python benchmarks/fake_github.py --drive 40 --tokens 3 --search-limit 10 --window 5
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORD = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+
+def load_fixtures(path: str) -> List[dict]:
+    """Recorded files: a {"files": [{"repo", "path", "sha", "content"}]} document."""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["files"]
+
+
+class RateLimitedGitHub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, search_limit: int, core_limit: int, window: float, latency: float, secondary_every: int,
+                 fixtures: Optional[List[dict]] = None):
+        super().__init__(address, FakeGitHubHandler)
+        self.fixtures = fixtures or []
+        self.fixture_words = [set(WORD.findall(f["content"])) for f in self.fixtures]
+        self.fixture_by_path = {f"{f['repo']}/{f['path']}": f for f in self.fixtures}
+        self.limits = {"search": search_limit, "core": core_limit}
+        self.window = window
+        self.latency = latency
+        self.secondary_every = secondary_every
+        self.buckets: Dict[Tuple[str, str], List[float]] = {}
+        self.searches = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def consume(self, token: str, resource: str) -> Tuple[bool, Dict[str, str]]:
+        """Charge one request to the token's bucket; returns (allowed, rate-limit headers)."""
+        now = time.time()
+        with self.lock:
+            start, used = self.buckets.get((token, resource), (now, 0))
+            if now - start >= self.window:
+                start, used = now, 0
+            allowed = used < self.limits[resource]
+            if allowed:
+                used += 1
+            else:
+                self.rejected += 1
+            self.buckets[(token, resource)] = [start, used]
+
+        headers = {
+            "X-RateLimit-Limit": str(self.limits[resource]),
+            "X-RateLimit-Remaining": str(self.limits[resource] - used),
+            "X-RateLimit-Reset": str(int(start + self.window) + 1),
+            "X-RateLimit-Resource": resource
+        }
+        return allowed, headers
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    server: RateLimitedGitHub
+    # Keep-alive, like the real API, so client connection reuse shows up in benchmarks
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: dict, headers: Dict[str, str]):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        token = self.headers.get("Authorization", "").split(" ")[-1] or "anonymous"
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        if url.path == "/search/code":
+            self._search(token, parse_qs(url.query))
+        elif url.path.startswith("/repos/") and "/contents/" in url.path:
+            self._contents(token, url.path)
+        else:
+            self._send(404, {"message": "Not Found"}, {})
+
+    def _search(self, token: str, params: Dict[str, List[str]]):
+        with self.server.lock:
+            self.server.searches += 1
+            secondary = self.server.secondary_every and self.server.searches % self.server.secondary_every == 0
+        if secondary:
+            self._send(403, {"message": "You have exceeded a secondary rate limit"}, {"Retry-After": "1"})
+            return
+
+        allowed, headers = self.server.consume(token, "search")
+        if not allowed:
+            self._send(403, {"message": "API rate limit exceeded"}, headers)
+            return
+
+        query = params.get("q", [""])[0]
+        per_page = int(params.get("per_page", ["3"])[0])
+        words = [w for w in query.split() if ":" not in w] or ["snippet"]
+        if self.server.fixtures:
+            items = self._fixture_items(words, per_page)
+            self._send(200, {"total_count": len(items), "incomplete_results": False, "items": items}, headers)
+            return
+
+        items = []
+        for i, word in enumerate(words[:per_page]):
+            digest = hashlib.sha1(f"{query}:{i}".encode("utf-8")).hexdigest()
+            repo = f"fake/repo{int(digest[:2], 16) % 10}"
+            path = f"{word}.py"
+            items.append({
+                "name": path,
+                "path": path,
+                "sha": digest,
+                "url": f"{self.server.base_url}/repos/{repo}/contents/{path}?ref={digest}",
+                "git_url": f"{self.server.base_url}/repos/{repo}/git/blobs/{digest}",
+                "html_url": f"https://github.com/{repo}/blob/main/{path}",
+                "repository": {"id": i, "name": repo.split("/")[1], "full_name": repo},
+                "score": 1.0
+            })
+        self._send(200, {"total_count": len(items), "incomplete_results": False, "items": items}, headers)
+
+    def _fixture_items(self, words: List[str], per_page: int) -> List[dict]:
+        """Recorded files ranked by how many of the query words they contain."""
+        terms = {w.strip('"') for w in words}
+        scored = []
+        for i, file_words in enumerate(self.server.fixture_words):
+            hits = len(terms & file_words)
+            if hits:
+                scored.append((hits, i))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+
+        items = []
+        for hits, i in scored[:per_page]:
+            fixture = self.server.fixtures[i]
+            repo, path = fixture["repo"], fixture["path"]
+            items.append({
+                "name": path.rsplit("/", 1)[-1],
+                "path": path,
+                "sha": fixture["sha"],
+                "url": f"{self.server.base_url}/repos/{repo}/contents/{path}?ref={fixture['sha']}",
+                "git_url": f"{self.server.base_url}/repos/{repo}/git/blobs/{fixture['sha']}",
+                "html_url": f"https://github.com/{repo}/blob/main/{path}",
+                "repository": {"id": i, "name": repo.split("/")[1], "full_name": repo},
+                "score": float(hits)
+            })
+        return items
+
+    def _contents(self, token: str, path: str):
+        allowed, headers = self.server.consume(token, "core")
+        if not allowed:
+            self._send(403, {"message": "API rate limit exceeded"}, headers)
+            return
+
+        if self.server.fixtures:
+            owner, repo, _, file_path = path.split("?")[0].split("/", 5)[2:]
+            fixture = self.server.fixture_by_path.get(f"{owner}/{repo}/{file_path}")
+            if fixture is None:
+                self._send(404, {"message": "Not Found"}, headers)
+                return
+            code = fixture["content"]
+            self._send(200, {
+                "type": "file",
+                "encoding": "base64",
+                "name": file_path.rsplit("/", 1)[-1],
+                "path": file_path,
+                "sha": fixture["sha"],
+                "content": base64.b64encode(code.encode("utf-8")).decode("ascii")
+            }, headers)
+            return
+
+        name = path.rsplit("/", 1)[-1].split("?")[0].removesuffix(".py")
+        code = f"def {name}(values):\n    return [v * 2 for v in values]\n"
+        self._send(200, {
+            "type": "file",
+            "encoding": "base64",
+            "name": f"{name}.py",
+            "content": base64.b64encode(code.encode("utf-8")).decode("ascii")
+        }, headers)
+
+
+def start_server(port: int = 0, search_limit: int = 30, core_limit: int = 5000, window: float = 60.0,
+                 latency: float = 0.0, secondary_every: int = 0, fixtures: Optional[List[dict]] = None) -> RateLimitedGitHub:
+    server = RateLimitedGitHub(("127.0.0.1", port), search_limit, core_limit, window, latency, secondary_every, fixtures)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def drive(server: RateLimitedGitHub, searches: int, tokens: int, use_async: bool):
+    token_list = [f"fake-token-{i}" for i in range(tokens)]
+    for key, value in {
+        "OPENAI_API_KEY": "benchmark",
+        "OPENAI_API_BASE_URL": "http://localhost",
+        "PROXY": "",
+        "LOG_LEVEL": "WARNING",
+        "GITHUB_API_URL": server.base_url,
+        "GITHUB_TOKEN": token_list[0],
+        "GITHUB_TOKENS": ",".join(token_list[1:]),
+        "GITHUB_CACHE_ENABLED": "false",
+    }.items():
+        os.environ[key] = value
+
+    from app.services.github_service import github_service
+
+    queries = [f"compute_total{i} values items" for i in range(searches)]
+    failures = 0
+    started = time.perf_counter()
+
+    if use_async:
+        async def run_all():
+            return await asyncio.gather(*(github_service.asearch_code(q) for q in queries), return_exceptions=True)
+        results = asyncio.run(run_all())
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+
+        def run_one(query):
+            try:
+                return github_service.search_code(query)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(run_one, queries))
+
+    for result in results:
+        if isinstance(result, Exception):
+            failures += 1
+            print(f"  error: {result}")
+
+    elapsed = time.perf_counter() - started
+    print(f"searches={searches} tokens={tokens} ok={searches - failures} failed={failures} "
+          f"elapsed={elapsed:.1f}s server_rejections={server.rejected}")
+    print(json.dumps(github_service.rate_limit_stats(), indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--search-limit", type=int, default=30, help="searches per token per window")
+    parser.add_argument("--core-limit", type=int, default=5000, help="content requests per token per window")
+    parser.add_argument("--window", type=float, default=60.0, help="rate-limit window in seconds")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--secondary-every", type=int, default=0, help="answer every Nth search with a secondary limit")
+    parser.add_argument("--fixtures", help="replay recorded files from this JSON instead of synthesizing them")
+    parser.add_argument("--drive", type=int, default=0, help="run this many searches through GitHubService and exit")
+    parser.add_argument("--tokens", type=int, default=2, help="tokens to rotate across with --drive")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="use asearch_code with --drive")
+    args = parser.parse_args()
+
+    server = start_server(
+        0 if args.drive else args.port,
+        args.search_limit,
+        args.core_limit,
+        args.window,
+        args.latency,
+        args.secondary_every,
+        load_fixtures(args.fixtures) if args.fixtures else None
+    )
+
+    if args.drive:
+        drive(server, args.drive, args.tokens, args.use_async)
+        server.shutdown()
+        return
+
+    print(f"Fake GitHub API listening on {server.base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Local stand-in for the OpenAI chat completions endpoint.
+
+Serves POST /chat/completions (and /v1/chat/completions) with a latency and a
+requests-per-window limit: over budget, requests get a 429 with Retry-After,
+like the real API. Replies answer the similarity prompts the backend sends,
+pair or batch, as JSON text in the message content, which is what both the
+plain and the structured-output (json_schema) requests parse.
+
+A reply is replayed from --fixtures when the prompt was recorded there
+(keyed by the sha256 of the prompt); otherwise a deterministic verdict is
+computed from the token overlap of the two code sides. --record writes every
+reply served to a fixtures file on exit, so a corpus can be pinned once and
+replayed exactly afterwards.
+
+Run the server on its own and point the backend at it:
+    python benchmarks/fake_openai.py --port 8766 --latency 0.2 --rate-limit 60
+    OPENAI_API_BASE_URL=http://127.0.0.1:8766/v1 OPENAI_API_KEY=fake uvicorn app.main:app
+"""
+import argparse
+import difflib
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+CODE_FENCE = re.compile(r"Student Code:\n```python\n(.*?)\n```\s*Found Code on GitHub:\n```python\n(.*?)\n```", re.S)
+TOKEN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+|\S")
+SUSPICIOUS_PERCENT = 70
+
+
+def prompt_key(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def load_fixtures(path: str) -> Dict[str, str]:
+    """Recorded replies: a {"replies": {sha256(prompt): content}} document."""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["replies"]
+
+
+def verdict(block_code: str, match_code: str) -> dict:
+    ratio = difflib.SequenceMatcher(None, TOKEN.findall(block_code), TOKEN.findall(match_code), autojunk=False).ratio()
+    percent = round(ratio * 100)
+    return {
+        "similarity_percent": percent,
+        "is_suspicious": percent >= SUSPICIOUS_PERCENT,
+        "reason": f"Token sequences overlap {percent}%"
+    }
+
+
+def answer(prompt: str) -> str:
+    """The JSON reply for a pair prompt, or {"results": [...]} for a batch prompt."""
+    pairs = CODE_FENCE.findall(prompt)
+    if "### Pair" in prompt:
+        results = [{"index": index, **verdict(block, match)} for index, (block, match) in enumerate(pairs)]
+        return json.dumps({"results": results})
+    if pairs:
+        return json.dumps(verdict(*pairs[0]))
+    return json.dumps({"similarity_percent": 0, "is_suspicious": False, "reason": "No code to compare"})
+
+
+class FakeOpenAI(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency: float, rate_limit: int, window: float, fixtures: Optional[Dict[str, str]] = None):
+        super().__init__(address, FakeOpenAIHandler)
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.window = window
+        self.fixtures = fixtures or {}
+        self.served: Dict[str, str] = {}
+        self.bucket: Tuple[float, int] = (time.time(), 0)
+        self.requests = 0
+        self.replayed = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def consume(self) -> Tuple[bool, Dict[str, str]]:
+        """Charge one request to the shared budget; 0 disables the limit."""
+        now = time.time()
+        with self.lock:
+            self.requests += 1
+            if not self.rate_limit:
+                return True, {}
+            start, used = self.bucket
+            if now - start >= self.window:
+                start, used = now, 0
+            allowed = used < self.rate_limit
+            if allowed:
+                used += 1
+            else:
+                self.rejected += 1
+            self.bucket = (start, used)
+
+        headers = {
+            "x-ratelimit-limit-requests": str(self.rate_limit),
+            "x-ratelimit-remaining-requests": str(self.rate_limit - used),
+        }
+        if not allowed:
+            headers["retry-after"] = str(max(1, int(start + self.window - now) + 1))
+        return allowed, headers
+
+    def reply(self, prompt: str) -> str:
+        key = prompt_key(prompt)
+        content = self.fixtures.get(key)
+        with self.lock:
+            if content is not None:
+                self.replayed += 1
+            else:
+                content = answer(prompt)
+            self.served[key] = content
+        return content
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"requests": self.requests, "replayed": self.replayed, "rejected": self.rejected}
+
+    def save(self, path: str):
+        with self.lock:
+            replies = {**self.fixtures, **self.served}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"replies": replies}, f, indent=2, sort_keys=True)
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    server: FakeOpenAI
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: dict, headers: Dict[str, str]):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        if self.path.rstrip("/") not in ("/chat/completions", "/v1/chat/completions"):
+            self._send(404, {"error": {"message": "Not Found", "type": "invalid_request_error"}}, {})
+            return
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        allowed, headers = self.server.consume()
+        if not allowed:
+            self._send(429, {"error": {
+                "message": "Rate limit reached for requests",
+                "type": "requests",
+                "code": "rate_limit_exceeded"
+            }}, headers)
+            return
+
+        messages: List[dict] = request.get("messages", [])
+        prompt = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        if isinstance(prompt, list):
+            prompt = "".join(part.get("text", "") for part in prompt if isinstance(part, dict))
+        content = self.server.reply(prompt)
+
+        prompt_tokens = max(1, len(prompt) // 4)
+        completion_tokens = max(1, len(content) // 4)
+        self._send(200, {
+            "id": f"chatcmpl-{prompt_key(prompt)[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content, "refusal": None},
+                "finish_reason": "stop",
+                "logprobs": None
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        }, headers)
+
+
+def start_server(port: int = 0, latency: float = 0.0, rate_limit: int = 0, window: float = 60.0,
+                 fixtures: Optional[Dict[str, str]] = None) -> FakeOpenAI:
+    server = FakeOpenAI(("127.0.0.1", port), latency, rate_limit, window, fixtures)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--rate-limit", type=int, default=0, help="requests per window, 0 for unlimited")
+    parser.add_argument("--window", type=float, default=60.0, help="rate-limit window in seconds")
+    parser.add_argument("--fixtures", help="replay recorded replies from this JSON")
+    parser.add_argument("--record", help="write every reply served to this JSON on exit")
+    args = parser.parse_args()
+
+    server = start_server(args.port, args.latency, args.rate_limit, args.window,
+                          load_fixtures(args.fixtures) if args.fixtures else None)
+    print(f"Fake OpenAI API listening on {server.base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        if args.record:
+            server.save(args.record)
+        print(json.dumps(server.stats()))
+
+
+if __name__ == "__main__":
+    main()
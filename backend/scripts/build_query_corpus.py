@@ -0,0 +1,63 @@
+"""
+Build the document-frequency table the query planner weights search terms with.
+
+Every function in the given source trees (by default the Python standard
+library) is one document; for each identifier and string-literal word the
+script counts how many functions use it. Rare terms are dropped to keep the
+table small — the planner treats unknown terms as maximally distinctive.
+
+Usage:
+    python scripts/build_query_corpus.py [SRC_DIR ...] [--min-df 5]
+"""
+import argparse
+import ast
+import json
+import os
+import sys
+import sysconfig
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.query_planner import CORPUS_PATH, extract_terms
+
+
+def iter_functions(root: str):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in ("site-packages", "test", "tests", "__pycache__")]
+        for filename in filenames:
+            if not filename.endswith(".py"):
+                continue
+            try:
+                with open(os.path.join(dirpath, filename), encoding="utf-8") as f:
+                    tree = ast.parse(f.read())
+            except (SyntaxError, UnicodeDecodeError, ValueError):
+                continue
+            for node in ast.walk(tree):
+                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    yield node
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("roots", nargs="*", default=[sysconfig.get_paths()["stdlib"]])
+    parser.add_argument("--min-df", type=int, default=5)
+    parser.add_argument("--output", default=CORPUS_PATH)
+    args = parser.parse_args()
+
+    documents = 0
+    doc_freq: Counter = Counter()
+    for root in args.roots:
+        for node in iter_functions(root):
+            documents += 1
+            doc_freq.update({term.lower() for term in extract_terms(node)})
+
+    table = {term: count for term, count in doc_freq.most_common() if count >= args.min_df}
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"documents": documents, "doc_freq": table}, f, separators=(",", ":"), sort_keys=True)
+
+    print(f"{documents} functions, {len(table)} terms written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
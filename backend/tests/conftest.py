@@ -0,0 +1,19 @@
+import os
+import sys
+import tempfile
+
+# Keep the suite off the network and away from the developer's caches
+_cache_dir = tempfile.mkdtemp(prefix="plagiarism-tests-")
+os.environ.update({
+    "OPENAI_API_KEY": "",
+    "GITHUB_TOKEN": "",
+    "GITHUB_TOKENS": "",
+    "WARMUP_ON_STARTUP": "false",
+    "LOG_LEVEL": "WARNING",
+    "LLM_CACHE_PATH": os.path.join(_cache_dir, "llm_cache.sqlite3"),
+    "GITHUB_CACHE_PATH": os.path.join(_cache_dir, "github_cache.sqlite3"),
+    "TEMPLATE_STORE_PATH": os.path.join(_cache_dir, "templates.sqlite3"),
+    "JOB_STORE_PATH": os.path.join(_cache_dir, "jobs.sqlite3"),
+})
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,59 @@
+import asyncio
+import io
+import zipfile
+import pytest
+from app.core.config import settings
+from app.services.batch_checker import BatchLimitError, collect_upload_sources, deduplicate_blocks
+from app.services.code_parser import code_parser
+
+class Upload:
+    """The parts of starlette's UploadFile that collect_upload_sources uses."""
+
+    def __init__(self, filename: str, content: bytes):
+        self.filename = filename
+        self.file = io.BytesIO(content)
+
+    async def read(self, size: int = -1) -> bytes:
+        return self.file.read(size)
+
+def _zip(*names: str) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name in names:
+            archive.writestr(name, f"def {name.split('.')[0]}():\n    return 1\n")
+    return buffer.getvalue()
+
+def test_archives_and_files_are_read_into_sources():
+    files = [Upload("a.zip", _zip("one.py", "two.py", "notes.txt")), Upload("three.py", b"x = 3\n"), Upload("bin.py", b"\xff\xfe")]
+
+    sources = asyncio.run(collect_upload_sources(files))
+
+    assert [name for name, _ in sources] == ["one.py", "two.py", "three.py", "bin.py"]
+    assert sources[-1][1] is None
+
+def test_batch_limit_counts_files_across_archives(monkeypatch):
+    monkeypatch.setattr(settings, "BATCH_MAX_FILES", 3)
+    files = [Upload("a.zip", _zip("one.py", "two.py")), Upload("b.zip", _zip("three.py", "four.py"))]
+
+    with pytest.raises(BatchLimitError):
+        asyncio.run(collect_upload_sources(files))
+
+def test_batch_limit_counts_archives_and_plain_files(monkeypatch):
+    monkeypatch.setattr(settings, "BATCH_MAX_FILES", 2)
+    files = [Upload("a.py", b"a = 1\n"), Upload("b.zip", _zip("two.py", "three.py"))]
+
+    with pytest.raises(BatchLimitError):
+        asyncio.run(collect_upload_sources(files))
+
+def test_identical_and_renamed_blocks_share_a_representative():
+    code = (
+        "def total(prices):\n    result = 0\n    for p in prices:\n        result += p * 2\n    return result\n\n"
+        "def calc(xs):\n    acc = 0\n    for x in xs:\n        acc += x * 2\n    return acc\n\n"
+        "def greet(name):\n    message = 'hello ' + name\n    print(message)\n    return message.upper()\n"
+    )
+    blocks = code_parser.parse_code(code)
+
+    representatives, assignment = deduplicate_blocks(blocks + code_parser.parse_code(code))
+
+    assert len(representatives) == 2
+    assert assignment == [0, 0, 1, 0, 0, 1]
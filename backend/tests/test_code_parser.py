@@ -0,0 +1,85 @@
+import pytest
+from app.core.exceptions import CodeParseError
+from app.services.code_parser import code_parser
+
+SOURCE = '''import os
+
+MAX_ITEMS = 10
+
+def helper(value):
+    return value * 2
+
+class Inventory:
+    """Items kept in stock."""
+    unit = "pcs"
+    limits = {"min": 1, "max": MAX_ITEMS}
+
+    def add(self, item):
+        self.items.append(item)
+
+    async def refresh(self):
+        return await self.load()
+
+class Point:
+    x = 0
+    y = 0
+
+if os.environ.get("DEBUG"):
+    def debug_dump(obj):
+        print(repr(obj))
+'''
+
+def _names(granularity: str):
+    return [(block["type"], block["name"]) for block in code_parser.parse_code(SOURCE, granularity=granularity)]
+
+def test_module_granularity_is_one_block_ending_on_the_last_line():
+    blocks = code_parser.parse_code(SOURCE, granularity="module")
+
+    assert len(blocks) == 1
+    assert blocks[0]["lines"] == (1, 25)
+
+def test_top_level_granularity_skips_nested_definitions():
+    assert _names("top_level") == [("function", "helper"), ("class", "Inventory"), ("class", "Point")]
+
+def test_class_granularity_keeps_classes_whole():
+    assert _names("class") == [
+        ("function", "helper"),
+        ("class", "Inventory"),
+        ("class", "Point"),
+        ("function", "debug_dump")
+    ]
+
+def test_method_granularity_splits_classes_and_keeps_class_statements():
+    assert _names("method") == [
+        ("function", "helper"),
+        ("class", "Inventory"),
+        ("method", "Inventory.add"),
+        ("method", "Inventory.refresh"),
+        ("class", "Point"),
+        ("function", "debug_dump")
+    ]
+
+    residual = code_parser.parse_code(SOURCE, granularity="method")[1]
+    assert residual["code"] == 'class Inventory:\n    unit = "pcs"\n    limits = {"min": 1, "max": MAX_ITEMS}'
+    assert residual["lines"] == (8, 11)
+    assert "def" not in residual["tokens"]
+
+def test_split_class_without_class_statements_has_no_residual_block():
+    code = 'class Stack:\n    """LIFO."""\n\n    def push(self, item):\n        self.items.append(item)\n'
+
+    assert [block["name"] for block in code_parser.parse_code(code, granularity="method")] == ["Stack.push"]
+
+def test_code_without_definitions_falls_back_to_one_raw_block():
+    blocks = code_parser.parse_code("total = 1 + 2\nprint(total)\n", granularity="method")
+
+    assert [(block["type"], block["lines"]) for block in blocks] == [("raw", (1, 2))]
+
+def test_renamed_copies_share_a_structural_hash():
+    first = code_parser.parse_code("def area(r):\n    return 3.14 * r * r\n")[0]
+    second = code_parser.parse_code("def size(x):\n    return 2.5 * x * x\n")[0]
+
+    assert first["structural_hash"] == second["structural_hash"]
+
+def test_invalid_code_raises_parse_error():
+    with pytest.raises(CodeParseError):
+        code_parser.parse_code("def broken(:\n")
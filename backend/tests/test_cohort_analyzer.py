@@ -0,0 +1,50 @@
+import pytest
+from app.core.config import settings
+from app.services.cohort_analyzer import CohortAnalyzer
+
+SHARED = '''def weighted_median(values, weights):
+    pairs = sorted(zip(values, weights))
+    half = sum(weights) / 2
+    {acc} = 0
+    for value, weight in pairs:
+        {acc} += weight
+        if {acc} >= half:
+            return value
+    return pairs[-1][0]
+'''
+
+OWN = '''def describe_{n}(items):
+    result = {{}}
+    for index, item in enumerate(items):
+        if index % {n} == 0:
+            result[item] = [index] * {n}
+        else:
+            result.setdefault(str(item), []).append(index - {n})
+    return sorted(result.items())[:{n}]
+'''
+
+@pytest.fixture(autouse=True)
+def in_process(monkeypatch):
+    monkeypatch.setattr(settings, "COHORT_WORKERS", 1)
+
+def test_small_cohort_with_majority_collusion_is_paired():
+    sources = [
+        ("alice", SHARED.format(acc="acc")),
+        ("bob", SHARED.format(acc="total")),
+        ("carol", SHARED.format(acc="running")),
+        ("dave", OWN.format(n=7))
+    ]
+
+    result = CohortAnalyzer().analyze(sources)
+
+    assert result["clusters"] == [{"submissions": ["alice", "bob", "carol"], "max_similarity_percent": 100}]
+    assert len(result["pairs"]) == 3
+
+def test_large_cohort_ignores_code_most_submissions_share(monkeypatch):
+    monkeypatch.setattr(settings, "COHORT_DOC_FREQUENCY_MIN_SUBMISSIONS", 10)
+    sources = [(f"student{n}", SHARED.format(acc="acc") + "\n" + OWN.format(n=n + 2)) for n in range(12)]
+
+    result = CohortAnalyzer().analyze(sources)
+
+    assert result["pairs"] == []
+    assert result["total_blocks"] == 24
@@ -0,0 +1,66 @@
+from app.services.code_parser import code_parser
+from app.services.fingerprint_index import FingerprintIndex, containment, fingerprint, winnow
+
+BUBBLE = '''def bubble_sort(items):
+    for i in range(len(items)):
+        for j in range(len(items) - i - 1):
+            if items[j] > items[j + 1]:
+                items[j], items[j + 1] = items[j + 1], items[j]
+    return items
+'''
+
+RENAMED = '''def order(values):
+    # swap neighbours until sorted
+    for a in range(len(values)):
+        for b in range(len(values) - a - 1):
+            if values[b] > values[b + 1]:
+                values[b], values[b + 1] = values[b + 1], values[b]
+    return values
+'''
+
+UNRELATED = '''def word_count(path):
+    counts = {}
+    with open(path) as handle:
+        for line in handle:
+            for word in line.split():
+                counts[word] = counts.get(word, 0) + 1
+    return counts
+'''
+
+def test_winnow_keeps_one_fingerprint_per_window():
+    tokens = code_parser.normalized_tokens(BUBBLE)
+    fingerprints = winnow(tokens, k=5, window=4)
+
+    kgrams = len(tokens) - 5 + 1
+    # At least one per disjoint window, never more than there are k-grams
+    assert kgrams // 4 <= len(fingerprints) <= kgrams
+    assert winnow(tokens, k=5, window=4) == fingerprints
+
+def test_winnow_handles_short_streams():
+    assert winnow([], k=5, window=4) == set()
+    assert len(winnow(["def", "V", "(", ")", ":"][:3], k=5, window=4)) == 1
+
+def test_fingerprints_ignore_renaming_comments_and_layout():
+    assert containment(fingerprint(RENAMED), fingerprint(BUBBLE)) == 1.0
+    assert containment(fingerprint(UNRELATED), fingerprint(BUBBLE)) < 0.3
+    assert containment(set(), fingerprint(BUBBLE)) == 0.0
+
+def test_index_ranks_documents_by_containment_and_excludes_submissions():
+    index = FingerprintIndex(max_docs=10)
+    index.add_code("github:sorts", BUBBLE, {"kind": "github"})
+    index.add_code("submission:alice", BUBBLE, {"kind": "submission", "submission": "alice"})
+    index.add_code("submission:bob", UNRELATED, {"kind": "submission", "submission": "bob"})
+
+    results = index.query(fingerprint(RENAMED), limit=3, exclude_submissions={"alice"})
+
+    assert results[0]["doc_id"] == "github:sorts"
+    assert results[0]["score"] == 1.0
+    assert all(result["doc_id"] != "submission:alice" for result in results)
+
+def test_index_drops_oldest_documents_past_max_docs():
+    index = FingerprintIndex(max_docs=1)
+    index.add_code("first", BUBBLE, {})
+    index.add_code("second", UNRELATED, {})
+
+    assert index.query(fingerprint(BUBBLE)) == []
+    assert index.stats()["documents"] == 1
@@ -0,0 +1,87 @@
+import time
+import pytest
+from app.core.exceptions import GitHubRateLimitError
+from app.services.github_rate_limiter import RateLimitScheduler
+
+def headers(remaining, limit=30, reset_in=60):
+    return {
+        "x-ratelimit-remaining": str(remaining),
+        "X-RateLimit-Limit": str(limit),
+        "X-RateLimit-Reset": str(int(time.time() + reset_in))
+    }
+
+def quota(scheduler, index=0, resource="search"):
+    return scheduler.metrics()["tokens"][index][resource]
+
+def test_headers_are_parsed_case_insensitively():
+    scheduler = RateLimitScheduler(["token-a"], max_wait=0)
+    scheduler.update_from_headers("token-a", "search", headers(25))
+
+    assert quota(scheduler)["remaining"] == 25
+    assert quota(scheduler)["limit"] == 30
+    assert quota(scheduler, resource="core")["remaining"] is None
+
+def test_malformed_headers_are_ignored():
+    scheduler = RateLimitScheduler(["token-a"], max_wait=0)
+    scheduler.update_from_headers("token-a", "search", {"X-RateLimit-Remaining": "lots"})
+
+    assert quota(scheduler)["remaining"] is None
+
+def test_quota_without_reset_header_is_usable():
+    scheduler = RateLimitScheduler(["token-a"], max_wait=0)
+    scheduler.update_from_headers("token-a", "search", {"X-RateLimit-Remaining": "5", "X-RateLimit-Limit": "30"})
+
+    with scheduler.slot("search") as token:
+        assert token == "token-a"
+    assert quota(scheduler)["reset_in_seconds"] is None
+
+def test_late_response_does_not_raise_remaining_within_a_window():
+    scheduler = RateLimitScheduler(["token-a"], max_wait=0)
+    reset_at = int(time.time() + 60)
+    scheduler.update("token-a", "search", 10, 30, reset_at)
+    scheduler.update("token-a", "search", 12, 30, reset_at)
+    assert quota(scheduler)["remaining"] == 10
+
+    # A new window starts with a fresh budget
+    scheduler.update("token-a", "search", 30, 30, reset_at + 60)
+    assert quota(scheduler)["remaining"] == 30
+
+def test_token_with_most_quota_left_is_picked():
+    scheduler = RateLimitScheduler(["token-a", "token-b"], max_wait=0)
+    scheduler.update_from_headers("token-a", "search", headers(3))
+    scheduler.update_from_headers("token-b", "search", headers(20))
+
+    with scheduler.slot("search") as token:
+        assert token == "token-b"
+        assert quota(scheduler, 1)["in_flight"] == 1
+    assert quota(scheduler, 1)["in_flight"] == 0
+
+def test_unknown_quota_sends_a_single_probe():
+    scheduler = RateLimitScheduler(["token-a"], max_wait=0)
+
+    with scheduler.slot("search"):
+        with pytest.raises(GitHubRateLimitError):
+            scheduler.acquire("search")
+
+def test_exhausted_tokens_raise_past_max_wait():
+    scheduler = RateLimitScheduler(["token-a", "token-b"], max_wait=1)
+    scheduler.update_from_headers("token-a", "search", headers(0, reset_in=120))
+    scheduler.update_from_headers("token-b", "search", headers(0, reset_in=300))
+
+    with pytest.raises(GitHubRateLimitError):
+        scheduler.acquire("search")
+    assert scheduler.metrics()["rejected"] == 1
+
+    # Search exhaustion does not block the core bucket
+    with scheduler.slot("core") as token:
+        assert token in ("token-a", "token-b")
+
+def test_throttled_token_is_skipped():
+    scheduler = RateLimitScheduler(["token-a", "token-b"], max_wait=0)
+    scheduler.update_from_headers("token-a", "search", headers(25))
+    scheduler.update_from_headers("token-b", "search", headers(5))
+    scheduler.throttle("token-a", "search", retry_after=60)
+
+    with scheduler.slot("search") as token:
+        assert token == "token-b"
+    assert scheduler.metrics()["tokens"][0]["throttled"] == 1
@@ -0,0 +1,83 @@
+import asyncio
+import base64
+import httpx
+import pytest
+from app.core.config import settings
+from app.services import github_service as github_module
+from app.services.github_service import GitHubService
+
+ITEM = {
+    "repository": {"full_name": "octo/repo"},
+    "html_url": "https://github.com/octo/repo/blob/main/sort.py",
+    "path": "sort.py",
+    "sha": "abc123",
+    "url": "https://api.github.test/repos/octo/repo/contents/sort.py"
+}
+
+class FakeGitHub:
+    """Answers code searches and content fetches; counts the searches it receives."""
+
+    def __init__(self):
+        self.searches = []
+
+    def respond(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/search/code":
+            self.searches.append(request.url.params["q"])
+            return httpx.Response(200, json={"items": [ITEM]})
+        content = base64.b64encode(b"def sort(items): return sorted(items)").decode()
+        return httpx.Response(200, json={"content": content})
+
+    async def arespond(self, request: httpx.Request) -> httpx.Response:
+        # Long enough for concurrent callers to find the search in flight
+        await asyncio.sleep(0.05)
+        return self.respond(request)
+
+@pytest.fixture
+def github(monkeypatch):
+    monkeypatch.setattr(settings, "GITHUB_TOKEN", "token-a")
+    monkeypatch.setattr(settings, "GITHUB_CACHE_ENABLED", False)
+    fake = FakeGitHub()
+    clients = {
+        "sync": httpx.Client(base_url="https://api.github.test", transport=httpx.MockTransport(fake.respond)),
+        "async": httpx.AsyncClient(base_url="https://api.github.test", transport=httpx.MockTransport(fake.arespond))
+    }
+    monkeypatch.setattr(github_module.http_clients, "client", lambda name: clients["sync"])
+    monkeypatch.setattr(github_module.http_clients, "async_client", lambda name: clients["async"])
+    return GitHubService(), fake
+
+def test_sync_and_async_search_return_the_same_matches(github):
+    service, fake = github
+
+    matches = service.search_code("def sort items")
+    amatches = asyncio.run(service.asearch_code("def sort items"))
+
+    assert matches == amatches
+    assert matches == [{
+        "repo": "octo/repo",
+        "url": ITEM["html_url"],
+        "path": "sort.py",
+        "sha": "abc123",
+        "content_url": ITEM["url"],
+        "content": "def sort(items): return sorted(items)"
+    }]
+    assert fake.searches == ["def sort items language:python"] * 2
+
+def test_equivalent_queries_share_one_search_in_flight(github):
+    service, fake = github
+
+    async def search():
+        return await asyncio.gather(
+            service.asearch_code("def sort(items):"),
+            service.asearch_code("def   sort items")
+        )
+
+    first, second = asyncio.run(search())
+
+    assert first == second
+    assert fake.searches == ["def sort items language:python"]
+
+def test_invalid_query_is_not_sent(github):
+    service, fake = github
+
+    assert service.search_code("()") == []
+    assert fake.searches == []
@@ -0,0 +1,67 @@
+import asyncio
+import time
+import pytest
+from app.services.job_queue import JobQueue
+from app.storage.job_store import JobStore, SQLiteJobStore
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+    return JobStore()
+
+def _job(job_id, status, **fields):
+    return {"id": job_id, "status": status, "result": None, "error": None, **fields}
+
+def test_fail_orphaned_keeps_jobs_of_live_instances(store):
+    store.heartbeat("live")
+    store.set("a", _job("a", "running", instance_id="live"))
+    store.set("b", _job("b", "queued", instance_id="gone"))
+    # Jobs written before instance ids existed have no owner to vouch for them
+    store.set("c", _job("c", "running", worker_pid=1))
+    store.set("d", _job("d", "completed", instance_id="gone"))
+
+    assert store.fail_orphaned("interrupted", max_age=30) == 2
+
+    assert store.get("a")["status"] == "running"
+    assert store.get("b")["status"] == "failed"
+    assert store.get("b")["error"] == "interrupted"
+    assert store.get("c")["status"] == "failed"
+    assert store.get("d")["status"] == "completed"
+
+def test_fail_orphaned_treats_stale_heartbeat_as_stopped(store, monkeypatch):
+    store.heartbeat("quiet")
+    store.set("a", _job("a", "running", instance_id="quiet"))
+    later = time.time() + 60
+    monkeypatch.setattr(time, "time", lambda: later)
+
+    assert store.fail_orphaned("interrupted", max_age=30) == 1
+    assert store.get("a")["status"] == "failed"
+
+def test_queue_records_progress_and_result_off_the_event_loop(store):
+    async def runner(code, on_progress=None, **options):
+        on_progress("code_splitting", {"total_blocks": 1, "blocks": [{"name": "f", "type": "function"}]})
+        on_progress("similarity_analysis", {"comparisons": []})
+        return {"success": True, "blocks": [], "comparisons": [], "options": options}
+
+    async def scenario():
+        queue = JobQueue(store, runner, workers=1, max_size=10)
+        await queue.start()
+        try:
+            job = await queue.submit("def f(): pass", submitter_id="alice")
+            for _ in range(200):
+                stored = await asyncio.to_thread(queue.get, job["id"])
+                if stored["status"] not in ("queued", "running"):
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await queue.stop()
+        return job, queue.get(job["id"]), queue.instance_id
+
+    job, stored, instance_id = asyncio.run(scenario())
+
+    assert job["instance_id"] == instance_id
+    assert stored["status"] == "completed"
+    assert stored["stage"] == "similarity_analysis"
+    assert stored["progress"]["stage_1_result"]["total_blocks"] == 1
+    assert stored["result"]["success"] is True
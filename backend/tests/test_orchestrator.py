@@ -0,0 +1,156 @@
+import time
+import pytest
+from app.agents import orchestrator as orchestrator_module
+from app.agents.orchestrator import Orchestrator
+from app.services.code_parser import code_parser
+from app.services.fingerprint_index import FingerprintIndex, fingerprint
+from app.storage.ttl_cache import block_cache, check_history
+from app.utils.hashing import code_hash
+from app.utils.llm_usage import LLMUsage
+from app.utils.metrics import registry
+
+METHOD = '''
+    def merge_sorted_lists(self, left, right):
+        merged = []
+        while left and right:
+            merged.append(left.pop(0) if left[0] <= right[0] else right.pop(0))
+        return merged + left + right
+'''
+
+def _state(code: str):
+    return {"success": True, "blocks": code_parser.parse_code(code, granularity="method"), "resolved": {}}
+
+def test_block_cache_reports_block_under_its_current_name():
+    orchestrator = Orchestrator()
+    first = orchestrator._run_block_cache(_state(f"class Alpha:{METHOD}"))
+    block = first["blocks"][0]
+    block_cache.set(block["hash"], {
+        "block_name": block["name"],
+        "block_type": block["type"],
+        "similarity_percent": 12,
+        "is_suspicious": False
+    })
+
+    second = orchestrator._run_block_cache(_state(f"class Beta:{METHOD}"))
+
+    comparison = second["resolved"][0]
+    assert comparison["cached"] is True
+    assert comparison["block_name"] == "Beta.merge_sorted_lists"
+    assert comparison["similarity_percent"] == 12
+
+def _checked(orchestrator: Orchestrator, code: str):
+    """A finished check of code, as check_history stores it."""
+    state = _state(code)
+    state["comparisons"] = [
+        {"block_name": block["name"], "block_type": block["type"], "similarity_percent": 90, "is_suspicious": True}
+        for block in state["blocks"]
+    ]
+    return check_history.get(orchestrator._remember_check("previous", state))
+
+def _recheck(orchestrator: Orchestrator, previous, code: str):
+    state = dict(_state(code), previous_check=previous)
+    return orchestrator._run_previous_check(state)["resolved"]
+
+def test_previous_check_reuses_unchanged_and_moved_blocks():
+    orchestrator = Orchestrator()
+    previous = _checked(orchestrator, f"class Alpha:{METHOD}")
+
+    unchanged = _recheck(orchestrator, previous, f"class Alpha:{METHOD}")
+    moved = _recheck(orchestrator, previous, f"class Beta:{METHOD}")
+
+    assert unchanged[0]["reused"] is True
+    assert moved[0]["reused"] is True
+    assert moved[0]["block_name"] == "Beta.merge_sorted_lists"
+
+def test_previous_check_does_not_reuse_block_with_new_identifiers():
+    orchestrator = Orchestrator()
+    previous = _checked(orchestrator, "def total(prices):\n    return sum(p * 2 for p in prices)\n")
+
+    resolved = _recheck(orchestrator, previous, "def score(weights):\n    return sum(w * 3 for w in weights)\n")
+
+    assert resolved == {}
+
+WEIGHTED_MEDIAN = '''def weighted_median(values, weights):
+    pairs = sorted(zip(values, weights))
+    half = sum(weights) / 2
+    {acc} = 0
+    for value, weight in pairs:
+        {acc} += weight
+        if {acc} >= half:
+            return value
+    return pairs[-1][0]
+'''
+
+@pytest.fixture
+def index(monkeypatch):
+    fresh = FingerprintIndex(max_docs=100)
+    monkeypatch.setattr(orchestrator_module, "fingerprint_index", fresh)
+    return fresh
+
+def _matched(orchestrator: Orchestrator, code: str, submitter_id=None):
+    state = dict(_state(code), submitter_id=submitter_id, excluded_submissions=set())
+    return orchestrator._run_fingerprint_matcher(state)
+
+def test_resubmission_by_the_same_submitter_is_not_a_match(index):
+    orchestrator = Orchestrator()
+    first = WEIGHTED_MEDIAN.format(acc="acc")
+    orchestrator.index_submission(code_hash(first), _state(first)["blocks"], submitter_id="alice", check_id="check-1")
+
+    state = _matched(orchestrator, WEIGHTED_MEDIAN.format(acc="running"), submitter_id="alice")
+
+    assert state["resolved"] == {}
+    assert state["submission_matches"] == {}
+
+def test_match_with_another_submitter_is_reported_not_judged(index):
+    orchestrator = Orchestrator()
+    first = WEIGHTED_MEDIAN.format(acc="total")
+    orchestrator.index_submission(code_hash(first), _state(first)["blocks"], submitter_id="dana", assignment_id="hw3", check_id="check-2")
+
+    state = _matched(orchestrator, WEIGHTED_MEDIAN.format(acc="seen"), submitter_id="erin")
+
+    # Still searched and scored; the match only annotates the comparison
+    assert state["resolved"] == {}
+    assert state["submission_matches"][0] == {
+        "submitter_id": "dana",
+        "assignment_id": "hw3",
+        "check_id": "check-2",
+        "block_name": "weighted_median",
+        "similarity_percent": 100
+    }
+    comparison = orchestrator._merge_comparisons(state, [{"block_name": "weighted_median", "is_suspicious": False}])[0]
+    assert comparison["is_suspicious"] is False
+    assert comparison["matched_submission"]["submitter_id"] == "dana"
+
+def test_anonymous_and_failed_checks_are_not_indexed(index):
+    orchestrator = Orchestrator()
+    code = WEIGHTED_MEDIAN.format(acc="mass")
+    blocks = _state(code)["blocks"]
+    orchestrator.index_submission(code_hash(code), blocks)
+
+    failed = dict(
+        _state(code),
+        submitter_id="frank",
+        search_results=[{"error": "GitHub rate limit exhausted"}],
+        comparisons=[{"block_name": "weighted_median", "similarity_percent": 0}],
+        llm_usage=LLMUsage(),
+        timings={},
+        started=time.perf_counter()
+    )
+    orchestrator._finish(code_hash(code), failed)
+
+    assert index.query(fingerprint(code)) == []
+
+def _sample(name: str, stage: str) -> float:
+    return registry.get_sample_value(name, {"stage": stage}) or 0.0
+
+def test_stage_nodes_record_stage_and_per_block_timings():
+    orchestrator = Orchestrator()
+    state = dict(_state(f"class Gamma:{METHOD}\n{WEIGHTED_MEDIAN.format(acc='acc')}"), timings={})
+    runs = _sample("plagiarism_stage_duration_seconds_count", "block_cache")
+    per_block = _sample("plagiarism_stage_block_duration_seconds_count", "block_cache")
+
+    state = orchestrator.nodes["block_cache"].invoke(state)
+
+    assert "block_cache" in state["timings"]
+    assert _sample("plagiarism_stage_duration_seconds_count", "block_cache") == runs + 1
+    assert _sample("plagiarism_stage_block_duration_seconds_count", "block_cache") == per_block + 1
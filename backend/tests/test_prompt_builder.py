@@ -0,0 +1,64 @@
+from app.core.config import settings
+from app.services.prompt_builder import MIN_SIDE_TOKENS, TRUNCATION_MARK, fit, prompt_builder, strip_code
+from app.utils.tokens import count_tokens
+
+COMMENTED = '''def area(width, height):
+    """Rectangle area."""
+    # multiply the sides
+    result = width * height  # inline note
+
+    return result
+'''
+
+def _long_function(name: str, lines: int) -> str:
+    body = "\n".join(f"    total_{i} = values[{i}] * {i} + offset" for i in range(lines))
+    return f"def {name}(values, offset):\n{body}\n    return total_0\n"
+
+def test_strip_code_drops_comments_docstrings_and_blank_lines():
+    assert strip_code(COMMENTED) == "def area(width, height):\n    result = width * height\n    return result"
+
+def test_strip_code_keeps_strings_that_are_not_statements():
+    code = 'def greet():\n    return "# not a comment"\n'
+
+    assert strip_code(code) == code.rstrip()
+
+def test_strip_code_falls_back_on_untokenizable_snippets():
+    code = "    # lead comment\n    values = compute(\n        first,\n"
+
+    assert strip_code(code) == "values = compute(\n    first,"
+
+def test_fit_keeps_short_sides_whole():
+    short = "def f(a):\n    return a + 1"
+
+    assert fit([short, short], budget=500) == [short, short]
+
+def test_fit_gives_unused_share_to_the_longer_side():
+    short = "def f(a):\n    return a + 1"
+    long = _long_function("g", 200)
+    budget = 400
+
+    fitted_short, fitted_long = fit([short, long], budget)
+
+    assert fitted_short == short
+    assert fitted_long.endswith(TRUNCATION_MARK)
+    assert count_tokens(fitted_long) <= budget - count_tokens(short)
+    # The truncated side ends on a whole line, not half a statement
+    assert fitted_long.splitlines()[-2].startswith("    total_")
+    assert count_tokens(fitted_long) > budget // 2
+
+def test_fit_never_cuts_a_side_below_the_minimum():
+    fitted = fit([_long_function("g", 50), _long_function("h", 50)], budget=0)
+
+    for code in fitted:
+        assert TRUNCATION_MARK in code
+        assert count_tokens(code) <= MIN_SIDE_TOKENS
+
+def test_prompts_stay_within_the_budget_per_pair():
+    long = _long_function("g", 300)
+
+    pair = prompt_builder.pair_prompt(long, long)
+    batch = prompt_builder.batch_prompt([(long, long), (long, long), (long, long)])
+
+    assert count_tokens(pair) <= settings.LLM_PROMPT_TOKEN_BUDGET
+    assert count_tokens(batch) <= settings.LLM_PROMPT_TOKEN_BUDGET * 3
+    assert "### Pair 2" in batch
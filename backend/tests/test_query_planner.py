@@ -0,0 +1,86 @@
+import ast
+import json
+import pytest
+from app.core.config import settings
+from app.services.query_planner import QueryPlanner, extract_terms
+
+DISTINCTIVE = '''def levenshtein_distance(source, target):
+    """Edit distance between two strings."""
+    rows = [[0] * (len(target) + 1) for _ in range(len(source) + 1)]
+    for i in range(len(source) + 1):
+        rows[i][0] = i
+    for j in range(len(target) + 1):
+        rows[0][j] = j
+    return rows[len(source)][len(target)]
+'''
+
+@pytest.fixture
+def planner(tmp_path):
+    corpus = {
+        "documents": 1000,
+        "doc_freq": {"range": 600, "len": 700, "rows": 300, "source": 200, "target": 150}
+    }
+    path = tmp_path / "corpus.json"
+    path.write_text(json.dumps(corpus))
+    return QueryPlanner(str(path))
+
+def test_terms_keep_their_most_telling_kind():
+    node = ast.parse('def load_config(path):\n    """Docstring words are skipped."""\n    return parse_yaml(path, "strict_mode")\n').body[0]
+
+    terms = extract_terms(node)
+
+    assert terms["load_config"] == "definition"
+    assert terms["parse_yaml"] == "call"
+    assert terms["path"] == "name"
+    assert terms["strict_mode"] == "literal"
+    assert "Docstring" not in terms
+
+def test_rare_terms_lead_the_query(planner):
+    plan = planner.plan({"code": DISTINCTIVE})
+
+    assert plan["skip_reason"] is None
+    assert plan["query"].split()[0] == "levenshtein_distance"
+    assert "range" not in plan["query"].split()
+    assert plan["usefulness"] >= settings.QUERY_MIN_USEFULNESS
+
+@pytest.mark.parametrize("code, reason", [
+    ("def f(x):\n    return x\n", "too short to search"),
+    ('def handle_request(self, request, response, context):\n    """Subclasses implement this."""\n    raise NotImplementedError("override handle_request")\n', "trivial body"),
+    ("def __init__(self, name, value, parent):\n    super().__init__()\n    self.name = name\n    self.value = value\n    self.parent = parent\n", "constructor boilerplate"),
+])
+def test_low_value_blocks_are_not_searched(planner, code, reason):
+    plan = planner.plan({"code": code})
+
+    assert plan["query"] == ""
+    assert plan["skip_reason"] == reason
+
+def test_common_words_alone_are_not_distinctive(planner):
+    code = "def f(source, target):\n    rows = len(source) + len(target)\n    return range(rows, len(source))\n"
+
+    plan = planner.plan({"code": code})
+
+    assert plan["query"] == ""
+    assert plan["skip_reason"] == "no distinctive terms"
+
+def _plan(query, top):
+    return {"query": query, "terms": [{"term": top, "weight": 1.0}], "usefulness": 1.0, "skip_reason": None}
+
+def test_group_sends_identical_queries_once(planner):
+    plans = [_plan("alpha beta", "alpha"), _plan("", "x"), _plan("alpha beta", "alpha"), _plan("gamma", "gamma")]
+
+    searches = planner.group(plans, per_page=5)
+
+    assert [(s["query"], s["members"]) for s in searches] == [("alpha beta", [0, 2]), ("gamma", [3])]
+
+def test_group_batches_top_terms_and_assign_splits_hits(planner, monkeypatch):
+    monkeypatch.setattr(settings, "QUERY_BATCH_SIZE", 2)
+    plans = [_plan("alpha one", "alpha"), _plan("gamma two", "gamma"), _plan("delta", "delta")]
+
+    searches = planner.group(plans, per_page=5)
+
+    assert searches[0] == {"query": "alpha OR gamma", "per_page": 10, "members": [0, 1], "batched": True}
+    assert searches[1]["batched"] is False
+
+    matches = [{"content": "def Alpha(): ...", "path": "a.py"}, {"content": "", "path": "gamma/b.py"}]
+    assert planner.assign(plans[0], matches, per_page=5) == matches[:1]
+    assert planner.assign(plans[1], matches, per_page=5) == matches[1:]
@@ -0,0 +1,34 @@
+from app.services.similarity_engine import greedy_string_tiling, similarity_engine
+
+def test_tiling_of_identical_sequences_is_complete():
+    tokens = "def V ( V ) : return V + N".split()
+
+    assert greedy_string_tiling(tokens, tokens, min_match=3) == 1.0
+
+def test_tiling_ignores_runs_shorter_than_min_match():
+    assert greedy_string_tiling(list("abcdxyz"), list("abcpqrs"), min_match=4) == 0.0
+    assert greedy_string_tiling([], list("abc")) == 0.0
+
+def test_tiling_finds_reordered_blocks():
+    first = list("aaaaabbbbbccccc")
+    reordered = list("cccccaaaaabbbbb")
+
+    assert greedy_string_tiling(first, reordered, min_match=5) == 1.0
+
+def test_tiles_do_not_overlap():
+    # Only one of the two "abcde" runs in a can pair with the single run in b
+    assert greedy_string_tiling(list("abcdeabcde"), list("abcde"), min_match=5) == 2 * 5 / 15
+
+def test_renamed_copy_scores_high_and_unrelated_code_low():
+    original = "def total(prices):\n    result = 0\n    for p in prices:\n        result += p * 2\n    return result\n"
+    renamed = "def calc(xs):\n    acc = 0\n    for x in xs:\n        acc += x * 3\n    return acc\n"
+    unrelated = "class Node:\n    def __init__(self, left, right):\n        self.left = left\n        self.right = right\n"
+
+    assert similarity_engine.score(original, renamed)["similarity_percent"] == 100
+    assert similarity_engine.score(original, unrelated)["similarity_percent"] < 40
+
+def test_unparsable_snippet_is_scored_without_the_tree_component():
+    result = similarity_engine.score("def f(a):\n    return a + 1\n", "def f(a):\n    return a +")
+
+    assert "tree" not in result["components"]
+    assert result["similarity_percent"] > 0
@@ -0,0 +1,139 @@
+import asyncio
+import threading
+import time
+import pytest
+from app.core.config import settings
+from app.utils.singleflight import SingleFlight
+
+class LookupFailed(Exception):
+    pass
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight("test")
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    results = {}
+
+    def slow():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"items": [1, 2]}
+
+    def follower():
+        results["follower"] = flight.do("key", slow)
+
+    leader = threading.Thread(target=lambda: results.setdefault("leader", flight.do("key", slow)))
+    leader.start()
+    started.wait(5)
+    other = threading.Thread(target=follower)
+    other.start()
+    deadline = time.time() + 5
+    while flight._calls["key"].followers == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    release.set()
+    leader.join(5)
+    other.join(5)
+
+    assert len(calls) == 1
+    assert results["leader"] == ({"items": [1, 2]}, False)
+    assert results["follower"] == ({"items": [1, 2]}, True)
+    # Followers get their own copy
+    assert results["follower"][0] is not results["leader"][0]
+    assert flight._calls == {}
+
+def test_followers_get_the_leader_error_and_the_next_call_runs_again():
+    flight = SingleFlight("test")
+
+    async def main():
+        release = asyncio.Event()
+        calls = []
+
+        async def failing():
+            calls.append(1)
+            await release.wait()
+            raise LookupFailed("upstream down")
+
+        leader = asyncio.create_task(flight.ado("key", failing))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.ado("key", failing))
+        await asyncio.sleep(0)
+        release.set()
+
+        outcomes = await asyncio.gather(leader, follower, return_exceptions=True)
+        assert [type(outcome) for outcome in outcomes] == [LookupFailed, LookupFailed]
+        assert len(calls) == 1
+
+        async def ok():
+            return "fresh"
+
+        assert await flight.ado("key", ok) == ("fresh", False)
+
+    asyncio.run(main())
+
+def test_cancelled_leader_hands_the_call_to_a_follower():
+    flight = SingleFlight("test")
+
+    async def main():
+        calls = []
+
+        async def slow():
+            calls.append(1)
+            await asyncio.sleep(0.05 if len(calls) > 1 else 10)
+            return len(calls)
+
+        leader = asyncio.create_task(flight.ado("key", slow))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.ado("key", slow))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        # The follower is not cancelled with the leader; it runs the call itself
+        assert await follower == (2, False)
+        assert leader.cancelled()
+
+    asyncio.run(main())
+
+def test_cancelled_follower_does_not_cancel_the_leader():
+    flight = SingleFlight("test")
+
+    async def main():
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return "done"
+
+        leader = asyncio.create_task(flight.ado("key", slow))
+        await asyncio.sleep(0)
+        impatient = asyncio.create_task(flight.ado("key", slow))
+        patient = asyncio.create_task(flight.ado("key", slow))
+        await asyncio.sleep(0)
+        impatient.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await leader == ("done", False)
+        assert await patient == ("done", True)
+        assert impatient.cancelled()
+
+    asyncio.run(main())
+
+def test_disabled_singleflight_runs_every_call(monkeypatch):
+    monkeypatch.setattr(settings, "SINGLEFLIGHT_ENABLED", False)
+    flight = SingleFlight("test")
+
+    async def main():
+        calls = []
+
+        async def work():
+            calls.append(1)
+            index = len(calls)
+            await asyncio.sleep(0)
+            return index
+
+        results = await asyncio.gather(flight.ado("key", work), flight.ado("key", work))
+        assert sorted(results) == [(1, False), (2, False)]
+
+    asyncio.run(main())
@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+import pytest
+from app.storage import sqlite_cache
+from app.storage.sqlite_cache import FRESH, STALE, SQLiteCache
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(sqlite_cache, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+def _cache(tmp_path, **options):
+    settings = {"ttl_seconds": 10, "stale_seconds": 20, "max_entries": 100}
+    settings.update(options)
+    return SQLiteCache(str(tmp_path / "cache.sqlite3"), namespace="test", **settings)
+
+def test_entry_is_fresh_then_stale_then_gone(tmp_path, clock):
+    cache = _cache(tmp_path)
+    cache.set("query", {"items": [1, 2]})
+
+    assert cache.get("query") == ({"items": [1, 2]}, FRESH)
+    clock[0] += 15
+    assert cache.get("query") == ({"items": [1, 2]}, STALE)
+    clock[0] += 20
+    assert cache.get("query") == (None, None)
+    # Past its stale window the entry still serves as a fallback until evicted
+    assert cache.get_any("query") == {"items": [1, 2]}
+
+def test_evict_drops_expired_then_least_recently_used(tmp_path, clock):
+    cache = _cache(tmp_path, max_entries=2)
+    cache.set("expired", 0)
+    clock[0] += 31
+    for key in ("a", "b", "c"):
+        clock[0] += 1
+        cache.set(key, key)
+    clock[0] += 1
+    cache.get("a")
+
+    cache.evict()
+
+    assert cache.size() == 2
+    assert cache.get_any("expired") is None
+    assert cache.get_any("b") is None
+    assert cache.get("a")[0] == "a" and cache.get("c")[0] == "c"
+
+def test_namespaces_share_a_file_without_sharing_entries(tmp_path, clock):
+    first = _cache(tmp_path)
+    second = SQLiteCache(str(tmp_path / "cache.sqlite3"), namespace="other", ttl_seconds=10, stale_seconds=0, max_entries=10)
+    first.set("key", "first")
+
+    assert second.get("key") == (None, None)
+    second.set("key", "second")
+    assert first.get("key")[0] == "first"
@@ -0,0 +1,89 @@
+from app.services.code_parser import code_parser
+from app.services.template_index import AssignmentTemplate, TemplateStore, build_template
+
+STARTER = '''import math
+
+def read_input(path):
+    """Read the numbers from the input file."""
+    with open(path) as f:
+        return [int(line) for line in f if line.strip()]
+
+def solve(numbers):
+    """Return the sorted numbers. TODO: implement merge sort."""
+    result = list(numbers)
+    # your code here
+    return result
+'''
+
+SOLVE = '''def solve(numbers):
+    """Return the sorted numbers. TODO: implement merge sort."""
+    result = list(numbers)
+    if len(result) <= 1:
+        return result
+    middle = len(result) // 2
+    left = solve(result[:middle])
+    right = solve(result[middle:])
+    merged = []
+    while left and right:
+        merged.append(left.pop(0) if left[0] <= right[0] else right.pop(0))
+    return merged + left + right
+'''
+
+def _template() -> AssignmentTemplate:
+    files = [{"filename": "starter.py", "code": STARTER, "blocks": code_parser.parse_code(STARTER)}]
+    return AssignmentTemplate(build_template("hw1", files))
+
+def _block(code: str):
+    return code_parser.parse_code(code)[0]
+
+def test_block_identical_to_starter_code_is_excluded():
+    outcome = _template().match(_block(STARTER.split("\n\n")[1] + "\n# done\n"))
+
+    assert outcome["excluded"] is True
+
+def test_renamed_copy_is_left_to_the_fingerprint_threshold():
+    block = _block('''def load_values(filename):
+    """Read the numbers from the input file."""
+    with open(filename) as handle:
+        return [int(row) for row in handle if row.strip()]
+''')
+
+    outcome = _template().match(block)
+
+    assert outcome["excluded"] is True
+    assert "fingerprints" in outcome["reason"]
+
+def test_students_own_block_is_not_matched():
+    block = _block('''def median(values):
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+    return (ordered[middle - 1] + ordered[middle]) / 2 if len(ordered) % 2 == 0 else ordered[middle]
+''')
+
+    assert _template().match(block) is None
+
+def test_template_lines_are_cut_out_of_a_completed_block():
+    outcome = _template().match(_block(SOLVE))
+
+    assert outcome["excluded"] is False
+    # The signature and "result = list(numbers)"; lines too short to be distinctive stay
+    assert outcome["removed_lines"] == 2
+    assert "result = list(numbers)" not in outcome["code"]
+    assert "middle = len(result) // 2" in outcome["code"]
+
+def test_apply_settles_excluded_blocks_and_trims_the_rest(tmp_path, monkeypatch):
+    from app.core.config import settings
+    monkeypatch.setattr(settings, "TEMPLATE_STORE_PATH", str(tmp_path / "templates.sqlite3"))
+    store = TemplateStore()
+    template = store.save("hw1", [{"filename": "starter.py", "code": STARTER, "blocks": code_parser.parse_code(STARTER)}])
+    blocks = code_parser.parse_code(STARTER.split("\n\n")[1] + "\n\n" + SOLVE)
+    resolved = {}
+
+    summary = store.apply(template, blocks, resolved)
+
+    assert summary["blocks_excluded"] == 1 and summary["blocks_trimmed"] == 1
+    assert resolved[0]["engine"] == "template" and resolved[0]["is_suspicious"] is False
+    assert blocks[1]["template_lines_removed"] == 2
+    assert store.get("hw1").version == template.version
+    assert store.delete("hw1") is True
+    assert store.get("hw1") is None
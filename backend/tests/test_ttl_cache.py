@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+import pytest
+from app.storage import ttl_cache
+from app.storage.ttl_cache import TTLCache
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ttl_cache, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+def test_entries_expire_after_their_ttl(clock):
+    cache = TTLCache("test", ttl_seconds=10, max_size=10)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl_seconds=60)
+
+    clock[0] += 11
+
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.stats()["size"] == 1
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = TTLCache("test", ttl_seconds=10, max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_stats_count_hits_and_misses(clock):
+    cache = TTLCache("test", ttl_seconds=10, max_size=2)
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("missing")
+
+    stats = cache.stats()
+
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
@@ -3,7 +3,7 @@ import CodeMirror from '@uiw/react-codemirror'
 import { python } from '@codemirror/lang-python'
 import { Upload, Code, Loader2, Send } from 'lucide-react'
 import { toast } from 'react-toastify'
-import { checkCode, uploadFile } from '../services/api'
+import { checkCodeStream, uploadFile } from '../services/api'
 
 const CodeInput = ({ onResults, isLoading, setIsLoading }) => {
   const [code, setCode] = useState('')
@@ -17,8 +17,14 @@ const CodeInput = ({ onResults, isLoading, setIsLoading }) => {
     }
 
     setIsLoading(true)
+    onResults(null)
     try {
-      const result = await checkCode(code)
+      // Show each block's comparison as soon as the server streams it
+      const partial = []
+      const result = await checkCodeStream(code, (index, comparison) => {
+        partial[index] = comparison
+        onResults({ success: true, comparisons: partial.filter(Boolean) })
+      })
       onResults(result)
       toast.success('Analysis complete!')
     } catch (error) {
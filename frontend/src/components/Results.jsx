@@ -1,7 +1,7 @@
 import { AlertTriangle, CheckCircle, ExternalLink, AlertCircle, Loader2, FileSearch } from 'lucide-react'
 
 const Results = ({ results, isLoading }) => {
-  if (isLoading) {
+  if (isLoading && !results) {
     return (
       <div className="bg-white rounded-2xl shadow-lg border border-gray-200 p-12">
         <div className="flex flex-col items-center justify-center space-y-4">
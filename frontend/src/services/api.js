@@ -22,6 +22,61 @@ export const checkCode = async (code) => {
   }
 }
 
+/**
+ * Check code via the Server-Sent Events endpoint.
+ * onComparison(index, comparison) fires as each block finishes; resolves with the final result.
+ */
+export const checkCodeStream = async (code, onComparison) => {
+  const response = await fetch(`${API_BASE_URL}/check/stream`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ code }),
+  })
+
+  if (!response.ok || !response.body) {
+    let detail = 'Failed to check code'
+    try {
+      detail = (await response.json()).detail || detail
+    } catch (e) {
+      // body was not JSON
+    }
+    throw new Error(detail)
+  }
+
+  const reader = response.body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ''
+  let finalResult = null
+
+  while (true) {
+    const { value, done } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+
+    let boundary
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const raw = buffer.slice(0, boundary)
+      buffer = buffer.slice(boundary + 2)
+
+      const event = raw.match(/^event: (.*)$/m)?.[1]
+      const data = raw.match(/^data: (.*)$/m)?.[1]
+      if (!event || !data) continue
+
+      const payload = JSON.parse(data)
+      if (event === 'comparison') {
+        onComparison(payload.index, payload.comparison)
+      } else if (event === 'done') {
+        finalResult = payload
+      }
+    }
+  }
+
+  if (!finalResult) {
+    throw new Error('Connection closed before the check finished')
+  }
+  return finalResult
+}
+
 export const uploadFile = async (file) => {
   try {
     const formData = new FormData()